@@ -0,0 +1,21 @@
+"""
+Offline benchmarks for the API. Run each module from the repository root,
+for example ``python -m benchmarks.serializers``.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+
+def setup():
+    """Configure Django for a standalone benchmark script."""
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    os.environ.setdefault("SECRET_KEY", "benchmark-only-secret-key")
+    # Each benchmark runs in a single process; see config.caches.
+    os.environ.setdefault("SINGLE_PROCESS", "1")
+
+    import django
+
+    django.setup()
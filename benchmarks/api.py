@@ -0,0 +1,466 @@
+"""
+Load-test the main API endpoints and report a comparable baseline.
+
+    python -m benchmarks.api [--transport inprocess|http] [--clients 8]
+        [--requests 2000] [--database-url postgres://...] [--json out.json]
+        [--compare baseline.json]
+
+Seeds a throwaway database (a temporary SQLite file, or the flushed
+PostgreSQL database given by ``--database-url``) with users, projects,
+tasks and comments, then has ``--clients`` threads send a fixed,
+seeded mix of register, login, project list, task list/detail/patch and
+comment list/create requests. ``inprocess`` calls Django's WSGI
+application directly; ``http`` goes through a local threaded HTTP server
+and real sockets.
+
+Request profiling is switched on for every request, so queries per
+request are read from the ``Server-Timing`` header in either transport.
+Settings otherwise come from the environment as usual, so the response
+cache, password hashing pool and so on are as deployed. ``--json`` writes
+the results with the commit they ran on; ``--compare`` prints the change
+against such a file.
+"""
+
+import argparse
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from . import setup
+
+PASSWORD = "benchmark-password"
+
+# Relative frequency of each kind of request in the mix.
+MIX = {
+    "register": 1,
+    "login": 2,
+    "project-list": 10,
+    "task-list": 25,
+    "task-detail": 25,
+    "task-patch": 10,
+    "comment-list": 17,
+    "comment-create": 10,
+}
+
+QUERIES_RE = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries')
+
+
+def configure(database_url, directory):
+    # Before setup(), for the settings to pick it up.
+    os.environ["DATABASE_URL"] = (
+        database_url or f"sqlite:///{Path(directory) / 'api.sqlite3'}"
+    )
+    setup()
+    from django.conf import settings
+
+    settings.ALLOWED_HOSTS = ["testserver", "127.0.0.1"]
+    settings.REQUEST_PROFILING = {
+        "ENABLED": True,
+        "SAMPLE_RATE": 1,
+        "SLOW_THRESHOLD_MS": float("inf"),
+    }
+
+
+def seed(users, projects, tasks, comments, rng):
+    """
+    Create the data set and return the users' tokens, the project ids and
+    each project's task ids.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.core.management import call_command
+    from django.db import transaction
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from project.models import Project, ProjectMember
+    from task import counters
+    from task.models import Comment, Task
+    from user.models import User
+
+    call_command("migrate", verbosity=0)
+    call_command("flush", interactive=False, verbosity=0)
+    # One hash for everyone: hashing each user would dominate seeding.
+    password = make_password(PASSWORD)
+    with transaction.atomic():
+        people = User.objects.bulk_create(
+            User(
+                username=f"user{i}",
+                email=f"user{i}@example.com",
+                first_name=f"User{i}",
+                password=password,
+            )
+            for i in range(users)
+        )
+        owned = Project.objects.bulk_create(
+            Project(
+                name=f"Project {i}",
+                description="",
+                owner=people[i % len(people)],
+            )
+            for i in range(projects)
+        )
+        members = defaultdict(list)
+        memberships = []
+        for project in owned:
+            team = {project.owner} | set(rng.sample(people, min(5, len(people))))
+            for user in team:
+                role = "ADMIN" if user == project.owner else "MEMBER"
+                memberships.append(ProjectMember(project=project, user=user, role=role))
+                members[project.pk].append(user)
+        ProjectMember.objects.bulk_create(memberships)
+        Task.objects.bulk_create(
+            (
+                Task(
+                    title=f"Task {i}",
+                    description=f"Description of task {i}",
+                    status=rng.choice(["TODO", "IN_PROGRESS", "DONE"]),
+                    priority=rng.choice(["LOW", "MEDIUM", "HIGH"]),
+                    project=project,
+                    assigned_to=rng.choice(members[project.pk] + [None]),
+                )
+                for i in range(tasks)
+                for project in [owned[i % len(owned)]]
+            ),
+            batch_size=1000,
+        )
+        task_ids = defaultdict(list)
+        for pk, project_id in Task.objects.values_list("pk", "project_id"):
+            task_ids[project_id].append(pk)
+        Comment.objects.bulk_create(
+            (
+                Comment(
+                    task_id=rng.choice(task_ids[project.pk]),
+                    project=project,
+                    user=rng.choice(members[project.pk]),
+                    content=f"Comment {i}",
+                )
+                for i in range(comments)
+                for project in [rng.choice(owned)]
+            ),
+            batch_size=1000,
+        )
+    # bulk_create() skips the signals that maintain the task counters.
+    counters.rebuild()
+    # Any member may act on their projects; pick one per project.
+    tokens = {
+        project.pk: (
+            str(RefreshToken.for_user(members[project.pk][0]).access_token),
+            members[project.pk][0].email,
+        )
+        for project in owned
+    }
+    return tokens, dict(task_ids)
+
+
+def plan(count, tokens, task_ids, rng, label="run"):
+    """
+    Return ``count`` requests as ``(kind, method, path, body, token)``.
+    ``label`` keeps registrations of different plans apart.
+    """
+    from django.urls import reverse
+
+    kinds = rng.choices(list(MIX), weights=list(MIX.values()), k=count)
+    project_ids = sorted(tokens)
+    requests = []
+    for i, kind in enumerate(kinds):
+        project_id = rng.choice(project_ids)
+        token, email = tokens[project_id]
+        task_id = rng.choice(task_ids[project_id])
+        if kind == "register":
+            body = {
+                "username": f"{label}{i}",
+                "email": f"{label}{i}@example.com",
+                "password": PASSWORD,
+                "confirm_password": PASSWORD,
+            }
+            request = ("POST", reverse("user-register"), body, None)
+        elif kind == "login":
+            body = {"email": email, "password": PASSWORD}
+            request = ("POST", reverse("user-login"), body, None)
+        elif kind == "project-list":
+            request = ("GET", reverse("project-list"), None, token)
+        elif kind == "task-list":
+            path = reverse("task-list-create", args=[project_id]) + "?limit=50"
+            request = ("GET", path, None, token)
+        elif kind == "task-detail":
+            request = ("GET", reverse("task-detail", args=[task_id]), None, token)
+        elif kind == "task-patch":
+            body = {"status": rng.choice(["TODO", "IN_PROGRESS", "DONE"])}
+            request = ("PATCH", reverse("task-detail", args=[task_id]), body, token)
+        elif kind == "comment-list":
+            path = reverse("comment-list-create", args=[task_id]) + "?limit=50"
+            request = ("GET", path, None, token)
+        else:
+            body = {"content": f"Benchmark comment {label} {i}"}
+            path = reverse("comment-list-create", args=[task_id])
+            request = ("POST", path, body, token)
+        requests.append((kind, *request))
+    return requests
+
+
+class InProcessTransport:
+    def __init__(self):
+        from django.core.wsgi import get_wsgi_application
+
+        self.application = get_wsgi_application()
+
+    def send(self, method, path, body, token):
+        path, _, query = path.partition("?")
+        data = json.dumps(body).encode() if body is not None else b""
+        environ = {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(data)),
+            "SERVER_NAME": "testserver",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": "testserver",
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(data),
+            "wsgi.errors": sys.stderr,
+        }
+        if token:
+            environ["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+        started = []
+        result = self.application(
+            environ, lambda status, headers: started.append((status, headers))
+        )
+        try:
+            b"".join(result)
+        finally:
+            result.close()
+        status, headers = started[0]
+        return int(status.split()[0]), dict(headers).get("Server-Timing")
+
+    def close(self):
+        pass
+
+
+class HTTPTransport:
+    """Requests over keep-alive connections to a local threaded server."""
+
+    def __init__(self):
+        from django.core.servers.basehttp import (
+            ThreadedWSGIServer,
+            WSGIRequestHandler,
+        )
+        from django.core.wsgi import get_wsgi_application
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+        self.server.set_app(get_wsgi_application())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.local = threading.local()
+
+    def connection(self):
+        if getattr(self.local, "connection", None) is None:
+            self.local.connection = http.client.HTTPConnection(
+                *self.server.server_address
+            )
+        return self.local.connection
+
+    def send(self, method, path, body, token):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        data = json.dumps(body) if body is not None else None
+        connection = self.connection()
+        try:
+            connection.request(method, path, data, headers)
+            response = connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            # The server closed the connection; retry once on a new one.
+            connection.close()
+            self.local.connection = None
+            return self.send(method, path, body, token)
+        if response.getheader("Connection", "").lower() == "close":
+            connection.close()
+            self.local.connection = None
+        return response.status, response.getheader("Server-Timing")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+TRANSPORTS = {"inprocess": InProcessTransport, "http": HTTPTransport}
+
+
+def run(transport, requests, clients):
+    results = defaultdict(list)
+    lock = threading.Lock()
+    queue = iter(requests)
+
+    def client():
+        while True:
+            with lock:
+                request = next(queue, None)
+            if request is None:
+                return
+            kind, *request = request
+            start = time.perf_counter()
+            status, timing = transport.send(*request)
+            elapsed = time.perf_counter() - start
+            match = QUERIES_RE.search(timing or "")
+            queries = int(match.group(1)) if match else None
+            with lock:
+                results[kind].append((elapsed, status, queries))
+
+    workers = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start, results
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(sample[0] for sample in samples)
+    queries = [sample[2] for sample in samples if sample[2] is not None]
+    statuses = defaultdict(int)
+    for _, status, _ in samples:
+        statuses[status] += 1
+    return {
+        "requests": len(samples),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "rps": len(samples) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "queries": sum(queries) / len(queries) if queries else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    header = (
+        f"{'endpoint':<15} {'reqs':>6} {'err':>5} {'req/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}"
+    )
+    print(header)
+    for kind, row in report["endpoints"].items():
+        queries = f"{row['queries']:8.1f}" if row["queries"] is not None else " " * 8
+        print(
+            f"{kind:<15} {row['requests']:6d} {row['errors']:5d} "
+            f"{row['rps']:8.1f} {row['p50_ms']:8.1f} {row['p95_ms']:8.1f} "
+            f"{row['p99_ms']:8.1f} {queries}"
+        )
+        old = (baseline or {}).get("endpoints", {}).get(kind)
+        if old:
+            print(
+                f"{'  vs baseline':<15} {'':>6} {'':>5} "
+                f"{change(old['rps'], row['rps'])} {change(old['p50_ms'], row['p50_ms'])} "
+                f"{change(old['p95_ms'], row['p95_ms'])} "
+                f"{change(old['p99_ms'], row['p99_ms'])}"
+            )
+
+
+def change(old, new):
+    return f"{(new - old) / old * 100:+7.1f}%" if old else " " * 8
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transport", choices=TRANSPORTS, default="inprocess")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--comments", type=int, default=30_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="flushed before seeding")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure(args.database_url, directory)
+        rng = random.Random(args.seed)
+        start = time.perf_counter()
+        tokens, task_ids = seed(
+            args.users, args.projects, args.tasks, args.comments, rng
+        )
+        requests = plan(args.requests, tokens, task_ids, rng)
+        print(
+            f"seeded {args.tasks} tasks and {args.comments} comments in "
+            f"{time.perf_counter() - start:.1f}s; {args.requests} requests over "
+            f"{args.transport} from {args.clients} clients"
+        )
+
+        transport = TRANSPORTS[args.transport]()
+        try:
+            # Warm up imports, URL resolution and connections once per kind.
+            warmup = plan(len(MIX) * 10, tokens, task_ids, rng, label="warmup")
+            warmed = {request[0]: request for request in warmup}
+            for _, *request in warmed.values():
+                transport.send(*request)
+            elapsed, results = run(transport, requests, args.clients)
+        finally:
+            transport.close()
+
+    import django
+
+    samples = [sample for kind_samples in results.values() for sample in kind_samples]
+    report = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "args": vars(args),
+        "total": summarize(samples, elapsed),
+        "endpoints": {
+            kind: summarize(results[kind], elapsed) for kind in MIX if results[kind]
+        },
+    }
+    baseline = None
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        print(f"baseline: commit {baseline.get('commit')}")
+    print_report(report, baseline)
+    total = report["total"]
+    print(
+        f"{'total':<15} {total['requests']:6d} {total['errors']:5d} "
+        f"{total['rps']:8.1f} {total['p50_ms']:8.1f} {total['p95_ms']:8.1f} "
+        f"{total['p99_ms']:8.1f}"
+    )
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
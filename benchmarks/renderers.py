@@ -0,0 +1,70 @@
+"""
+Compare DRF's JSON renderer and parser with the orjson-backed ones.
+
+    python -m benchmarks.renderers [--tasks 10000] [--repeat 10]
+
+Renders the body of an unpaginated task list of ``--tasks`` tasks, as the
+task list endpoint serializes it, then parses it back, with each pair. The
+script checks that both produce identical output before timing them.
+"""
+
+import argparse
+import io
+
+from . import setup
+from .serializers import best_of, build
+
+
+def report(name, repeat, slow, fast):
+    slow_time = best_of(repeat, slow)
+    fast_time = best_of(repeat, fast)
+    print(
+        f"{name:<7} drf {slow_time * 1000:8.2f} ms  "
+        f"fast {fast_time * 1000:8.2f} ms  "
+        f"speedup {slow_time / fast_time:5.1f}x"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from config import fastjson
+    from task.serializers import TaskRowSerializer
+
+    if fastjson.orjson is None:
+        raise SystemExit("orjson is not installed; both paths would be DRF's")
+
+    _, task_rows, _, _ = build(args.tasks)
+    data = TaskRowSerializer(task_rows).data
+    drf_renderer, fast_renderer = JSONRenderer(), fastjson.FastJSONRenderer()
+    body = drf_renderer.render(data)
+    if fast_renderer.render(data) != body:
+        raise SystemExit("rendered output differs")
+    drf_parser, fast_parser = JSONParser(), fastjson.FastJSONParser()
+    if fast_parser.parse(io.BytesIO(body)) != drf_parser.parse(io.BytesIO(body)):
+        raise SystemExit("parsed output differs")
+
+    print(f"{args.tasks} tasks, {len(body) / 1024:.0f} KiB of JSON")
+    report(
+        "render",
+        args.repeat,
+        lambda: drf_renderer.render(data),
+        lambda: fast_renderer.render(data),
+    )
+    report(
+        "parse",
+        args.repeat,
+        lambda: drf_parser.parse(io.BytesIO(body)),
+        lambda: fast_parser.parse(io.BytesIO(body)),
+    )
+
+
+if __name__ == "__main__":
+    main()
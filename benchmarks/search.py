@@ -0,0 +1,134 @@
+"""
+Time project search on a large generated corpus.
+
+    python -m benchmarks.search [--comments 1000000] [--projects 20]
+
+Builds a throwaway SQLite database with ``--comments`` comments (one task
+per ten comments) spread over ``--projects`` projects, then reports the
+median and worst latency of ``task.search.search_project`` for common,
+rare and prefix queries.
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from . import setup
+
+WORDS = (
+    "deploy release review staging backend frontend database cache login "
+    "payment invoice report search export import migration latency timeout "
+    "crash retry queue worker schedule email notify upload download sync"
+).split()
+RARE_WORDS = ("kubernetes", "idempotency", "reconciliation")
+
+
+def vocabulary(rng, size=20_000):
+    """
+    The words above followed by made-up ones, with Zipf weights so that
+    term frequencies look like prose rather than a uniform word salad.
+    """
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = list(WORDS)
+    while len(words) < size:
+        words.append("".join(rng.choice(letters) for _ in range(rng.randint(4, 9))))
+    return words, [1 / rank for rank in range(1, size + 1)]
+
+
+def sentence(rng, vocab, length):
+    words, weights = vocab
+    words = rng.choices(words, weights, k=length)
+    if rng.random() < 0.001:
+        words[0] = rng.choice(RARE_WORDS)
+    return " ".join(words)
+
+
+def build(comments, projects, batch=20_000):
+    from django.core.management import call_command
+    from django.db import transaction
+
+    from project.models import Project
+    from task.models import Comment, Task
+    from user.models import User
+
+    call_command("migrate", verbosity=0)
+    rng = random.Random(1)
+    vocab = vocabulary(rng)
+    user = User.objects.create_user(username="bench", email="bench@example.com")
+    project_ids = [
+        Project.objects.create(name=f"Project {i}", description="", owner=user).pk
+        for i in range(projects)
+    ]
+    tasks = comments // 10
+    with transaction.atomic():
+        for start in range(0, tasks, batch):
+            Task.objects.bulk_create(
+                Task(
+                    title=sentence(rng, vocab, 4),
+                    description=sentence(rng, vocab, 12),
+                    project_id=project_ids[i % projects],
+                )
+                for i in range(start, min(start + batch, tasks))
+            )
+    task_ids = list(Task.objects.values_list("pk", "project_id"))
+    with transaction.atomic():
+        for start in range(0, comments, batch):
+            Comment.objects.bulk_create(
+                Comment(
+                    content=sentence(rng, vocab, 15),
+                    task_id=task_id,
+                    project_id=project_id,
+                    user=user,
+                )
+                for _ in range(start, min(start + batch, comments))
+                for task_id, project_id in [rng.choice(task_ids)]
+            )
+    return project_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--comments", type=int, default=1_000_000)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup()
+        from django.conf import settings
+
+        settings.DATABASES["default"]["NAME"] = str(Path(directory) / "search.sqlite3")
+        from task.search import search_project
+
+        start = time.perf_counter()
+        project_ids = build(args.comments, args.projects)
+        print(
+            f"built {args.comments} comments in {len(project_ids)} projects "
+            f"in {time.perf_counter() - start:.0f}s"
+        )
+
+        queries = {
+            "common": "deploy",
+            "two words": "review staging",
+            "rare": "kubernetes",
+            "prefix": "migr",
+        }
+        for name, query in queries.items():
+            timings = []
+            for i in range(args.repeat):
+                project_id = project_ids[i % len(project_ids)]
+                start = time.perf_counter()
+                search_project(project_id, query, limit=21)
+                timings.append(time.perf_counter() - start)
+            print(
+                f"{name:<10} {query!r:<16} "
+                f"median {statistics.median(timings) * 1000:7.1f} ms  "
+                f"max {max(timings) * 1000:7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
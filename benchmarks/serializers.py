@@ -0,0 +1,151 @@
+"""
+Compare the DRF task/comment serializers with their row-based fast paths.
+
+    python -m benchmarks.serializers [--rows 5000] [--repeat 5]
+
+Rows are built in memory, so no database is needed. The script checks that
+both paths render to identical JSON before timing them.
+"""
+
+import argparse
+import time
+from datetime import timedelta
+
+from . import setup
+
+
+def build(count):
+    from django.utils import timezone
+
+    from project.models import Project
+    from task.models import Comment, Task
+    from user.models import User
+
+    now = timezone.now()
+    users = [
+        User(
+            id=i,
+            username=f"user{i}",
+            email=f"user{i}@example.com",
+            first_name="First",
+            last_name="Last",
+            date_joined=now,
+        )
+        for i in range(1, 51)
+    ]
+    project = Project(id=1, name="Benchmark", owner=users[0])
+    tasks, task_rows, comments, comment_rows = [], [], [], []
+    for i in range(1, count + 1):
+        user = users[i % len(users)] if i % 5 else None
+        task = Task(
+            id=i,
+            title=f"Task {i}",
+            description="Lorem ipsum dolor sit amet " * 4,
+            status="TODO",
+            priority="HIGH",
+            project=project,
+            assigned_to=user,
+            due_date=now + timedelta(hours=i),
+            created_at=now,
+        )
+        tasks.append(task)
+        task_rows.append(
+            {
+                "id": task.id,
+                "title": task.title,
+                "description": task.description,
+                "status": task.status,
+                "priority": task.priority,
+                "project_id": project.id,
+                "due_date": task.due_date,
+                "created_at": task.created_at,
+                "assigned_to_id": user and user.id,
+                "assigned_to__first_name": user and user.first_name,
+                "assigned_to__last_name": user and user.last_name,
+                "assigned_to__username": user and user.username,
+                "assigned_to__email": user and user.email,
+                "assigned_to__date_joined": user and user.date_joined,
+            }
+        )
+        if user is None:
+            # CommentSerializer cannot represent comments on unassigned tasks.
+            continue
+        author = users[(i * 7) % len(users)]
+        comment = Comment(
+            id=i, content=f"Comment {i}", user=author, task=task, created_at=now
+        )
+        comments.append(comment)
+        comment_rows.append(
+            {
+                "id": comment.id,
+                "content": comment.content,
+                "created_at": comment.created_at,
+                "user_id": author.id,
+                "user__username": author.username,
+                "task__project_id": project.id,
+                "task__project__name": project.name,
+                "task__assigned_to_id": user.id,
+                "task__assigned_to__username": user.username,
+            }
+        )
+    return tasks, task_rows, comments, comment_rows
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def compare(name, repeat, slow, fast, count):
+    from rest_framework.renderers import JSONRenderer
+
+    renderer = JSONRenderer()
+    if renderer.render(slow()) != renderer.render(fast()):
+        raise SystemExit(f"{name}: fast path output differs")
+    slow_time = best_of(repeat, slow)
+    fast_time = best_of(repeat, fast)
+    print(
+        f"{name:<8} {count:>7} rows  "
+        f"drf {slow_time / count * 1e6:8.2f} us/row  "
+        f"fast {fast_time / count * 1e6:8.2f} us/row  "
+        f"speedup {slow_time / fast_time:5.1f}x"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    from task.serializers import (
+        CommentRowSerializer,
+        CommentSerializer,
+        TaskRowSerializer,
+        TaskSerializer,
+    )
+
+    tasks, task_rows, comments, comment_rows = build(args.rows)
+    compare(
+        "task",
+        args.repeat,
+        lambda: TaskSerializer(tasks, many=True).data,
+        lambda: TaskRowSerializer(task_rows).data,
+        len(tasks),
+    )
+    compare(
+        "comment",
+        args.repeat,
+        lambda: CommentSerializer(comments, many=True).data,
+        lambda: CommentRowSerializer(comment_rows).data,
+        len(comments),
+    )
+
+
+if __name__ == "__main__":
+    main()
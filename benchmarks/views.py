@@ -0,0 +1,279 @@
+"""
+Compare the task and comment endpoints under WSGI, ASGI with the sync views
+and ASGI with the native async views.
+
+    python -m benchmarks.views [--clients 200] [--threads 16] [--requests 5000]
+
+Each mode runs in its own process against the same throwaway SQLite
+database, driving Django's WSGI or ASGI application directly rather than
+through a server, so only the request handling differs. ``--clients``
+clients send requests back to back; under WSGI they share ``--threads``
+worker threads, like a threaded WSGI server. Latency includes any time
+spent waiting for a thread. The response cache is off unless
+``--response-cache`` is given.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import setup
+
+MODES = {
+    "wsgi": {"ASYNC_API_VIEWS": "0"},
+    "asgi-sync": {"ASYNC_API_VIEWS": "0"},
+    "asgi-async": {"ASYNC_API_VIEWS": "1"},
+}
+
+
+def configure(database):
+    setup()
+    from django.conf import settings
+
+    # No connection has been opened yet, so this still takes effect.
+    settings.DATABASES["default"]["NAME"] = database
+    settings.ALLOWED_HOSTS = ["testserver"]
+
+
+def prepare(database, tasks):
+    """Create the schema and a project; return the paths to load and a token."""
+    configure(database)
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from project.models import Project, ProjectMember
+    from task.models import Comment, Task
+    from user.models import User
+
+    call_command("migrate", verbosity=0)
+    user = User.objects.create_user(username="bench", email="bench@example.com")
+    project = Project.objects.create(name="Benchmark", description="", owner=user)
+    ProjectMember.objects.create(project=project, user=user, role="ADMIN")
+    Task.objects.bulk_create(
+        Task(title=f"Task {i}", project=project, assigned_to=user) for i in range(tasks)
+    )
+    task = Task.objects.filter(project=project).first()
+    Comment.objects.bulk_create(
+        Comment(task=task, project=project, user=user, content=f"Comment {i}")
+        for i in range(50)
+    )
+    paths = [
+        f"/api/api/projects/{project.pk}/tasks/?limit=50",
+        f"/api/api/tasks/{task.pk}/",
+        f"/api/api/tasks/{task.pk}/comments/?limit=50",
+    ]
+    return paths, str(RefreshToken.for_user(user).access_token)
+
+
+def split(path):
+    path, _, query = path.partition("?")
+    return path, query
+
+
+def run_wsgi(paths, token, clients, threads, total):
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+    # A threaded server queues requests for its fixed pool of threads.
+    pool = ThreadPoolExecutor(threads)
+    latencies, errors = [], []
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def request(path):
+        path, query = split(path)
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SERVER_NAME": "testserver",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": "testserver",
+            "HTTP_AUTHORIZATION": f"Bearer {token}",
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": sys.stderr,
+        }
+        statuses = []
+        body = application(environ, lambda status, headers: statuses.append(status))
+        b"".join(body)
+        body.close()
+        return statuses[0].startswith("200")
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            ok = pool.submit(request, paths[i % len(paths)]).result()
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors.append(i)
+
+    workers = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    pool.shutdown()
+    return time.perf_counter() - start, latencies, len(errors)
+
+
+def run_asgi(paths, token, clients, total):
+    from django.core.asgi import get_asgi_application
+
+    application = get_asgi_application()
+    latencies, errors = [], []
+    counter = iter(range(total))
+
+    async def request(path):
+        path, query = split(path)
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "headers": [
+                (b"host", b"testserver"),
+                (b"authorization", f"Bearer {token}".encode()),
+            ],
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 50000),
+        }
+        sent = False
+        disconnected = asyncio.Event()
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        statuses = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        await application(scope, receive, send)
+        return statuses[0] == 200
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            ok = await request(paths[i % len(paths)])
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors.append(i)
+
+    async def main():
+        await asyncio.gather(*(client() for _ in range(clients)))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return time.perf_counter() - start, latencies, len(errors)
+
+
+def worker(args):
+    configure(args.database)
+    paths = json.loads(args.paths)
+    # Warm up imports, URL resolution and connections outside the timing.
+    if args.worker == "wsgi":
+        run_wsgi(paths, args.token, 1, 1, len(paths))
+        elapsed, latencies, errors = run_wsgi(
+            paths, args.token, args.clients, args.threads, args.requests
+        )
+    else:
+        run_asgi(paths, args.token, 1, len(paths))
+        elapsed, latencies, errors = run_asgi(
+            paths, args.token, args.clients, args.requests
+        )
+    latencies.sort()
+    print(
+        json.dumps(
+            {
+                "rps": len(latencies) / elapsed,
+                "p50": latencies[len(latencies) // 2],
+                "p99": latencies[int(len(latencies) * 0.99)],
+                "errors": errors,
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--response-cache", action="store_true")
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    parser.add_argument("--paths", help=argparse.SUPPRESS)
+    parser.add_argument("--token", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = str(Path(directory) / "benchmark.sqlite3")
+        paths, token = prepare(database, args.tasks)
+        print(
+            f"{args.clients} clients, {args.requests} requests, "
+            f"{args.threads} WSGI threads"
+        )
+        for mode, env in MODES.items():
+            env = {**os.environ, **env}
+            if not args.response_cache:
+                env["RESPONSE_CACHE_TIMEOUT"] = "0"
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.views",
+                    f"--worker={mode}",
+                    f"--database={database}",
+                    f"--paths={json.dumps(paths)}",
+                    f"--token={token}",
+                    f"--clients={args.clients}",
+                    f"--threads={args.threads}",
+                    f"--requests={args.requests}",
+                ],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output)
+            print(
+                f"{mode:<11} {result['rps']:8.0f} req/s  "
+                f"p50 {result['p50'] * 1000:7.1f} ms  "
+                f"p99 {result['p99'] * 1000:7.1f} ms  "
+                f"errors {result['errors']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
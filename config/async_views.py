@@ -0,0 +1,84 @@
+"""
+Native async API views on top of DRF's ``APIView``.
+
+DRF dispatches synchronously, so under ASGI every request to a plain
+``APIView`` is handed to a worker thread. ``AsyncAPIView`` dispatches on
+the event loop instead: ``async def`` handlers run there directly, and
+permission classes can provide ``async def ahas_permission`` to check
+access with the async ORM. Sync handlers, authentication and sync
+permissions that may touch the database still run through
+``sync_to_async``, one hop each.
+"""
+
+import inspect
+
+from asgiref.sync import sync_to_async
+from rest_framework.permissions import AllowAny, BasePermission, IsAuthenticated
+from rest_framework.views import APIView
+
+# Permissions that only inspect the request, so they are safe to call on
+# the event loop.
+LOOP_SAFE_PERMISSIONS = (AllowAny, IsAuthenticated)
+
+
+class AsyncAPIView(APIView):
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            if not inspect.iscoroutinefunction(handler):
+                handler = sync_to_async(handler)
+            response = await handler(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        # Resolving request.user runs the authenticators, which may query.
+        await sync_to_async(self.perform_authentication)(request)
+        await self.acheck_permissions(request)
+        if self.throttle_classes:
+            await sync_to_async(self.check_throttles)(request)
+
+    async def acheck_permissions(self, request):
+        for permission in self.get_permissions():
+            if hasattr(permission, "ahas_permission"):
+                allowed = await permission.ahas_permission(request, self)
+            elif type(permission) in LOOP_SAFE_PERMISSIONS or (
+                type(permission).has_permission is BasePermission.has_permission
+            ):
+                allowed = permission.has_permission(request, self)
+            else:
+                allowed = await sync_to_async(permission.has_permission)(request, self)
+            if not allowed:
+                self.permission_denied(
+                    request,
+                    message=getattr(permission, "message", None),
+                    code=getattr(permission, "code", None),
+                )
@@ -0,0 +1,46 @@
+"""
+Caches of state that every worker must see alike.
+
+Some cached state is changed by the worker that handles a write and read
+by all of them: the response cache's versions, authenticated users and
+replica pins. In a local-memory cache each process has its own copy, so
+the change would reach one worker while the others go on serving stale
+responses, accepting deactivated users or reading a lagging replica.
+
+``shared_cache`` therefore refuses ``LocMemCache`` unless the
+``SINGLE_PROCESS`` setting says the site runs in one process, as
+``runserver`` and the tests do. Configure a backend every worker reaches,
+such as Redis or Memcached, in ``CACHES`` otherwise.
+
+Only the reads made while serving requests refuse it. Writers such as
+signal receivers that invalidate entries run in management commands and
+migrations too, after their row is stored, so they pass
+``required=False`` and skip the cache instead: if it is not shared, no
+request can have read from it.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+
+def shared_cache(alias, setting, required=True):
+    """
+    Return the cache ``alias`` for the feature configured by ``setting``,
+    raising ``ImproperlyConfigured`` when it is local to this process, or
+    returning None then if not ``required``.
+    """
+    cache = caches[alias]
+    if isinstance(cache, LocMemCache) and not getattr(
+        settings, "SINGLE_PROCESS", False
+    ):
+        if not required:
+            return None
+        raise ImproperlyConfigured(
+            f"{setting} needs a cache shared by every worker, but the "
+            f"{alias!r} cache is local to each process. Configure a shared "
+            f"backend in CACHES, turn {setting} off, or set SINGLE_PROCESS "
+            f"if the site runs in a single process."
+        )
+    return cache
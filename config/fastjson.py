@@ -0,0 +1,80 @@
+"""
+JSON renderer and parser that use orjson when it is installed.
+
+Both produce what DRF's ``JSONRenderer`` and ``JSONParser`` would, and
+defer to them whenever orjson cannot or the settings ask for output orjson
+does not write:
+
+- Responses are rendered with DRF's unless they are compact UTF-8 without
+  indentation, which is the default (``COMPACT_JSON``, ``UNICODE_JSON``)
+  outside the browsable API.
+- Dates, times and datetimes go through DRF's encoder, as do Decimals
+  (as floats), timedeltas, lazy strings and other types orjson does not
+  know. UUIDs are written by orjson in the same canonical form.
+- U+2028 and U+2029 are escaped, as DRF does.
+- Integers beyond 64 bits, nesting deeper than orjson allows, and anything
+  DRF's encoder raises for are rendered by DRF itself, with its errors.
+- Bodies orjson rejects are parsed again by DRF's parser: integers beyond
+  64 bits, NaN when ``STRICT_JSON`` is off, and malformed JSON, for DRF's
+  error message.
+
+Two differences remain. Floats carry the same values but may be spelled
+differently (``1e16`` rather than ``1e+16``). NaN and infinities are
+rendered as ``null`` where a strict ``JSONRenderer`` raises.
+"""
+
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escape U+2028 and U+2029, as DRF does, to output a strict subset of
+        # JavaScript. Looking for their lead byte first is much quicker than
+        # searching for them when there is none, as in most responses.
+        if b"\xe2" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,330 @@
+"""
+Opt-in per-request profiling.
+
+``ProfilingMiddleware`` samples a fraction of requests and records, for
+each, the number and total time of SQL queries, statements repeated often
+enough to suggest an N+1 pattern, the time spent producing serializer
+``.data`` (less the SQL it ran; serializers outside DRF's hierarchy opt in
+with ``timed_serialization``) and the time spent rendering the response.
+Sampled responses carry a ``Server-Timing`` header, and requests slower
+than a threshold go into a ring buffer shown by ``SlowRequestsAPIView``.
+
+Configured by the ``REQUEST_PROFILING`` setting. Requests that are not
+sampled only pay for a random number and a context variable lookup per
+query and serializer. Each process keeps its own buffer.
+"""
+
+import functools
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+from rest_framework.views import APIView
+
+_current = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self, request):
+        self.method = request.method
+        self.path = request.path
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.render_start = None
+        self.serializing = False
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.sql_time += duration
+        self.statements[sql] += 1
+
+    def duplicates(self, threshold):
+        """Return ``(sql, count)`` for statements run ``threshold`` times or more."""
+        return [
+            (sql, count)
+            for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+    def server_timing(self, threshold):
+        duplicated = sum(count for _, count in self.duplicates(threshold))
+        description = f"{self.queries} queries"
+        if duplicated:
+            description += f", {duplicated} repeated"
+        metrics = [
+            ("db", self.sql_time, description),
+            ("serialize", self.serialize_time, None),
+            ("render", self.render_time, None),
+            ("total", self.duration, None),
+        ]
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.1f}"
+            + (f';desc="{description}"' if description else "")
+            for name, seconds, description in metrics
+        )
+
+    def as_dict(self, request, response, threshold):
+        match = request.resolver_match
+        return {
+            "method": self.method,
+            "path": self.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "started_at": self.started_at,
+            "total_ms": round(self.duration * 1000, 1),
+            "sql_ms": round(self.sql_time * 1000, 1),
+            "queries": self.queries,
+            "serialize_ms": round(self.serialize_time * 1000, 1),
+            "render_ms": round(self.render_time * 1000, 1),
+            "duplicates": [
+                {"sql": sql, "count": count}
+                for sql, count in self.duplicates(threshold)[:5]
+            ],
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(connection):
+    # Outermost, and first so that connection.execute_wrapper(), which pops
+    # the last wrapper on exit, never removes it.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+def timed_serialization(fget):
+    """
+    Count the time spent in ``fget``, less the SQL it runs, as serialization
+    of the current profiled request. Nested serializers count once.
+    """
+
+    @functools.wraps(fget)
+    def wrapper(serializer):
+        profile = _current.get()
+        if profile is None or profile.serializing:
+            return fget(serializer)
+        profile.serializing = True
+        start = time.perf_counter()
+        sql_before = profile.sql_time
+        try:
+            return fget(serializer)
+        finally:
+            profile.serializing = False
+            elapsed = time.perf_counter() - start
+            profile.serialize_time += elapsed - (profile.sql_time - sql_before)
+
+    return wrapper
+
+
+_serializer_data = BaseSerializer.data
+
+
+def install_serializer_timing():
+    # Serializer.data and ListSerializer.data both defer to BaseSerializer's,
+    # which is where representations are built.
+    if BaseSerializer.data is _serializer_data:
+        BaseSerializer.data = property(timed_serialization(_serializer_data.fget))
+
+
+class RequestProfiler:
+    def __init__(
+        self,
+        sample_rate=0.01,
+        slow_threshold_ms=200,
+        slow_requests=100,
+        duplicate_threshold=3,
+        server_timing=True,
+    ):
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.duplicate_threshold = duplicate_threshold
+        self.server_timing = server_timing
+        self.sampled = 0
+        self._slow = deque(maxlen=slow_requests)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        config = getattr(settings, "REQUEST_PROFILING", None) or {}
+        if not config.get("ENABLED"):
+            return None
+        return cls(
+            sample_rate=config.get("SAMPLE_RATE", 0.01),
+            slow_threshold_ms=config.get("SLOW_THRESHOLD_MS", 200),
+            slow_requests=config.get("SLOW_REQUESTS", 100),
+            duplicate_threshold=config.get("DUPLICATE_THRESHOLD", 3),
+            server_timing=config.get("SERVER_TIMING", True),
+        )
+
+    def start(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return None
+        for connection in connections.all():
+            install_query_recorder(connection)
+        return RequestProfile(request)
+
+    def finish(self, request, response, profile):
+        profile.duration = time.perf_counter() - profile.start
+        if self.server_timing:
+            response["Server-Timing"] = profile.server_timing(self.duplicate_threshold)
+        with self._lock:
+            self.sampled += 1
+            if profile.duration >= self.slow_threshold:
+                self._slow.append(
+                    profile.as_dict(request, response, self.duplicate_threshold)
+                )
+        return response
+
+    def slowest(self):
+        with self._lock:
+            entries = list(self._slow)
+        return sorted(entries, key=lambda entry: entry["total_ms"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self.sampled = 0
+            self._slow.clear()
+
+
+_profiler = None
+
+
+def get_request_profiler():
+    """Return the process's profiler, or None when profiling is off."""
+    global _profiler
+    if _profiler is None:
+        _profiler = RequestProfiler.from_settings() or False
+    return _profiler or None
+
+
+@receiver(setting_changed)
+def reset_request_profiler(setting, **kwargs):
+    global _profiler
+    if setting == "REQUEST_PROFILING":
+        _profiler = None
+
+
+class ProfilingMiddleware:
+    """
+    Profiles sampled requests; see the module docstring. Place it first in
+    ``MIDDLEWARE`` so that the total covers the other middleware too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if get_request_profiler() is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install_serializer_timing()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profiler = get_request_profiler()
+        profile = profiler.start(request) if profiler else None
+        if profile is None:
+            return self.get_response(request)
+        request.profile = profile
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return profiler.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profiler = get_request_profiler()
+        profile = profiler.start(request) if profiler else None
+        if profile is None:
+            return await self.get_response(request)
+        request.profile = profile
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return profiler.finish(request, response, profile)
+
+    def process_template_response(self, request, response):
+        # Called just before the handler renders the response.
+        profile = getattr(request, "profile", None)
+        if profile is not None:
+            profile.render_start = time.perf_counter()
+            response.add_post_render_callback(
+                lambda response: self.rendered(profile, response)
+            )
+        return response
+
+    @staticmethod
+    def rendered(profile, response):
+        profile.render_time += time.perf_counter() - profile.render_start
+
+
+class SlowRequestsAPIView(APIView):
+    """Slowest recently sampled requests of this process, for staff."""
+
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        tags=["profiling"],
+    )
+    def get(self, request):
+        profiler = get_request_profiler()
+        if profiler is None:
+            return Response({"enabled": False, "requests": []})
+        return Response(
+            {
+                "enabled": True,
+                "sample_rate": profiler.sample_rate,
+                "sampled": profiler.sampled,
+                "requests": profiler.slowest(),
+            }
+        )
+
+    @swagger_auto_schema(
+        tags=["profiling"],
+    )
+    def delete(self, request):
+        profiler = get_request_profiler()
+        if profiler is not None:
+            profiler.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
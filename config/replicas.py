@@ -0,0 +1,235 @@
+"""
+Read-replica routing with read-your-writes.
+
+View handlers decorated with ``replica_reads`` run their queries on a random
+alias from ``DATABASE_REPLICAS["ALIASES"]`` for safe methods. Everything
+else goes to the primary: writes, authentication and permission checks,
+which run before the handler, and any read after the request has written.
+
+When a request writes, ``ReplicaMiddleware`` pins its user to the primary
+for ``PIN_SECONDS`` through the cache, which every worker must share (see
+``config.caches``), so they see their own changes while
+the replicas catch up; set it above the replication lag. Other users may
+see data that old meanwhile. Responses read from a replica are kept in the
+response cache no longer than that, and pinned users bypass it, because a
+lagging replica can predate the version the entry is stored under.
+
+Without the middleware, or without aliases, everything uses the primary.
+"""
+
+import functools
+import random
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+from config.caches import shared_cache
+
+KEY_PREFIX = "pm:db-pin"
+
+_state = ContextVar("replica_state", default=None)
+
+
+class ReadState:
+    """Per-request routing state, shared with the threads the request uses."""
+
+    def __init__(self):
+        self.alias = None
+        self.pinned = False
+        self.wrote = False
+
+
+def replica_config():
+    config = getattr(settings, "DATABASE_REPLICAS", None) or {}
+    aliases = config.get("ALIASES", ())
+    alias = config.get("CACHE_ALIAS", "default")
+    return (
+        aliases,
+        config.get("PIN_SECONDS", 5),
+        shared_cache(alias, "DATABASE_REPLICAS") if aliases else None,
+    )
+
+
+def pin_key(user_id):
+    return f"{KEY_PREFIX}:{user_id}"
+
+
+def pin_user(user_id):
+    _, seconds, cache = replica_config()
+    cache.set(pin_key(user_id), True, seconds)
+
+
+async def apin_user(user_id):
+    _, seconds, cache = replica_config()
+    await cache.aset(pin_key(user_id), True, seconds)
+
+
+def current_replica():
+    """Return the replica the current reads go to, or None for the primary."""
+    state = _state.get()
+    if state is None or state.wrote:
+        return None
+    return state.alias
+
+
+def pinned_to_primary():
+    """Whether the current user was pinned to the primary by a recent write."""
+    state = _state.get()
+    return state is not None and (state.pinned or state.wrote)
+
+
+def replica_candidate(request):
+    """
+    Return the routing state, the replica aliases, the cache and the user's
+    pin key (None when anonymous) if ``request`` may read from a replica,
+    else None.
+    """
+    state = _state.get()
+    aliases, _, cache = replica_config()
+    if state is None or not aliases or request.method not in SAFE_METHODS:
+        return None
+    user = request.user
+    key = pin_key(user.pk) if user.is_authenticated else None
+    return state, aliases, cache, key
+
+
+@contextmanager
+def reading_from_replica(request):
+    candidate = replica_candidate(request)
+    if candidate is None:
+        yield
+        return
+    state, aliases, cache, key = candidate
+    with using_replica(state, aliases, key is not None and cache.get(key)):
+        yield
+
+
+@asynccontextmanager
+async def areading_from_replica(request):
+    candidate = replica_candidate(request)
+    if candidate is None:
+        yield
+        return
+    state, aliases, cache, key = candidate
+    with using_replica(state, aliases, key is not None and await cache.aget(key)):
+        yield
+
+
+@contextmanager
+def using_replica(state, aliases, pinned):
+    if pinned:
+        state.pinned = True
+        yield
+        return
+    state.alias = random.choice(aliases)
+    try:
+        yield
+    finally:
+        state.alias = None
+
+
+def replica_reads(handler):
+    """Run a view handler's reads on a replica, when allowed; see the module."""
+    if iscoroutinefunction(handler):
+
+        @functools.wraps(handler)
+        async def wrapper(view, request, *args, **kwargs):
+            async with areading_from_replica(request):
+                return await handler(view, request, *args, **kwargs)
+
+    else:
+
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            with reading_from_replica(request):
+                return handler(view, request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # The primary rather than the alias an instance was loaded from, so
+        # that relations of replica rows read later see fresh data.
+        return current_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        # Explicitly, or instances read from a replica would be saved there.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases, _, _ = replica_config()
+        databases = {DEFAULT_DB_ALIAS, *aliases}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get their schema from the primary.
+        aliases, _, _ = replica_config()
+        return False if db in aliases else None
+
+
+class ReplicaMiddleware:
+    """
+    Tracks the routing state of each request and pins users who wrote to
+    the primary; see the module docstring.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        aliases, _, _ = replica_config()
+        if not aliases:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = ReadState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        self.finish(request, state)
+        return response
+
+    async def __acall__(self, request):
+        state = ReadState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        user_id = self.writer(request, state)
+        if user_id is not None:
+            await apin_user(user_id)
+        return response
+
+    def finish(self, request, state):
+        user_id = self.writer(request, state)
+        if user_id is not None:
+            pin_user(user_id)
+
+    @staticmethod
+    def writer(request, state):
+        """Return the id of the user to pin if the request wrote, else None."""
+        # DRF sets the authenticated user on the underlying request too.
+        user = getattr(request, "user", None)
+        if state.wrote and user is not None and user.is_authenticated:
+            return user.pk
+        return None
@@ -0,0 +1,202 @@
+"""
+Versioned response cache for read-heavy list endpoints.
+
+Responses are cached under keys that embed a version counter for the
+scope they depend on (a project, or a user for the project list). Writes
+invalidate by bumping the counter, which is O(1) and never scans keys;
+entries under old versions are simply never read again and expire.
+
+Configured by the ``RESPONSE_CACHE`` setting. The versions must be seen
+by every worker, so the cache must be shared by all of them; see
+``config.caches``. Without one, reads raise and invalidation does nothing.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from config.caches import shared_cache
+from config.replicas import current_replica, pinned_to_primary, replica_config
+
+CACHED_HEADERS = ("ETag", "Last-Modified", "X-Total-Count", "X-Total-Count-Estimated")
+
+
+class ResponseCache:
+    key_prefix = "pm:resp"
+
+    def __init__(self, alias="default", timeout=300):
+        self.alias = alias
+        self.timeout = timeout
+        # None when the cache is not shared: writes skip it, reads raise.
+        self.cache = (
+            shared_cache(alias, "RESPONSE_CACHE", required=False) if timeout else None
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return bool(self.timeout)
+
+    def version_key(self, scope, ident):
+        return f"{self.key_prefix}:v:{scope}:{ident}"
+
+    def version(self, scope, ident):
+        key = self.version_key(scope, ident)
+        version = self.cache.get(key)
+        if version is None:
+            # Seed from the clock rather than 1, so a counter that was
+            # evicted never restarts at a version older entries still use.
+            self.cache.add(key, time.time_ns(), None)
+            version = self.cache.get(key)
+        return version
+
+    async def aversion(self, scope, ident):
+        key = self.version_key(scope, ident)
+        version = await self.cache.aget(key)
+        if version is None:
+            await self.cache.aadd(key, time.time_ns(), None)
+            version = await self.cache.aget(key)
+        return version
+
+    def bump(self, scope, ident):
+        if self.cache is None:
+            return
+        key = self.version_key(scope, ident)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, time.time_ns(), None)
+
+    def make_key(self, endpoint, scope, ident, *parts):
+        if not self.readable():
+            return None
+        version = self.version(scope, ident)
+        return self.entry_key(endpoint, scope, ident, version, parts)
+
+    async def amake_key(self, endpoint, scope, ident, *parts):
+        if not self.readable():
+            return None
+        version = await self.aversion(scope, ident)
+        return self.entry_key(endpoint, scope, ident, version, parts)
+
+    def readable(self):
+        if not self.enabled:
+            return False
+        if self.cache is None:
+            # Not shared, so other workers' writes could not invalidate it.
+            shared_cache(self.alias, "RESPONSE_CACHE")
+        return True
+
+    def entry_key(self, endpoint, scope, ident, version, parts):
+        digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()
+        return f"{self.key_prefix}:{endpoint}:{scope}:{ident}:{version}:{digest}"
+
+    def get(self, request, key):
+        """
+        Return the cached response for ``key``, or a 304 when the request's
+        If-None-Match/If-Modified-Since match it, or None on a miss.
+        """
+        if not self.lookup_allowed(key):
+            return None
+        return self.respond(request, self.cache.get(key))
+
+    async def aget(self, request, key):
+        if not self.lookup_allowed(key):
+            return None
+        return self.respond(request, await self.cache.aget(key))
+
+    def lookup_allowed(self, key):
+        # Another user's entry under the current version may have been read
+        # from a replica that had not caught up with this user's write yet.
+        return key is not None and not pinned_to_primary()
+
+    def respond(self, request, entry):
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        data, headers = entry
+        last_modified = headers.get("Last-Modified")
+        response = get_conditional_response(
+            request,
+            etag=headers.get("ETag"),
+            last_modified=last_modified and parse_http_date_safe(last_modified),
+        )
+        if response is None:
+            response = Response(data)
+        for name, value in headers.items():
+            if response.status_code == 200 or name in ("ETag", "Last-Modified"):
+                response[name] = value
+        return response
+
+    def set(self, key, response):
+        if self.storable(key, response):
+            self.cache.set(key, self.entry(response), self.entry_timeout())
+        return response
+
+    async def aset(self, key, response):
+        if self.storable(key, response):
+            await self.cache.aset(key, self.entry(response), self.entry_timeout())
+        return response
+
+    def storable(self, key, response):
+        return key is not None and response.status_code == 200
+
+    def entry(self, response):
+        headers = {name: response[name] for name in CACHED_HEADERS if name in response}
+        return response.data, headers
+
+    def entry_timeout(self):
+        if current_replica() is not None:
+            # The replica may predate the version in the key; keep the
+            # entry only as long as writers are pinned to the primary.
+            return min(self.timeout, replica_config()[1])
+        return self.timeout
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        config = getattr(settings, "RESPONSE_CACHE", None) or {}
+        _response_cache = ResponseCache(
+            config.get("CACHE_ALIAS", "default"), config.get("TIMEOUT", 300)
+        )
+    return _response_cache
+
+
+@receiver(setting_changed)
+def reset_response_cache(setting, **kwargs):
+    global _response_cache
+    if setting in ("RESPONSE_CACHE", "CACHES", "SINGLE_PROCESS"):
+        _response_cache = None
+
+
+def invalidate(scope, ident):
+    """
+    Bump the version of ``scope``/``ident`` now and again once the current
+    transaction commits, so a response cached from not yet committed data
+    in between is discarded too.
+    """
+    cache = get_response_cache()
+    cache.bump(scope, ident)
+    transaction.on_commit(lambda: get_response_cache().bump(scope, ident))
@@ -12,9 +12,12 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 from datetime import timedelta
 
+from config.database import database_from_env, replicas_from_env
+
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,6 +53,7 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     'rest_framework_swagger',
     'drf_yasg',  
+    'django_filters',
 
     #Internal Apps
     'user',
@@ -59,6 +63,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.profiling.ProfilingMiddleware',
+    'config.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -92,11 +98,31 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Selected by DATABASE_URL, see config.database.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_from_env(BASE_DIR / 'db.sqlite3'),
+    **replicas_from_env(),
+}
+
+DATABASE_ROUTERS = ['config.replicas.ReplicaRouter']
+
+# Reads of the handlers marked with config.replicas.replica_reads go to
+# these aliases. After writing, a user reads from the primary for
+# PIN_SECONDS, which should exceed the replication lag; the pins need a
+# shared cache, see SINGLE_PROCESS below.
+DATABASE_REPLICAS = {
+    "ALIASES": [alias for alias in DATABASES if alias != 'default'],
+    "PIN_SECONDS": int(os.getenv("DATABASE_REPLICA_PIN_SECONDS", 5)),
+    "CACHE_ALIAS": "default",
+}
+
+# Applied to each new SQLite connection. busy_timeout is in milliseconds,
+# mmap_size in bytes.
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000)),
+    "mmap_size": 256 * 1024 * 1024,
 }
 
 
@@ -145,8 +171,107 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'user.authentication.CachedJWTAuthentication',
+    ),
+    # JSON through orjson when it is installed, see config.fastjson.
+    'DEFAULT_RENDERER_CLASSES': (
+        'config.fastjson.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'config.fastjson.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+
+# The response cache, the user cache and replica pins keep state every
+# worker must share, see config.caches. Without CACHES, Django's cache is
+# local to each process, which they refuse unless the site runs as a single
+# process, as runserver and the test runner do.
+SINGLE_PROCESS = os.getenv("SINGLE_PROCESS", "").lower() in ("1", "true") or (
+    sys.argv[1:2] in (["runserver"], ["test"])
+)
+
+
+# Cross-request cache of project roles, see project.membership.RoleCache.
+# Revoking a role must reach every worker, so it is kept in CACHE_ALIAS,
+# which needs a shared cache, see SINGLE_PROCESS above; it is off by default
+# in other processes. Set TIMEOUT once CACHES has one, or to 0 to disable it.
+# The "local" BACKEND keeps MAX_ENTRIES roles in each process instead, for
+# sites that run as a single process.
+PROJECT_ROLE_CACHE = {
+    "BACKEND": os.getenv("PROJECT_ROLE_CACHE_BACKEND", "django"),
+    "CACHE_ALIAS": "default",
+    "TIMEOUT": int(
+        os.getenv("PROJECT_ROLE_CACHE_TIMEOUT", 300 if SINGLE_PROCESS else 0)
+    ),
+    "MAX_ENTRIES": 10_000,
+}
+
+
+# Versioned cache of project and task list responses, see
+# config.response_cache. Needs a shared cache, see SINGLE_PROCESS above, so
+# it is off by default in other processes; set TIMEOUT once CACHES has one,
+# or to 0 to disable it.
+RESPONSE_CACHE = {
+    "CACHE_ALIAS": "default",
+    "TIMEOUT": int(os.getenv("RESPONSE_CACHE_TIMEOUT", 300 if SINGLE_PROCESS else 0)),
+}
+
+
+# Delta sync, see task.sync. Clients that have caught up re-read the changes
+# of the last OVERLAP_SECONDS, which must exceed the longest write
+# transaction, so that none committing late is missed.
+TASK_SYNC = {
+    "OVERLAP_SECONDS": int(os.getenv("TASK_SYNC_OVERLAP_SECONDS", 10)),
+}
+
+
+# Server-Sent Events of project changes, see project.events. The local
+# broker only reaches subscribers in the same process, so run one ASGI
+# worker per broker or plug in a shared one. The heartbeat is in seconds.
+PROJECT_EVENT_BROKER = os.getenv("PROJECT_EVENT_BROKER", "project.events.LocalBroker")
+PROJECT_EVENTS_HEARTBEAT = 15
+
+
+# Per-request profiling, see config.profiling. SAMPLE_RATE is the fraction
+# of requests profiled; those slower than SLOW_THRESHOLD_MS are kept, up to
+# SLOW_REQUESTS of them, for /api/profiling/slow-requests/.
+REQUEST_PROFILING = {
+    "ENABLED": os.getenv("REQUEST_PROFILING", "").lower() in ("1", "true"),
+    "SAMPLE_RATE": float(os.getenv("REQUEST_PROFILING_SAMPLE_RATE", 0.01)),
+    "SLOW_THRESHOLD_MS": 200,
+    "SLOW_REQUESTS": 100,
+    "DUPLICATE_THRESHOLD": 3,
+    "SERVER_TIMING": True,
+}
+
+
+# Route the task and comment endpoints to their native async views, for
+# deployments under an ASGI server. Under WSGI the sync views are faster.
+ASYNC_API_VIEWS = os.getenv("ASYNC_API_VIEWS", "").lower() in ("1", "true")
+
+
+# Users resolved from access tokens, see user.authentication. Needs a
+# shared cache, see SINGLE_PROCESS above, so it is off by default in other
+# processes; set TIMEOUT once CACHES has one, or to 0 to query the user on
+# every request.
+USER_AUTH_CACHE = {
+    "CACHE_ALIAS": "default",
+    "TIMEOUT": int(os.getenv("USER_AUTH_CACHE_TIMEOUT", 60 if SINGLE_PROCESS else 0)),
+}
+
+
+# Bounded pool that hashes passwords off the request threads, see
+# user.hashing. Logins beyond WORKERS + QUEUE concurrent hashes get a 429;
+# hashes waiting over TIMEOUT seconds a 503. Set WORKERS to 0 to hash
+# inline.
+PASSWORD_HASHING_POOL = {
+    "WORKERS": int(os.getenv("PASSWORD_HASHING_WORKERS", 2)),
+    "QUEUE": int(os.getenv("PASSWORD_HASHING_QUEUE", 16)),
+    "TIMEOUT": 5,
 }
 
 
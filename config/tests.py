@@ -0,0 +1,369 @@
+import datetime
+import io
+import tempfile
+import uuid
+import zoneinfo
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections, router
+from django.http import Http404
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import BasePermission, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient, force_authenticate
+from rest_framework.throttling import SimpleRateThrottle
+
+from config.async_views import AsyncAPIView
+from config.database import database_from_env
+from config.replicas import (
+    ReplicaMiddleware,
+    apin_user,
+    areading_from_replica,
+    current_replica,
+)
+from config.fastjson import FastJSONParser, FastJSONRenderer
+from config.profiling import RequestProfile, get_request_profiler
+from project.membership import get_role_cache
+from project.models import Project, ProjectMember
+from task.models import Task
+from task.search import get_backend
+from task.serializers import TaskSerializer
+from user.testing import make_user
+
+
+class DenyAll(BasePermission):
+    async def ahas_permission(self, request, view):
+        return False
+
+
+class OncePerMinute(SimpleRateThrottle):
+    rate = "1/min"
+
+    def get_cache_key(self, request, view):
+        return f"throttle:{request.user.pk}"
+
+
+class ItemView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request, pk):
+        if pk != 1:
+            raise Http404
+        return Response({"id": pk})
+
+    def post(self, request, pk):
+        return Response(request.data, status=201)
+
+
+class AsyncAPIViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("owner")
+
+    async def call(self, method="get", pk=1, user=True, **initkwargs):
+        request = getattr(AsyncRequestFactory(), method)(f"/items/{pk}/")
+        if user:
+            force_authenticate(request, self.user)
+        return await ItemView.as_view(**initkwargs)(request, pk=pk)
+
+    async def test_handlers(self):
+        self.assertEqual((await self.call()).data, {"id": 1})
+        # Sync handlers run in a worker thread.
+        self.assertEqual((await self.call("post")).status_code, 201)
+
+    async def test_unauthenticated(self):
+        response = await self.call(user=False)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("Bearer", response["WWW-Authenticate"])
+
+    async def test_permission_denied(self):
+        response = await self.call(permission_classes=[DenyAll])
+        self.assertEqual(response.status_code, 403)
+
+    async def test_not_found(self):
+        self.assertEqual((await self.call(pk=2)).status_code, 404)
+
+    async def test_throttled(self):
+        self.assertEqual(
+            (await self.call(throttle_classes=[OncePerMinute])).status_code, 200
+        )
+        response = await self.call(throttle_classes=[OncePerMinute])
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+
+@override_settings(
+    REQUEST_PROFILING={"ENABLED": True, "SAMPLE_RATE": 1, "SLOW_THRESHOLD_MS": 0}
+)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        get_request_profiler().clear()
+        get_role_cache().clear()
+        cache.clear()
+        self.user = make_user("owner")
+        project = Project.objects.create(name="Project", owner=self.user)
+        ProjectMember.objects.create(project=project, user=self.user, role="ADMIN")
+        Task.objects.bulk_create(
+            Task(title=f"Task {i}", project=project) for i in range(3)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.list_url = reverse("task-list-create", args=[project.pk])
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.list_url)
+        timing = response["Server-Timing"]
+        self.assertIn("db;dur=", timing)
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        for metric in ("serialize", "render", "total"):
+            self.assertIn(f"{metric};dur=", timing)
+
+    def test_sampling(self):
+        with self.settings(REQUEST_PROFILING={"ENABLED": True, "SAMPLE_RATE": 0}):
+            response = self.client.get(self.list_url)
+        self.assertNotIn("Server-Timing", response)
+
+    def test_slow_requests_are_admin_only(self):
+        self.client.get(self.list_url)
+        url = reverse("profiling-slow-requests")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.user.is_staff = True
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        (entry,) = [
+            r for r in response.data["requests"] if r["view"] == "task-list-create"
+        ]
+        self.assertEqual((entry["method"], entry["status"]), ("GET", 200))
+        self.assertGreater(entry["queries"], 0)
+
+    def test_repeated_queries(self):
+        profile = RequestProfile(RequestFactory().get("/"))
+        for _ in range(3):
+            profile.add_query("SELECT 1 WHERE id = %s", 0.001)
+        profile.add_query("SELECT 2", 0.001)
+        profile.duration = 0.01
+        self.assertEqual(profile.duplicates(3), [("SELECT 1 WHERE id = %s", 3)])
+        self.assertIn('desc="4 queries, 3 repeated"', profile.server_timing(3))
+
+
+class DatabaseSettingsTests(TestCase):
+    def test_postgresql_url(self):
+        database = database_from_env(
+            "db.sqlite3",
+            {"DATABASE_URL": "postgres://pm:p%40ss@db:6432/pm?sslmode=require"},
+        )
+        self.assertEqual(database["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual(
+            (database["NAME"], database["USER"], database["PASSWORD"]),
+            ("pm", "pm", "p@ss"),
+        )
+        self.assertEqual((database["HOST"], database["PORT"]), ("db", "6432"))
+        self.assertEqual(database["OPTIONS"]["sslmode"], "require")
+        self.assertEqual(database["OPTIONS"]["pool"]["max_size"], 10)
+        self.assertNotIn("CONN_MAX_AGE", database)
+
+    def test_persistent_connections_without_pool(self):
+        database = database_from_env(
+            "db.sqlite3",
+            {"DATABASE_URL": "postgres://db/pm", "DATABASE_POOL_MAX_SIZE": "0"},
+        )
+        self.assertNotIn("pool", database["OPTIONS"])
+        self.assertEqual(database["CONN_MAX_AGE"], 60)
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+
+    def test_sqlite(self):
+        self.assertEqual(database_from_env("db.sqlite3", {})["NAME"], "db.sqlite3")
+        database = database_from_env("", {"DATABASE_URL": "sqlite:////srv/pm.sqlite3"})
+        self.assertEqual(database["NAME"], "/srv/pm.sqlite3")
+        self.assertEqual(database["OPTIONS"], {"transaction_mode": "IMMEDIATE"})
+        with self.assertRaises(ImproperlyConfigured):
+            database_from_env("", {"DATABASE_URL": "mysql://db/pm"})
+
+    def test_sqlite_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = type(connections["default"])(
+                {**connection.settings_dict, "NAME": f"{directory}/pm.sqlite3"},
+                alias="pragmas",
+            )
+            try:
+                cursor = wrapper.cursor()
+                cursor.execute("PRAGMA journal_mode")
+                self.assertEqual(cursor.fetchone()[0], "wal")
+                cursor.execute("PRAGMA synchronous")
+                self.assertEqual(cursor.fetchone()[0], 1)
+            finally:
+                wrapper.close()
+
+
+@override_settings(DATABASE_REPLICAS={"ALIASES": ["replica"], "PIN_SECONDS": 5})
+class ReplicaRoutingTests(TransactionTestCase):
+    """A second connection to the test database stands in for a replica."""
+
+    # Resolved once setUpClass has added the replica.
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        primary = connections["default"].settings_dict
+        connections.settings["replica"] = {
+            **primary,
+            "TEST": {**primary["TEST"], "MIRROR": "default"},
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+
+    def setUp(self):
+        get_role_cache().clear()
+        cache.clear()
+        self.owner = make_user("owner")
+        self.member = make_user("member")
+        self.project = Project.objects.create(name="Project", owner=self.owner)
+        for user in (self.owner, self.member):
+            ProjectMember.objects.create(project=self.project, user=user)
+        self.task = Task.objects.create(title="Task", project=self.project)
+        self.list_url = reverse("task-list-create", args=[self.project.pk])
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def databases_read(self, client, url):
+        """Return the aliases that served ``client``'s GET of ``url``."""
+        with CaptureQueriesContext(
+            connections["default"]
+        ) as primary, CaptureQueriesContext(connections["replica"]) as replica:
+            self.assertEqual(client.get(url).status_code, 200)
+        return {
+            alias
+            for alias, queries in (("default", primary), ("replica", replica))
+            if queries
+        }
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        owner, member = self.client_for(self.owner), self.client_for(self.member)
+        comments_url = reverse("comment-list-create", args=[self.task.pk])
+        self.assertIn("replica", self.databases_read(owner, comments_url))
+
+        response = owner.post(comments_url, {"content": "Done"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.databases_read(owner, comments_url), {"default"})
+        self.assertIn("replica", self.databases_read(member, comments_url))
+
+    def test_pinned_users_bypass_response_cache(self):
+        owner, member = self.client_for(self.owner), self.client_for(self.member)
+        owner.post(self.list_url, {"title": "New"})
+        # Stored from the replica, which might not have had the new task.
+        self.assertIn("replica", self.databases_read(member, self.list_url))
+        self.assertEqual(self.databases_read(owner, self.list_url), {"default"})
+
+    def test_search_reads_from_the_replica(self):
+        url = reverse("project-search", args=[self.project.pk])
+        with mock.patch("task.search.get_backend", wraps=get_backend) as backend:
+            response = self.client_for(self.member).get(url, {"q": "task"})
+        self.assertEqual(response.status_code, 200)
+        backend.assert_called_once_with("replica")
+
+    async def test_async_reads_are_routed_and_pinned(self):
+        async def view(request):
+            async with areading_from_replica(request):
+                return current_replica()
+
+        request = AsyncRequestFactory().get(self.list_url)
+        request.user = self.member
+        middleware = ReplicaMiddleware(view)
+        self.assertEqual(await middleware(request), "replica")
+        await apin_user(self.member.pk)
+        self.assertIsNone(await middleware(request))
+
+    @override_settings(SINGLE_PROCESS=False)
+    def test_pins_need_a_shared_cache(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "DATABASE_REPLICAS"):
+            self.client_for(self.member).get(self.list_url)
+
+    def test_writes_go_to_the_primary(self):
+        task = Task.objects.using("replica").get(pk=self.task.pk)
+        self.assertEqual(router.db_for_write(Task, instance=task), "default")
+        self.assertEqual(router.db_for_read(Task, instance=task), "default")
+        self.assertFalse(router.allow_migrate("replica", "task"))
+
+
+class FastJSONTests(TestCase):
+    def test_renders_like_drf(self):
+        user = make_user("owner")
+        project = Project.objects.create(name="Project", owner=user)
+        task = Task.objects.create(
+            title="Line\u2028separator \u00fc", project=project, assigned_to=user
+        )
+        utc = datetime.datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.UTC)
+        payload = {
+            "task": TaskSerializer(task).data,
+            "datetimes": [
+                utc,
+                utc.replace(microsecond=0),
+                utc.astimezone(zoneinfo.ZoneInfo("Asia/Kolkata")),
+                # A local mean time offset of seconds.
+                datetime.datetime(1850, 1, 1, tzinfo=zoneinfo.ZoneInfo("Europe/Paris")),
+                datetime.datetime(2024, 1, 2, 3, 4, 5),
+            ],
+            "date": datetime.date(2024, 1, 2),
+            "time": datetime.time(1, 2, 3, 4),
+            "duration": timedelta(hours=1, microseconds=5),
+            "decimal": Decimal("12.50"),
+            "uuid": uuid.uuid4(),
+            "lazy": gettext_lazy("Not found."),
+            "set": {1},
+            1: "integer key",
+        }
+        for data in (payload, {"big": 2**70}, [task.pk], None):
+            self.assertEqual(
+                FastJSONRenderer().render(data), JSONRenderer().render(data)
+            )
+        self.assertEqual(
+            FastJSONRenderer().render(payload, "application/json; indent=4"),
+            JSONRenderer().render(payload, "application/json; indent=4"),
+        )
+        with mock.patch("config.fastjson.orjson", None):
+            self.assertEqual(
+                FastJSONRenderer().render(payload), JSONRenderer().render(payload)
+            )
+
+    def test_parses_like_drf(self):
+        for body in (
+            b'{"a": [1, 2.5, null, "\\u00fc"]}',
+            b'{"big": 1180591620717411303424}',
+        ):
+            self.assertEqual(
+                FastJSONParser().parse(io.BytesIO(body)),
+                JSONParser().parse(io.BytesIO(body)),
+            )
+        for body in (b'{"a": NaN}', b'{"a": '):
+            with self.assertRaises(ParseError) as fast:
+                FastJSONParser().parse(io.BytesIO(body))
+            with self.assertRaises(ParseError) as drf:
+                JSONParser().parse(io.BytesIO(body))
+            self.assertEqual(str(fast.exception), str(drf.exception))
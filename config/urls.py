@@ -26,6 +26,8 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework import permissions
 
+from .profiling import SlowRequestsAPIView
+
 schema_view = get_schema_view(
     openapi.Info(
         title="TechForing PM API",
@@ -44,6 +46,11 @@ urlpatterns = [
     path("api/", include("task.urls")),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path(
+        "api/profiling/slow-requests/",
+        SlowRequestsAPIView.as_view(),
+        name="profiling-slow-requests",
+    ),
     path(
         "docs/",
         schema_view.with_ui("swagger", cache_timeout=0),
@@ -0,0 +1,104 @@
+"""
+Per-project change events for Server-Sent Events subscribers.
+
+Model signal handlers publish small event dicts once their transaction
+commits; the SSE view in ``project.views`` subscribes one asyncio queue per
+connection. The broker class is set by the ``PROJECT_EVENT_BROKER`` setting
+so a shared broker can replace the in-process one.
+"""
+
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """A bounded queue of events for one connection, owned by its event loop."""
+
+    def __init__(self, project_id, max_events):
+        self.project_id = project_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_events)
+
+    def deliver(self, event):
+        # Runs on the subscriber's loop. A client too slow to keep up loses
+        # its oldest events rather than growing the queue without bound.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBroker:
+    """
+    In-process pub/sub. ``publish`` may be called from any thread; events
+    are handed to each subscriber's event loop. Only subscribers in the same
+    process see the events.
+    """
+
+    def __init__(self, max_events=100):
+        self.max_events = max_events
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, project_id):
+        subscription = Subscription(project_id, self.max_events)
+        with self._lock:
+            self._subscriptions[project_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.project_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.project_id]
+
+    def publish(self, project_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(project_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has closed; it is unsubscribing.
+                pass
+
+    def subscriber_count(self, project_id=None):
+        with self._lock:
+            if project_id is not None:
+                return len(self._subscriptions.get(project_id, ()))
+            return sum(len(s) for s in self._subscriptions.values())
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        path = getattr(settings, "PROJECT_EVENT_BROKER", "project.events.LocalBroker")
+        _broker = import_string(path)()
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == "PROJECT_EVENT_BROKER":
+        _broker = None
+
+
+def publish_on_commit(project_id, event_type, **data):
+    """Publish an event to the project's subscribers once the write commits."""
+    event = {"type": event_type, "project": project_id, **data}
+    transaction.on_commit(lambda: get_broker().publish(project_id, event))
@@ -0,0 +1,363 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from config.caches import shared_cache
+from .models import ProjectMember
+
+_MISSING = object()
+
+
+class LocalRoleStore:
+    """
+    Thread-safe in-process LRU store with per-entry expiry. Invalidation
+    only reaches the process that made the change, so it refuses lookups
+    unless the ``SINGLE_PROCESS`` setting is on; see ``config.caches``.
+    """
+
+    def __init__(self, timeout, max_entries):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._by_project = {}
+        self._lock = threading.Lock()
+
+    def get(self, project_id, user_id):
+        if not getattr(settings, "SINGLE_PROCESS", False):
+            raise ImproperlyConfigured(
+                "The local PROJECT_ROLE_CACHE backend is private to each "
+                "process. Use the django backend with a shared cache, turn "
+                "PROJECT_ROLE_CACHE off, or set SINGLE_PROCESS if the site "
+                "runs in a single process."
+            )
+        key = (project_id, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            role, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._discard(key)
+                return _MISSING
+            self._entries.move_to_end(key)
+            return role
+
+    def set(self, project_id, user_id, role):
+        key = (project_id, user_id)
+        with self._lock:
+            self._entries[key] = (role, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            self._by_project.setdefault(project_id, set()).add(user_id)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+    # In memory, so the async lookups never block the event loop.
+
+    async def aget(self, project_id, user_id):
+        return self.get(project_id, user_id)
+
+    async def aset(self, project_id, user_id, role):
+        self.set(project_id, user_id, role)
+
+    def delete(self, project_id, user_id):
+        with self._lock:
+            self._discard((project_id, user_id))
+
+    def delete_project(self, project_id):
+        with self._lock:
+            for user_id in list(self._by_project.get(project_id, ())):
+                self._discard((project_id, user_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_project.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _discard(self, key):
+        if self._entries.pop(key, None) is None:
+            return
+        project_id, user_id = key
+        users = self._by_project.get(project_id)
+        if users is not None:
+            users.discard(user_id)
+            if not users:
+                del self._by_project[project_id]
+
+
+class DjangoCacheRoleStore:
+    """
+    Store backed by a Django cache alias, shared by every worker using it.
+
+    Keys embed a generation that ``clear`` bumps, so clearing drops every
+    entry without touching the rest of the alias. Lookups need a cache
+    shared by all workers, see ``config.caches``; invalidation skips one
+    that is not, since no request can have read from it.
+    """
+
+    key_prefix = "pm:role"
+    generation_key = f"{key_prefix}:generation"
+
+    def __init__(self, timeout, alias):
+        self.timeout = timeout
+        self.alias = alias
+
+    def get_cache(self, required=True):
+        return shared_cache(self.alias, "PROJECT_ROLE_CACHE", required)
+
+    def key_maker(self, cache):
+        generation = cache.get(self.generation_key)
+        if generation is None:
+            # Seeded from the clock, like the response cache versions, so an
+            # evicted generation never restarts at one still in use.
+            cache.add(self.generation_key, time.time_ns(), None)
+            generation = cache.get(self.generation_key)
+        return self.keys(generation)
+
+    async def akey_maker(self, cache):
+        generation = await cache.aget(self.generation_key)
+        if generation is None:
+            await cache.aadd(self.generation_key, time.time_ns(), None)
+            generation = await cache.aget(self.generation_key)
+        return self.keys(generation)
+
+    def keys(self, generation):
+        return lambda project_id, user_id: (
+            f"{self.key_prefix}:{generation}:{project_id}:{user_id}"
+        )
+
+    def get(self, project_id, user_id):
+        cache = self.get_cache()
+        return cache.get(self.key_maker(cache)(project_id, user_id), _MISSING)
+
+    async def aget(self, project_id, user_id):
+        cache = self.get_cache()
+        make_key = await self.akey_maker(cache)
+        return await cache.aget(make_key(project_id, user_id), _MISSING)
+
+    def set(self, project_id, user_id, role):
+        cache = self.get_cache()
+        cache.set(self.key_maker(cache)(project_id, user_id), role, self.timeout)
+
+    async def aset(self, project_id, user_id, role):
+        cache = self.get_cache()
+        make_key = await self.akey_maker(cache)
+        await cache.aset(make_key(project_id, user_id), role, self.timeout)
+
+    def delete(self, project_id, user_id):
+        cache = self.get_cache(required=False)
+        if cache is not None:
+            cache.delete(self.key_maker(cache)(project_id, user_id))
+
+    def delete_project(self, project_id):
+        cache = self.get_cache(required=False)
+        if cache is None:
+            return
+        # Non-member entries stay cached; they are still correct, and adding
+        # a member invalidates that member's entry on its own.
+        user_ids = ProjectMember.objects.filter(project_id=project_id).values_list(
+            "user_id", flat=True
+        )
+        make_key = self.key_maker(cache)
+        cache.delete_many([make_key(project_id, user_id) for user_id in user_ids])
+
+    def clear(self):
+        cache = self.get_cache(required=False)
+        if cache is None:
+            return
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:
+            cache.set(self.generation_key, time.time_ns(), None)
+
+    def __len__(self):
+        # The entries live in the shared cache, which cannot count them.
+        return 0
+
+
+class RoleCache:
+    """
+    Cross-request ``(project_id, user_id) -> role`` cache.
+
+    Configured by the ``PROJECT_ROLE_CACHE`` setting. Non-members are cached
+    as ``None``. Entries are dropped by the ``ProjectMember`` and ``Project``
+    signal handlers in ``project.signals`` and otherwise expire after
+    ``TIMEOUT`` seconds. A revoked or demoted member must lose access in
+    every worker at once, so the store is a cache they all share unless the
+    site runs as a single process.
+    """
+
+    def __init__(self, store=None):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        config = getattr(settings, "PROJECT_ROLE_CACHE", None) or {}
+        timeout = config.get("TIMEOUT", 300)
+        if not timeout:
+            return cls()
+        if config.get("BACKEND", "django") == "local":
+            store = LocalRoleStore(timeout, config.get("MAX_ENTRIES", 10_000))
+        else:
+            store = DjangoCacheRoleStore(timeout, config.get("CACHE_ALIAS", "default"))
+        return cls(store)
+
+    @property
+    def enabled(self):
+        return self.store is not None
+
+    def get(self, project_id, user_id):
+        """Return the cached role, or ``_MISSING`` when not cached."""
+        if self.store is None:
+            return _MISSING
+        return self.count(self.store.get(project_id, user_id))
+
+    async def aget(self, project_id, user_id):
+        if self.store is None:
+            return _MISSING
+        return self.count(await self.store.aget(project_id, user_id))
+
+    def count(self, role):
+        with self._lock:
+            if role is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return role
+
+    def set(self, project_id, user_id, role):
+        if self.store is not None:
+            self.store.set(project_id, user_id, role)
+
+    async def aset(self, project_id, user_id, role):
+        if self.store is not None:
+            await self.store.aset(project_id, user_id, role)
+
+    def invalidate(self, project_id, user_id):
+        if self.store is not None:
+            self.store.delete(project_id, user_id)
+
+    def invalidate_project(self, project_id):
+        if self.store is not None:
+            self.store.delete_project(project_id)
+
+    def clear(self):
+        with self._lock:
+            self.hits = self.misses = 0
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "enabled": self.enabled,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else None,
+            "size": len(self.store) if self.store is not None else 0,
+        }
+
+
+_role_cache = None
+
+
+def get_role_cache():
+    global _role_cache
+    if _role_cache is None:
+        _role_cache = RoleCache.from_settings()
+    return _role_cache
+
+
+@receiver(setting_changed)
+def reset_role_cache(setting, **kwargs):
+    global _role_cache
+    if setting in ("PROJECT_ROLE_CACHE", "CACHES"):
+        _role_cache = None
+
+
+class ProjectMembership:
+    """
+    Resolves users' roles in projects for the duration of one request.
+
+    Each ``(project, user)`` pair is looked up at most once, so permission
+    classes, serializers and model helpers can all ask the same question
+    without repeating the query. ``user`` defaults to the requesting user.
+    Lookups go through the cross-request ``RoleCache`` before the database.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._roles = {}
+
+    def role(self, project_id, user_id=None):
+        key = self._key(project_id, user_id)
+        if key not in self._roles:
+            self._roles[key] = self._load(*key)
+        return self._roles[key]
+
+    async def arole(self, project_id, user_id=None):
+        """``role`` for async views, querying through the async ORM."""
+        key = self._key(project_id, user_id)
+        if key not in self._roles:
+            self._roles[key] = await self._aload(*key)
+        return self._roles[key]
+
+    def is_member(self, project_id, user_id=None):
+        return self.role(project_id, user_id) is not None
+
+    async def ais_member(self, project_id, user_id=None):
+        return await self.arole(project_id, user_id) is not None
+
+    def is_admin(self, project_id, user_id=None):
+        return self.role(project_id, user_id) == "ADMIN"
+
+    def _key(self, project_id, user_id):
+        if user_id is None:
+            user_id = self.user.pk
+        return int(project_id), user_id
+
+    def _query(self, project_id, user_id):
+        return ProjectMember.objects.filter(
+            project_id=project_id, user_id=user_id
+        ).values_list("role", flat=True)
+
+    def _load(self, project_id, user_id):
+        if user_id is None:
+            return None
+        cache = get_role_cache()
+        role = cache.get(project_id, user_id)
+        if role is _MISSING:
+            role = self._query(project_id, user_id).first()
+            cache.set(project_id, user_id, role)
+        return role
+
+    async def _aload(self, project_id, user_id):
+        if user_id is None:
+            return None
+        cache = get_role_cache()
+        role = await cache.aget(project_id, user_id)
+        if role is _MISSING:
+            role = await self._query(project_id, user_id).afirst()
+            await cache.aset(project_id, user_id, role)
+        return role
+
+
+def get_membership(request):
+    """Return the request's ProjectMembership, creating it on first use."""
+    membership = getattr(request, "project_membership", None)
+    if membership is None:
+        membership = ProjectMembership(request.user)
+        request.project_membership = membership
+    return membership
@@ -13,9 +13,11 @@ class Project(TimeStampedModel):
     def __str__(self):
         return self.name
 
-    def is_owner_or_admin(self, user):
-        if self.owner == user:
+    def is_owner_or_admin(self, user, membership=None):
+        if self.owner_id == user.pk:
             return True
+        if membership is not None:
+            return membership.is_admin(self.pk, user.pk)
         if ProjectMember.objects.filter(project=self, user=user, role="ADMIN").exists():
             return True
         return False
@@ -37,3 +39,39 @@ class ProjectMember(TimeStampedModel):
 
     def __str__(self):
         return f"{self.user.username} - {self.project.name}"
+
+
+class ProjectTaskCount(models.Model):
+    """
+    Number of a project's tasks with one status and priority. Maintained by
+    ``task.counters`` so dashboards never have to count tasks.
+    """
+
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="task_counts"
+    )
+    status = models.CharField(max_length=16)
+    priority = models.CharField(max_length=16)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("project", "status", "priority")
+
+    def __str__(self):
+        return f"{self.project_id} {self.status}/{self.priority}: {self.count}"
+
+
+class ProjectAssigneeCount(models.Model):
+    """Number of a project's open (not done) tasks assigned to one user."""
+
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="assignee_counts"
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    open_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("project", "user")
+
+    def __str__(self):
+        return f"{self.project_id} user {self.user_id}: {self.open_count}"
@@ -1,9 +1,11 @@
 import rest_framework.permissions as permissions
 
+from .membership import get_membership
+
 
 class IsProjectOwnerOrAdmin(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.is_owner_or_admin(request.user)
+        return obj.is_owner_or_admin(request.user, get_membership(request))
@@ -79,4 +79,30 @@ class ProjectSerializer(serializers.ModelSerializer):
                 "name": f"{rep['owner']['first_name']} {rep['owner']['last_name']}".strip(),
             }
 
+        if self.context.get("include_stats"):
+            rep["task_stats"] = task_stats(
+                instance.task_counts.all(), instance.assignee_counts.all()
+            )
         return rep
+
+
+def task_stats(task_counts, assignee_counts):
+    """
+    Summarize a project's ``ProjectTaskCount`` and ``ProjectAssigneeCount``
+    rows. Statuses, priorities and assignees without tasks are left out.
+    """
+    by_status, by_priority = {}, {}
+    for row in task_counts:
+        if row.count:
+            by_status[row.status] = by_status.get(row.status, 0) + row.count
+            by_priority[row.priority] = by_priority.get(row.priority, 0) + row.count
+    return {
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "by_priority": by_priority,
+        "open_by_assignee": [
+            {"user": row.user_id, "open": row.open_count}
+            for row in sorted(assignee_counts, key=lambda row: row.user_id)
+            if row.open_count
+        ],
+    }
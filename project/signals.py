@@ -0,0 +1,75 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from config.response_cache import invalidate
+from user.models import User, touches_profile
+from .events import publish_on_commit
+from .membership import get_role_cache
+from .models import Project, ProjectMember
+
+
+# Roles are dropped now and again on commit, in case a concurrent request
+# cached the old role before this transaction committed.
+@receiver([post_save, post_delete], sender=ProjectMember)
+def invalidate_member_role(sender, instance, **kwargs):
+    project_id, user_id = instance.project_id, instance.user_id
+    get_role_cache().invalidate(project_id, user_id)
+    transaction.on_commit(lambda: get_role_cache().invalidate(project_id, user_id))
+
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_project_roles(sender, instance, created=False, **kwargs):
+    if not created:
+        project_id = instance.pk
+        get_role_cache().invalidate_project(project_id)
+        transaction.on_commit(lambda: get_role_cache().invalidate_project(project_id))
+
+
+def invalidate_project_responses(project_id):
+    """Drop cached responses of the project and of its members' project lists."""
+    invalidate("project", project_id)
+    user_ids = ProjectMember.objects.filter(project_id=project_id).values_list(
+        "user_id", flat=True
+    )
+    for user_id in user_ids:
+        invalidate("user", user_id)
+
+
+@receiver([post_save, post_delete], sender=ProjectMember)
+def invalidate_member_responses(sender, instance, **kwargs):
+    invalidate("user", instance.user_id)
+    invalidate_project_responses(instance.project_id)
+
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_project_cached_responses(sender, instance, **kwargs):
+    invalidate_project_responses(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_projects_responses(sender, instance, update_fields=None, **kwargs):
+    # Task and project responses embed assignees, owners and members.
+    if not touches_profile(update_fields):
+        return
+    project_ids = Project.objects.filter(
+        Q(owner=instance) | Q(members__user=instance)
+    ).values_list("pk", flat=True)
+    for project_id in set(project_ids):
+        invalidate_project_responses(project_id)
+
+
+@receiver(post_save, sender=ProjectMember)
+def publish_member_saved(sender, instance, created, **kwargs):
+    publish_on_commit(
+        instance.project_id,
+        "member.added" if created else "member.updated",
+        user=instance.user_id,
+        role=instance.role,
+    )
+
+
+@receiver(post_delete, sender=ProjectMember)
+def publish_member_removed(sender, instance, **kwargs):
+    publish_on_commit(instance.project_id, "member.removed", user=instance.user_id)
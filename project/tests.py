@@ -1,3 +1,298 @@
-from django.test import TestCase
+import asyncio
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from user.models import User
+from user.testing import make_user
+from .events import LocalBroker, get_broker
+from .membership import LocalRoleStore, RoleCache, get_role_cache
+from .models import Project, ProjectMember
+
+
+class ProjectQueryBudgetTests(TestCase):
+    def setUp(self):
+        get_role_cache().clear()
+        cache.clear()
+        self.user = make_user("owner")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_projects(self, count, members):
+        start = Project.objects.count()
+        for i in range(start, start + count):
+            project = Project.objects.create(
+                name=f"Project {i}", description="", owner=self.user
+            )
+            ProjectMember.objects.create(project=project, user=self.user, role="ADMIN")
+            for j in range(members):
+                ProjectMember.objects.create(
+                    project=project, user=make_user(f"member{i}x{j}")
+                )
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        # The ETag aggregate, the projects and their prefetched members.
+        self.make_projects(2, 1)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("project-list"))
+        self.assertEqual(len(response.data), 2)
+
+        self.make_projects(8, 4)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("project-list"))
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(len(response.data[-1]["members"]), 5)
+
+    def test_retrieve_query_count(self):
+        self.make_projects(1, 5)
+        project = Project.objects.get()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("project-detail", args=[project.pk]))
+        self.assertEqual(response.data["owner"]["id"], self.user.pk)
+        self.assertEqual(len(response.data["members"]), 6)
+
+    def test_add_member_returns_new_member(self):
+        self.make_projects(1, 0)
+        project = Project.objects.get()
+        new_user = make_user("newcomer")
+        response = self.client.post(
+            reverse("project-add-member", args=[project.pk]),
+            {"user_id": new_user.pk},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(new_user.pk, [m["user"]["id"] for m in response.data["members"]])
+
+
+class RoleCacheTests(TestCase):
+    def setUp(self):
+        get_role_cache().clear()
+        cache.clear()
+        self.owner = make_user("owner")
+        self.member = make_user("member")
+        self.project = Project.objects.create(
+            name="Project", description="", owner=self.owner
+        )
+        self.membership = ProjectMember.objects.create(
+            project=self.project, user=self.member
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+        self.url = reverse("project-detail", args=[self.project.pk])
+
+    def test_role_is_cached_across_requests(self):
+        cache = get_role_cache()
+        self.assertEqual(self.client.patch(self.url, {"name": "x"}).status_code, 403)
+        with self.assertNumQueries(2):  # the project and its prefetched members
+            self.assertEqual(
+                self.client.patch(self.url, {"name": "x"}).status_code, 403
+            )
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_member_changes_invalidate(self):
+        self.assertEqual(self.client.patch(self.url, {"name": "x"}).status_code, 403)
+        self.membership.role = "ADMIN"
+        self.membership.save()
+        self.assertEqual(self.client.patch(self.url, {"name": "x"}).status_code, 200)
+        self.membership.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        ProjectMember.objects.create(
+            project=self.project, user=self.member, role="ADMIN"
+        )
+        self.assertEqual(self.client.patch(self.url, {"name": "y"}).status_code, 200)
+
+    def test_role_cached_before_commit_is_invalidated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.membership.role = "ADMIN"
+            self.membership.save()
+            # A concurrent request that read the role before the commit.
+            get_role_cache().set(self.project.pk, self.member.pk, "MEMBER")
+        self.assertEqual(self.client.patch(self.url, {"name": "x"}).status_code, 200)
+
+    def test_clear_drops_shared_entries(self):
+        cache = get_role_cache()
+        cache.set(self.project.pk, self.member.pk, "ADMIN")
+        cache.clear()
+        self.assertEqual(self.client.patch(self.url, {"name": "x"}).status_code, 403)
+
+    @override_settings(SINGLE_PROCESS=False)
+    def test_local_cache_needs_a_single_process(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "PROJECT_ROLE_CACHE"):
+            self.client.patch(self.url, {"name": "x"})
+        with self.settings(PROJECT_ROLE_CACHE={"BACKEND": "local"}):
+            with self.assertRaisesMessage(ImproperlyConfigured, "SINGLE_PROCESS"):
+                self.client.patch(self.url, {"name": "x"})
+        # Membership changes still succeed, with nothing to invalidate.
+        self.membership.role = "ADMIN"
+        self.membership.save()
+        self.membership.delete()
+        self.assertFalse(ProjectMember.objects.exists())
+
+    def test_local_store_is_bounded_and_expires(self):
+        cache = RoleCache(LocalRoleStore(timeout=60, max_entries=2))
+        cache.set(1, 1, "ADMIN")
+        cache.set(1, 2, "MEMBER")
+        cache.get(1, 1)
+        cache.set(2, 1, None)
+        self.assertEqual(cache.get(1, 1), "ADMIN")
+        self.assertIsNone(cache.get(2, 1))
+        self.assertEqual(len(cache.store), 2)
+
+        cache.invalidate_project(1)
+        self.assertEqual(len(cache.store), 1)
+
+        cache.store.timeout = 0
+        cache.set(3, 1, "MEMBER")
+        self.assertNotEqual(cache.get(3, 1), "MEMBER")
+
+
+class ProjectConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("owner")
+        self.project = Project.objects.create(
+            name="Project", description="", owner=self.user
+        )
+        self.member = ProjectMember.objects.create(
+            project=self.project, user=self.user, role="ADMIN"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_and_detail_revalidate(self):
+        for url in [
+            reverse("project-list"),
+            reverse("project-detail", args=[self.project.pk]),
+        ]:
+            etag = self.client.get(url)["ETag"]
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response["ETag"], etag)
+
+            ProjectMember.objects.create(project=self.project, user=make_user(url))
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+
+    def test_missing_project_is_not_a_304(self):
+        url = reverse("project-detail", args=[self.project.pk + 1])
+        etag = self.client.get(url).get("ETag", '"x"')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+
+class ProjectResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_role_cache().clear()
+        self.user = make_user("owner")
+        self.project = Project.objects.create(
+            name="Project", description="", owner=self.user
+        )
+        ProjectMember.objects.create(project=self.project, user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("project-list")
+
+    def test_membership_changes_invalidate_every_members_list(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+        other = make_user("other")
+        ProjectMember.objects.create(project=self.project, user=other)
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data[0]["members"]), 2)
+
+        self.client.force_authenticate(other)
+        self.assertEqual(len(self.client.get(self.url).data), 1)
+        self.project.name = "Renamed"
+        self.project.save()
+        self.assertEqual(self.client.get(self.url).data[0]["name"], "Renamed")
+
+
+class RecordingBroker:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, project_id, event):
+        self.events.append(event)
+
+
+@override_settings(PROJECT_EVENT_BROKER="project.events.LocalBroker")
+class ProjectEventsTests(TestCase):
+    def setUp(self):
+        get_role_cache().clear()
+        self.user = make_user("owner")
+        self.project = Project.objects.create(
+            name="Project", description="", owner=self.user
+        )
+        ProjectMember.objects.create(project=self.project, user=self.user)
+        self.url = reverse("project-events", args=[self.project.pk])
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    @override_settings(PROJECT_EVENT_BROKER="project.tests.RecordingBroker")
+    def test_member_changes_are_published_on_commit(self):
+        other = make_user("other")
+        with self.captureOnCommitCallbacks(execute=True):
+            member = ProjectMember.objects.create(project=self.project, user=other)
+            self.assertEqual(get_broker().events, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            member.delete()
+        self.assertEqual(
+            [(e["type"], e["project"], e["user"]) for e in get_broker().events],
+            [
+                ("member.added", self.project.pk, other.pk),
+                ("member.removed", self.project.pk, other.pk),
+            ],
+        )
+
+    async def test_stream_delivers_published_events(self):
+        client = AsyncClient()
+        response = await client.get(self.url, {"token": self.token})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+
+        broker = get_broker()
+        self.assertEqual(broker.subscriber_count(self.project.pk), 1)
+        broker.publish(self.project.pk, {"type": "task.created", "id": 1})
+        self.assertEqual(
+            await anext(stream),
+            b'event: task.created\ndata: {"type": "task.created", "id": 1}\n\n',
+        )
+
+        # A client disconnect cancels the task reading the stream.
+        reader = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        reader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reader
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    async def test_stream_requires_membership(self):
+        client = AsyncClient()
+        response = await client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+        other = await User.objects.acreate(username="other", email="o@example.com")
+        token = str(RefreshToken.for_user(other).access_token)
+        response = await client.get(
+            self.url, headers={"Authorization": f"Bearer {token}"}
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_local_broker_drops_oldest_events_when_full(self):
+        async def run():
+            broker = LocalBroker(max_events=2)
+            subscription = broker.subscribe(1)
+            for i in range(3):
+                broker.publish(1, {"id": i})
+            await asyncio.sleep(0)
+            return [await subscription.get(), await subscription.get()]
+
+        self.assertEqual(asyncio.run(run()), [{"id": 1}, {"id": 2}])
@@ -1,6 +1,9 @@
+from django.urls import path
 from rest_framework import routers
-from .views import ProjectViewSet
+from .views import ProjectViewSet, project_events
 
 router = routers.SimpleRouter()
 router.register(r"projects", ProjectViewSet)
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path("projects/<int:pk>/events/", project_events, name="project-events"),
+]
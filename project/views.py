@@ -2,29 +2,143 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied
 from drf_yasg.utils import swagger_auto_schema
 
-from .models import Project
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Max, Prefetch
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from config.conditional import Validator
+from config.replicas import replica_reads
+from config.response_cache import get_response_cache
+from user.authentication import CachedJWTAuthentication
+
+from .models import Project, ProjectAssigneeCount, ProjectMember, ProjectTaskCount
 from .serializers import (
     ProjectSerializer,
     ProjectMemberSerializer,
     ProjectMemberCreateSerializer,
+    task_stats,
 )
 from .permissions import IsProjectOwnerOrAdmin
+from .membership import ProjectMembership, get_membership
+from .events import get_broker
 
 
 class ProjectViewSet(viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated, IsProjectOwnerOrAdmin]
 
     def get_queryset(self):
         if not self.request.user.is_authenticated:
             return Project.objects.none()
-        return Project.objects.filter(members__user=self.request.user)
+        # The serializer nests the owner and every member's user, so load them
+        # up front: one query for the projects and one for all their members.
+        queryset = (
+            Project.objects.filter(members__user=self.request.user)
+            .select_related("owner")
+            .prefetch_related(
+                Prefetch(
+                    "members",
+                    queryset=ProjectMember.objects.select_related("user").order_by(
+                        "id"
+                    ),
+                )
+            )
+            .order_by("id")
+        )
+        if self.include_stats():
+            queryset = queryset.prefetch_related("task_counts", "assignee_counts")
+        return queryset
+
+    def include_stats(self):
+        return "stats" in self.request.query_params.get("include", "").split(",")
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["include_stats"] = self.include_stats()
+        return context
+
+    def get_validator(self, projects):
+        """
+        Fingerprint ``projects`` and their members with one aggregate query
+        over the membership rows, without loading or serializing anything.
+        """
+        stats = ProjectMember.objects.filter(
+            project__in=projects.order_by().values("pk")
+        ).aggregate(
+            projects=Count("project", distinct=True),
+            members=Count("pk"),
+            member_latest=Max("updated_at"),
+            project_latest=Max("project__updated_at"),
+            # The owner and the members' users are embedded too.
+            user_latest=Max("user__updated_at"),
+            owner_latest=Max("project__owner__updated_at"),
+        )
+        validator = Validator.from_stats(
+            stats, self.request.user.pk, self.request.get_full_path()
+        )
+        return validator, stats["projects"]
+
+    @replica_reads
+    def list(self, request, *args, **kwargs):
+        # Task counts change without touching the project or its members,
+        # which is all the cache and the validator track.
+        if self.include_stats():
+            return super().list(request, *args, **kwargs)
+        cache = get_response_cache()
+        cache_key = cache.make_key(
+            "projects", "user", request.user.pk, request.get_full_path()
+        )
+        cached = cache.get(request, cache_key)
+        if cached is not None:
+            return cached
+
+        validator, _ = self.get_validator(self.get_queryset())
+        not_modified = validator.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        response = validator.apply(super().list(request, *args, **kwargs))
+        return cache.set(cache_key, response)
+
+    @replica_reads
+    def retrieve(self, request, *args, **kwargs):
+        if self.include_stats():
+            return super().retrieve(request, *args, **kwargs)
+        validator, found = self.get_validator(
+            self.get_queryset().filter(pk=kwargs["pk"])
+        )
+        # Let a missing project 404 rather than answer 304.
+        if found:
+            not_modified = validator.not_modified(request)
+            if not_modified is not None:
+                return not_modified
+        return validator.apply(super().retrieve(request, *args, **kwargs))
+
+    @action(detail=True, methods=["GET"])
+    def stats(self, request, pk=None):
+        """Task counts by status and priority, and open tasks per assignee."""
+        try:
+            is_member = get_membership(request).is_member(pk)
+        except ValueError:
+            is_member = False
+        if not is_member:
+            raise NotFound()
+        return Response(
+            task_stats(
+                ProjectTaskCount.objects.filter(project_id=pk),
+                ProjectAssigneeCount.objects.filter(project_id=pk),
+            )
+        )
 
     @swagger_auto_schema(
         request_body=ProjectMemberCreateSerializer,
@@ -39,7 +153,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
         project = self.get_object()
 
-        if not project.is_owner_or_admin(request.user):
+        if not project.is_owner_or_admin(request.user, get_membership(request)):
             raise PermissionDenied("Only project owners or admins can add members")
 
         try:
@@ -53,8 +167,71 @@ class ProjectViewSet(viewsets.ModelViewSet):
             serializer.is_valid(raise_exception=True)
             member = serializer.save()
 
+            # The prefetched members no longer include the new one.
+            project = self.get_queryset().get(pk=project.pk)
             return Response(
                 ProjectSerializer(project).data, status=status.HTTP_201_CREATED
             )
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+async def project_events(request, pk):
+    """
+    Stream a project's task, comment and member changes as Server-Sent Events.
+
+    Authenticates with the usual ``Authorization: Bearer`` header, or a
+    ``token`` query parameter for ``EventSource`` clients that cannot set
+    headers, and checks membership once when the stream opens. Each
+    connection is an idle coroutine waiting on its queue, not a thread, so
+    this only works under ASGI.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"error": "Event streams require an ASGI server."}, status=501
+        )
+
+    authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = (
+        authentication.get_raw_token(header) if header else None
+    ) or request.GET.get("token")
+    if not raw_token:
+        return JsonResponse(
+            {"error": "Authentication credentials were not provided."}, status=401
+        )
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+        user = await sync_to_async(authentication.get_user)(validated_token)
+    except (AuthenticationFailed, InvalidToken) as e:
+        return JsonResponse({"error": str(e.detail)}, status=401)
+
+    if not await sync_to_async(ProjectMembership(user).is_member)(pk):
+        return JsonResponse(
+            {"error": "You are not a member of this project."}, status=403
+        )
+
+    response = StreamingHttpResponse(event_stream(pk), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def event_stream(project_id):
+    heartbeat = getattr(settings, "PROJECT_EVENTS_HEARTBEAT", 15)
+    broker = get_broker()
+    subscription = broker.subscribe(project_id)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection.
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        # Django cancels the response when the client disconnects.
+        broker.unsubscribe(subscription)
@@ -0,0 +1,201 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from config.response_cache import invalidate
+from rest_framework.exceptions import ValidationError
+
+from project.events import publish_on_commit
+from project.models import ProjectMember
+from . import counters
+from .deletions import delete_tasks
+from .models import Task
+from .serializers import TaskBulkItemSerializer
+
+OPERATIONS = ("create", "update", "delete")
+
+
+class BulkResult:
+    """Per-item outcome of a bulk request, in the order items were sent."""
+
+    def __init__(self, operations):
+        self.items = [{"index": i, "status": "skipped"} for i in range(len(operations))]
+        self.has_errors = False
+
+    def error(self, index, errors):
+        self.items[index] = {"index": index, "status": "error", "errors": errors}
+        self.has_errors = True
+
+    def done(self, index, status, task_id):
+        self.items[index] = {"index": index, "status": status, "id": task_id}
+
+
+def apply_operations(project, operations, batch_size=500):
+    """
+    Validate and apply a list of task operations on ``project``:
+
+        {"op": "create", "data": {...}}
+        {"op": "update", "id": 1, "data": {...}}
+        {"op": "delete", "id": 1}
+
+    Every item is validated first, with the tasks and assignees of the
+    whole batch each looked up in a single query. If any item fails,
+    nothing is written. Otherwise all writes happen in a single
+    transaction: ``bulk_create``, an ``UPDATE`` per ``batch_size`` tasks
+    (see ``_bulk_update``) and ``task.deletions.delete_tasks``. None of them
+    call ``save()`` or send model signals; their counter changes, tombstones,
+    events and invalidation are applied here in bulk.
+    """
+    result = BulkResult(operations)
+    creates, updates, deletes = [], [], []
+    seen_ids = set()
+
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get("op") not in OPERATIONS:
+            result.error(index, {"op": [f"Must be one of {', '.join(OPERATIONS)}."]})
+            continue
+        op = operation["op"]
+        if op == "create":
+            creates.append((index, operation.get("data")))
+            continue
+        task_id = operation.get("id")
+        if not isinstance(task_id, int) or isinstance(task_id, bool):
+            result.error(index, {"id": ["A task id is required."]})
+        elif task_id in seen_ids:
+            result.error(index, {"id": ["Task appears more than once."]})
+        elif op == "update":
+            seen_ids.add(task_id)
+            updates.append((index, task_id, operation.get("data")))
+        else:
+            seen_ids.add(task_id)
+            deletes.append((index, task_id))
+
+    creates = _validate(result, creates, partial=False)
+    updates = _validate(result, updates, partial=True)
+
+    tasks = Task.objects.filter(project=project).in_bulk(
+        [task_id for _, task_id, _ in updates] + [task_id for _, task_id in deletes]
+    )
+    for index, task_id, *_ in updates + deletes:
+        if task_id not in tasks:
+            result.error(index, {"id": ["Task not found in this project."]})
+
+    assignees = {
+        data["assigned_to"]
+        for _, *_, data in creates + updates
+        if data.get("assigned_to") is not None
+    }
+    members = set(
+        ProjectMember.objects.filter(
+            project=project, user_id__in=assignees
+        ).values_list("user_id", flat=True)
+    )
+    for index, *_, data in creates + updates:
+        user_id = data.get("assigned_to")
+        if user_id is not None and user_id not in members:
+            result.error(
+                index,
+                {"assigned_to": [f"User {user_id} is not a member of this project."]},
+            )
+
+    if result.has_errors:
+        return result
+
+    now = timezone.now()
+    new_tasks = [
+        Task(project=project, created_at=now, updated_at=now, **_model_fields(data))
+        for _, data in creates
+    ]
+    changed_tasks, changes = [], []
+    before = []
+    for _, task_id, data in updates:
+        task = tasks[task_id]
+        before.append(counters.current_state(task))
+        fields = _model_fields(data)
+        for field, value in fields.items():
+            setattr(task, field, value)
+        task.updated_at = now
+        changed_tasks.append(task)
+        changes.append((task.pk, fields))
+
+    with transaction.atomic(), counters.batch():
+        Task.objects.bulk_create(new_tasks, batch_size=batch_size)
+        for start in range(0, len(changes), batch_size):
+            _bulk_update(changes[start : start + batch_size], now)
+        counters.record(
+            counters.diff(
+                before,
+                [counters.current_state(task) for task in new_tasks + changed_tasks],
+            )
+        )
+        if deletes:
+            # Tombstones, events and counters of the deleted tasks too.
+            delete_tasks([tasks[task_id] for _, task_id in deletes])
+    invalidate("project", project.pk)
+    if new_tasks or changed_tasks:
+        publish_on_commit(
+            project.pk,
+            "task.bulk",
+            created=[task.pk for task in new_tasks],
+            updated=[task.pk for task in changed_tasks],
+        )
+
+    for (index, _), task in zip(creates, new_tasks):
+        result.done(index, "created", task.pk)
+    for index, task_id, _ in updates:
+        result.done(index, "updated", task_id)
+    for index, task_id in deletes:
+        result.done(index, "deleted", task_id)
+    return result
+
+
+def _bulk_update(changes, now):
+    """
+    Apply ``(pk, fields)`` changes in one ``UPDATE``. Unlike
+    ``bulk_update()``, which has a ``CASE`` branch per task for every field,
+    each field gets one branch per distinct value, and tasks that leave a
+    field alone keep it: setting one status on a thousand tasks costs one
+    branch rather than thousands.
+    """
+    values = defaultdict(lambda: defaultdict(list))
+    for pk, fields in changes:
+        for field, value in fields.items():
+            values[field][value].append(pk)
+    pks = [pk for pk, _ in changes]
+    assignments = {"updated_at": now}
+    for name, by_value in values.items():
+        field = Task._meta.get_field(name)
+        if len(by_value) == 1 and len(next(iter(by_value.values()))) == len(pks):
+            assignments[name] = Value(next(iter(by_value)), output_field=field)
+            continue
+        assignments[name] = Case(
+            *(
+                When(pk__in=value_pks, then=Value(value, output_field=field))
+                for value, value_pks in by_value.items()
+            ),
+            default=F(name),
+            output_field=field,
+        )
+    Task.objects.filter(pk__in=pks).update(**assignments)
+
+
+def _validate(result, items, partial):
+    """Validate the ``data`` of each item, returning the valid items."""
+    # One serializer instance validates every item, so its fields are only
+    # built once.
+    serializer = TaskBulkItemSerializer(partial=partial)
+    valid = []
+    for *item, data in items:
+        try:
+            valid.append((*item, serializer.run_validation(data)))
+        except ValidationError as exc:
+            result.error(item[0], exc.detail)
+    return valid
+
+
+def _model_fields(data):
+    fields = dict(data)
+    if "assigned_to" in fields:
+        fields["assigned_to_id"] = fields.pop("assigned_to")
+    return fields
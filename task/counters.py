@@ -0,0 +1,218 @@
+"""
+Denormalized task counts per project.
+
+Every task counts once towards its project's ``(status, priority)`` bucket
+in ``ProjectTaskCount`` and, while open and assigned, towards its
+assignee's ``ProjectAssigneeCount``. Writes apply only the difference
+between a task's old and new contributions as ``F()`` updates, so editing
+a title touches no counter and concurrent writers never lose an increment.
+
+``QuerySet.update()`` and raw SQL bypass this; ``rebuild_task_counts``
+verifies and repairs the counters.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from project.models import ProjectAssigneeCount, ProjectTaskCount
+from .models import Task
+
+COUNTED_FIELDS = ("project_id", "status", "priority", "assigned_to_id")
+
+
+def current_state(task):
+    return tuple(getattr(task, field) for field in COUNTED_FIELDS)
+
+
+def previous_state(task):
+    """
+    Return the counted fields of ``task`` as last read from or written to
+    the database, or None for a task that is not saved yet.
+    """
+    if task._state.adding:
+        return None
+    loaded = getattr(task, "_loaded_values", {})
+    if all(field in loaded for field in COUNTED_FIELDS):
+        return tuple(loaded[field] for field in COUNTED_FIELDS)
+    # Loaded with only()/defer(), or built by hand with an existing pk.
+    return Task.objects.filter(pk=task.pk).values_list(*COUNTED_FIELDS).first()
+
+
+def remember_state(task):
+    loaded = getattr(task, "_loaded_values", {})
+    loaded.update(zip(COUNTED_FIELDS, current_state(task)))
+    task._loaded_values = loaded
+
+
+def contributions(state):
+    project_id, status, priority, assignee_id = state
+    yield ProjectTaskCount, "count", {
+        "project_id": project_id,
+        "status": status,
+        "priority": priority,
+    }
+    if assignee_id is not None and status != "DONE":
+        yield ProjectAssigneeCount, "open_count", {
+            "project_id": project_id,
+            "user_id": assignee_id,
+        }
+
+
+def diff(old_states, new_states):
+    """Net counter changes for tasks moving from ``old_states`` to ``new_states``."""
+    deltas = Counter()
+    for sign, states in ((-1, old_states), (1, new_states)):
+        for state in states:
+            if state is None:
+                continue
+            for model, field, lookup in contributions(state):
+                deltas[model, field, tuple(sorted(lookup.items()))] += sign
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def apply(deltas):
+    # A fixed order keeps concurrent writers locking rows in the same order.
+    deltas = sorted(
+        ((key, delta) for key, delta in deltas.items() if delta),
+        key=lambda item: (item[0][0].__name__, item[0][2]),
+    )
+    if not deltas:
+        return
+    with transaction.atomic():
+        for (model, field, lookup), delta in deltas:
+            lookup = dict(lookup)
+            rows = model.objects.filter(**lookup)
+            # A missing row on decrement means the counters have drifted;
+            # leave that to a rebuild rather than create a negative count.
+            if rows.update(**{field: F(field) + delta}) or delta < 0:
+                continue
+            model.objects.bulk_create(
+                [model(**lookup, **{field: 0})], ignore_conflicts=True
+            )
+            rows.update(**{field: F(field) + delta})
+
+
+_batch = ContextVar("task_counter_batch", default=None)
+
+
+def record(deltas):
+    """Apply ``deltas`` now, or at the end of the enclosing ``batch()``."""
+    pending = _batch.get()
+    if pending is None:
+        apply(deltas)
+    else:
+        pending.update(deltas)
+
+
+@contextmanager
+def batch():
+    """
+    Collect the counter changes of many task writes, such as the per-row
+    delete signals of one ``QuerySet.delete()``, and apply their sum once
+    on exit. Nothing is applied if the block raises.
+    """
+    if _batch.get() is not None:
+        yield
+        return
+    pending = Counter()
+    token = _batch.set(pending)
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+    apply(pending)
+
+
+def expected_counts(project_ids=None):
+    """Count tasks from scratch, keyed like ``stored_counts``."""
+    tasks = Task.objects.order_by()
+    if project_ids is not None:
+        tasks = tasks.filter(project_id__in=project_ids)
+    counts = {}
+    by_bucket = tasks.values("project_id", "status", "priority").annotate(n=Count("pk"))
+    for row in by_bucket:
+        key = (ProjectTaskCount, row["project_id"], row["status"], row["priority"])
+        counts[key] = row["n"]
+    by_assignee = (
+        tasks.filter(assigned_to__isnull=False)
+        .filter(~Q(status="DONE"))
+        .values("project_id", "assigned_to_id")
+        .annotate(n=Count("pk"))
+    )
+    for row in by_assignee:
+        key = (ProjectAssigneeCount, row["project_id"], row["assigned_to_id"])
+        counts[key] = row["n"]
+    return counts
+
+
+def stored_counts(project_ids=None):
+    task_counts = ProjectTaskCount.objects.all()
+    assignee_counts = ProjectAssigneeCount.objects.all()
+    if project_ids is not None:
+        task_counts = task_counts.filter(project_id__in=project_ids)
+        assignee_counts = assignee_counts.filter(project_id__in=project_ids)
+    counts = {}
+    for project_id, status, priority, count in task_counts.values_list(
+        "project_id", "status", "priority", "count"
+    ):
+        counts[ProjectTaskCount, project_id, status, priority] = count
+    for project_id, user_id, count in assignee_counts.values_list(
+        "project_id", "user_id", "open_count"
+    ):
+        counts[ProjectAssigneeCount, project_id, user_id] = count
+    return counts
+
+
+def verify(project_ids=None):
+    """
+    Return ``{key: (stored, expected)}`` for every counter that is wrong.
+    Rows holding zero are equivalent to missing rows.
+    """
+    expected = expected_counts(project_ids)
+    stored = stored_counts(project_ids)
+    return {
+        key: (stored.get(key, 0), expected.get(key, 0))
+        for key in expected.keys() | stored.keys()
+        if stored.get(key, 0) != expected.get(key, 0)
+    }
+
+
+def rebuild(project_ids=None):
+    """
+    Replace the counters with fresh counts and return what ``verify``
+    reported beforehand. Task writes committed while the rebuild runs can
+    be missed, so run it when the projects are quiet or verify afterwards.
+    """
+    with transaction.atomic():
+        mismatches = verify(project_ids)
+        task_counts = ProjectTaskCount.objects.all()
+        assignee_counts = ProjectAssigneeCount.objects.all()
+        if project_ids is not None:
+            task_counts = task_counts.filter(project_id__in=project_ids)
+            assignee_counts = assignee_counts.filter(project_id__in=project_ids)
+        task_counts.delete()
+        assignee_counts.delete()
+
+        rows = {ProjectTaskCount: [], ProjectAssigneeCount: []}
+        for (model, project_id, *key), count in expected_counts(project_ids).items():
+            if model is ProjectTaskCount:
+                status, priority = key
+                rows[model].append(
+                    model(
+                        project_id=project_id,
+                        status=status,
+                        priority=priority,
+                        count=count,
+                    )
+                )
+            else:
+                rows[model].append(
+                    model(project_id=project_id, user_id=key[0], open_count=count)
+                )
+        for model, objs in rows.items():
+            model.objects.bulk_create(objs, batch_size=1000)
+    return mismatches
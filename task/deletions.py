@@ -0,0 +1,121 @@
+"""
+Side effects of deleting tasks and comments, applied once per delete.
+
+Every deleted task or comment leaves a tombstone for delta sync and a
+change event, and invalidates its project's cached responses; deleted
+tasks also leave the counters. One ``delete()``, or the cascade from a
+project or user, can remove thousands of rows, so the receivers in
+``task.signals`` collect them per delete rather than acting row by row.
+
+Django sends every ``pre_delete`` of a delete before its first
+``post_delete``, so the rows are collected on ``pre_delete``, keyed by the
+delete's ``origin``, and applied together on the first ``post_delete``:
+one insert for the tombstones, one invalidation per project and one
+update per changed counter, all inside the delete's transaction.
+
+``delete_tasks`` goes further for the bulk endpoint, which already holds
+the tasks: it applies the same side effects and deletes the comments and
+the tasks with one statement each, without loading the comments or
+sending a signal per row. That bypasses Django's deletion collector, so it
+is only done while comments are the only rows referring to tasks; after a
+new relation is added, it falls back to ``QuerySet.delete()`` until the
+relation is handled there too.
+"""
+
+from contextvars import ContextVar
+
+from django.db import models
+
+from config.response_cache import invalidate
+from project.events import publish_on_commit
+from . import counters
+from .models import Comment, Task, Tombstone
+
+_pending = ContextVar("task_deletions", default=None)
+
+
+class Deletions:
+    """The tasks and comments one delete removes, keyed by primary key."""
+
+    def __init__(self, origin):
+        # Held so that the id it is keyed by is not reused meanwhile.
+        self.origin = origin
+        self.tasks = {}
+        self.comments = {}
+        self.counted = {}
+
+    def add(self, instance):
+        if isinstance(instance, Task):
+            self.tasks[instance.pk] = instance.project_id
+            self.counted[instance.pk] = counters.previous_state(instance)
+        else:
+            self.comments[instance.pk] = (instance.project_id, instance.task_id)
+
+    def apply(self, batch_size=500):
+        deleted = [("task", pk, project_id) for pk, project_id in self.tasks.items()]
+        deleted += [
+            ("comment", pk, project_id, task_id)
+            for pk, (project_id, task_id) in self.comments.items()
+        ]
+        Tombstone.objects.bulk_create(
+            [
+                Tombstone(kind=kind, object_id=pk, project_id=project_id)
+                for kind, pk, project_id, *_ in deleted
+            ],
+            batch_size=batch_size,
+        )
+        for project_id in {project_id for _, _, project_id, *_ in deleted}:
+            invalidate("project", project_id)
+        for kind, pk, project_id, *task in deleted:
+            extra = {"task": task[0]} if task else {}
+            publish_on_commit(project_id, f"{kind}.deleted", id=pk, **extra)
+        counters.record(counters.diff(self.counted.values(), []))
+
+
+def delete_tasks(tasks, using="default"):
+    """
+    Delete ``tasks``, as loaded from the database, and their comments; see
+    the module docstring. Run it inside a transaction.
+    """
+    pks = [task.pk for task in tasks]
+    if not raw_deletable():
+        Task.objects.using(using).filter(pk__in=pks).delete()
+        return
+    deletions = Deletions(origin=None)
+    for task in tasks:
+        deletions.add(task)
+    comments = Comment.objects.using(using).filter(task_id__in=pks)
+    for pk, project_id, task_id in comments.values_list("pk", "project_id", "task_id"):
+        deletions.comments[pk] = (project_id, task_id)
+    comments._raw_delete(using)
+    Task.objects.using(using).filter(pk__in=pks)._raw_delete(using)
+    deletions.apply()
+
+
+def raw_deletable():
+    """Whether comments are the only rows referring to tasks, on cascade."""
+    relations = [
+        (field.related_model, field.field.name, field.on_delete)
+        for field in Task._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete
+    ]
+    return relations == [(Comment, "task", models.CASCADE)]
+
+
+def collect(origin, instance):
+    """Note ``instance`` as about to be deleted by the delete of ``origin``."""
+    pending = _pending.get()
+    if pending is None:
+        pending = {}
+        _pending.set(pending)
+    if id(origin) not in pending:
+        pending[id(origin)] = Deletions(origin)
+    pending[id(origin)].add(instance)
+
+
+def deleted(origin):
+    """Apply what the delete of ``origin`` collected, on its first row deleted."""
+    pending = _pending.get()
+    deletions = pending.pop(id(origin), None) if pending else None
+    if deletions is not None:
+        deletions.apply()
@@ -0,0 +1,102 @@
+import csv
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Task
+
+TASK_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "status",
+    "priority",
+    "assigned_to_id",
+    "due_date",
+    "created_at",
+    "updated_at",
+)
+COMMENT_FIELDS = ("id", "task_id", "user_id", "content", "created_at", "updated_at")
+CSV_FIELDS = (
+    "type",
+    "id",
+    "task_id",
+    "title",
+    "description",
+    "status",
+    "priority",
+    "assigned_to_id",
+    "user_id",
+    "content",
+    "due_date",
+    "created_at",
+    "updated_at",
+)
+
+
+def project_records(project_id, chunk_size=2000):
+    """
+    Yield ``(type, row)`` for every task and then every comment in the
+    project. Rows are read through server-side iteration in chunks of
+    ``chunk_size``, so memory use does not depend on the project's size.
+    """
+    tasks = (
+        Task.objects.filter(project_id=project_id)
+        .order_by("id")
+        .values(*TASK_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in tasks:
+        yield "task", row
+
+    comments = (
+        Comment.objects.filter(project_id=project_id)
+        .order_by("id")
+        .values(*COMMENT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in comments:
+        yield "comment", row
+
+
+def ndjson_lines(records):
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for kind, row in records:
+        yield encoder.encode({"type": kind, **row}) + "\n"
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.DictWriter(_Echo(), fieldnames=CSV_FIELDS)
+    yield writer.writeheader()
+    for kind, row in records:
+        yield writer.writerow({"type": kind, **row})
+
+
+def buffered(lines, size=64 * 1024):
+    """Join small strings into chunks of about ``size`` bytes."""
+    buffer, length = [], 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield "".join(buffer).encode()
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def gzipped(chunks):
+    """Compress a stream of bytes into a gzip stream as it is produced."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,35 @@
+import django_filters
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Task
+
+
+class ChoiceInFilter(django_filters.BaseInFilter, django_filters.ChoiceFilter):
+    pass
+
+
+class TaskFilter(django_filters.FilterSet):
+    status = ChoiceInFilter(choices=Task.STATUS_CHOICES)
+    priority = ChoiceInFilter(choices=Task.PRIORITY_CHOICES)
+    assignee = django_filters.NumberFilter(field_name="assigned_to")
+    due_before = django_filters.IsoDateTimeFilter(
+        field_name="due_date", lookup_expr="lt"
+    )
+    due_after = django_filters.IsoDateTimeFilter(
+        field_name="due_date", lookup_expr="gte"
+    )
+    overdue = django_filters.BooleanFilter(method="filter_overdue")
+
+    # Filters whose results change as time passes, without any write.
+    time_relative = frozenset({"overdue"})
+
+    class Meta:
+        model = Task
+        fields = ["status", "priority", "assignee", "due_before", "due_after"]
+
+    def filter_overdue(self, queryset, name, value):
+        overdue = Q(due_date__lt=timezone.now()) & ~Q(status="DONE")
+        if value:
+            return queryset.filter(overdue)
+        return queryset.exclude(overdue)
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from project.models import ProjectTaskCount
+from task import counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify the denormalized per-project task counters against the tasks "
+        "and rebuild them. Use --verify to only report differences."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project",
+            type=int,
+            action="append",
+            dest="projects",
+            help="Only this project; may be repeated.",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Report wrong counters and exit with an error instead of fixing them.",
+        )
+
+    def handle(self, *args, projects=None, verify=False, **options):
+        if verify:
+            mismatches = counters.verify(projects)
+        else:
+            mismatches = counters.rebuild(projects)
+
+        for (model, project_id, *key), (stored, expected) in sorted(
+            mismatches.items(), key=lambda item: (item[0][0].__name__, item[0][1:])
+        ):
+            kind = "tasks" if model is ProjectTaskCount else "open tasks of user"
+            self.stdout.write(
+                f"project {project_id} {kind} {'/'.join(map(str, key))}: "
+                f"stored {stored}, expected {expected}"
+            )
+
+        if verify and mismatches:
+            raise CommandError(f"{len(mismatches)} counters are wrong.")
+        if verify:
+            self.stdout.write(self.style.SUCCESS("All counters are correct."))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"Rebuilt counters, {len(mismatches)} were wrong.")
+            )
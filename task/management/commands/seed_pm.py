@@ -0,0 +1,405 @@
+import itertools
+import multiprocessing
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from project.models import Project, ProjectMember
+from task import counters
+from task.models import Comment, Task
+from task.search import deferred_indexing, restore_triggers
+from user.models import User
+
+WORDS = (
+    "api backend frontend database cache login signup payment invoice report "
+    "search export import migration deploy release review staging production "
+    "timeout retry queue worker email upload sync dashboard mobile settings "
+    "profile onboarding billing analytics permissions audit webhook"
+).split()
+
+
+def weights(value):
+    """Parse ``"TODO=5,DONE=3"`` into ``{"TODO": 5.0, "DONE": 3.0}``."""
+    try:
+        pairs = [item.split("=") for item in value.split(",")]
+        return {key.strip(): float(weight) for key, weight in pairs}
+    except ValueError:
+        raise ValueError(f"expected KEY=WEIGHT,...; got {value!r}")
+
+
+def zipf_weights(count, skew, rng):
+    """Zipf weights for ``count`` items in random order; 0 gives uniform."""
+    ranked = [1 / (rank**skew) for rank in range(1, count + 1)]
+    rng.shuffle(ranked)
+    return ranked
+
+
+def split(total, parts):
+    size, extra = divmod(total, parts)
+    return [size + (i < extra) for i in range(parts)]
+
+
+def sentence(rng, low, high):
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+def insert_rows(model, fields, rows):
+    """
+    INSERT ``rows`` of ``fields`` values with one ``executemany()``. Much
+    faster than ``bulk_create()``, which spends most of its time preparing
+    each value of each model instance.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(model._meta.get_field(field).column) for field in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    sql = (
+        f"INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+# Set in the parent before forking, so workers inherit it without pickling.
+_plan = None
+
+
+def seed_chunk(job):
+    """
+    Create one chunk of tasks and the comments on them, with ids from the
+    given starts. Runs in the command's process or in a forked worker.
+    """
+    task_id, task_count, comment_id, comment_count, seed = job
+    plan = _plan
+    rng = random.Random(seed)
+    adapt = connections[router.db_for_write(Task)].ops.adapt_datetimefield_value
+    now = timezone.now()
+    span = plan["days"] * 86400
+    statuses, status_weights = zip(*plan["statuses"].items())
+    priorities, priority_weights = zip(*plan["priorities"].items())
+    project_ids = rng.choices(
+        plan["project_ids"], cum_weights=plan["project_cum_weights"], k=task_count
+    )
+
+    tasks, created = [], []
+    for pk, project_id in enumerate(project_ids, task_id):
+        created_at = now - timedelta(seconds=rng.random() * span)
+        due_date = None
+        if rng.random() < 0.6:
+            due_date = adapt(created_at + timedelta(days=rng.randint(1, 60)))
+        assignee = None
+        if rng.random() < plan["assigned"]:
+            assignee = rng.choice(plan["members"][project_id])
+        tasks.append(
+            (
+                pk,
+                sentence(rng, 2, 6),
+                sentence(rng, 5, 30) if rng.random() < 0.8 else None,
+                rng.choices(statuses, status_weights)[0],
+                rng.choices(priorities, priority_weights)[0],
+                project_id,
+                assignee,
+                due_date,
+                adapt(created_at),
+                adapt(created_at),
+            )
+        )
+        created.append(created_at)
+
+    # A heavy tail of tasks collects most of the discussion.
+    discussed = [rng.paretovariate(plan["comment_skew"]) for _ in tasks]
+    comments = []
+    for pk, i in enumerate(
+        rng.choices(range(len(tasks)), weights=discussed, k=comment_count),
+        comment_id,
+    ):
+        age = (now - created[i]).total_seconds()
+        created_at = adapt(created[i] + timedelta(seconds=rng.random() * age))
+        comments.append(
+            (
+                pk,
+                tasks[i][0],
+                tasks[i][5],
+                rng.choice(plan["members"][tasks[i][5]]),
+                sentence(rng, 3, 40),
+                created_at,
+                created_at,
+            )
+        )
+
+    with transaction.atomic():
+        insert_rows(Task, TASK_FIELDS, tasks)
+        insert_rows(Comment, COMMENT_FIELDS, comments)
+    return task_count, comment_count
+
+
+TASK_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "status",
+    "priority",
+    "project",
+    "assigned_to",
+    "due_date",
+    "created_at",
+    "updated_at",
+)
+COMMENT_FIELDS = (
+    "id",
+    "task",
+    "project",
+    "user",
+    "content",
+    "created_at",
+    "updated_at",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users, projects, memberships, tasks and comments "
+        "with skewed distributions, for load and query-plan testing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--projects", type=int, default=200)
+        parser.add_argument("--tasks", type=int, default=100_000)
+        parser.add_argument("--comments", type=int, default=300_000)
+        parser.add_argument(
+            "--members",
+            type=int,
+            default=8,
+            help="Average members per project, owner included.",
+        )
+        parser.add_argument(
+            "--project-skew",
+            type=float,
+            default=1.0,
+            help="Zipf exponent of tasks per project and of user activity; "
+            "0 spreads them evenly.",
+        )
+        parser.add_argument(
+            "--comment-skew",
+            type=float,
+            default=1.5,
+            help="Pareto shape of comments per task; lower is more skewed.",
+        )
+        parser.add_argument(
+            "--statuses",
+            type=weights,
+            default="TODO=4,IN_PROGRESS=2,DONE=4",
+            help="Relative weights of task statuses.",
+        )
+        parser.add_argument(
+            "--priorities",
+            type=weights,
+            default="LOW=3,MEDIUM=5,HIGH=2",
+            help="Relative weights of task priorities.",
+        )
+        parser.add_argument(
+            "--assigned",
+            type=float,
+            default=0.8,
+            help="Fraction of tasks with an assignee.",
+        )
+        parser.add_argument(
+            "--days", type=int, default=365, help="Spread creation dates this far back."
+        )
+        parser.add_argument("--password", default="password")
+        parser.add_argument(
+            "--prefix",
+            default="seed",
+            help="Prefix of usernames and emails, to seed the same database twice.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Tasks per insert and transaction, with their comments.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Create tasks and comments in this many forked processes.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        global _plan
+
+        self.verbosity = options["verbosity"]
+        if options["users"] < 1 or options["projects"] < 1:
+            raise CommandError("--users and --projects must be at least 1.")
+        if options["comments"] and not options["tasks"]:
+            raise CommandError("Comments need tasks to go on.")
+        workers = options["workers"]
+        if workers > 1 and "fork" not in multiprocessing.get_all_start_methods():
+            raise CommandError("--workers needs the fork start method.")
+        if workers > 1 and connections[router.db_for_write(Task)].vendor == "sqlite":
+            raise CommandError("--workers needs a database with concurrent writers.")
+        for name, choices in (
+            ("statuses", Task.STATUS_CHOICES),
+            ("priorities", Task.PRIORITY_CHOICES),
+        ):
+            unknown = set(options[name]) - {value for value, _ in choices}
+            if unknown:
+                raise CommandError(f"Unknown {name}: {', '.join(sorted(unknown))}")
+
+        # A run killed while loading leaves the search index's insert
+        # triggers dropped; restore them, reindexing what it loaded, before
+        # deferred_indexing looks for rows to index.
+        restored = restore_triggers(router.db_for_write(Task))
+        if restored and self.verbosity:
+            self.stdout.write(
+                f"Restored the search triggers {', '.join(restored)} and "
+                f"rebuilt the search index."
+            )
+
+        rng = random.Random(options["seed"])
+        started = time.perf_counter()
+
+        users = self.create_users(rng, options)
+        activity = zipf_weights(len(users), options["project_skew"], rng)
+        projects, members = self.create_projects(rng, users, activity, options)
+        self.report("users, projects and members", started)
+
+        # More tasks for busier projects, in proportion to their team size
+        # and their Zipf weight.
+        project_ids = [project.pk for project in projects]
+        popularity = zipf_weights(len(projects), options["project_skew"], rng)
+        _plan = {
+            "project_ids": project_ids,
+            "project_cum_weights": list(
+                itertools.accumulate(
+                    weight * len(members[pk])
+                    for weight, pk in zip(popularity, project_ids)
+                )
+            ),
+            "members": members,
+            "statuses": options["statuses"],
+            "priorities": options["priorities"],
+            "assigned": options["assigned"],
+            "comment_skew": options["comment_skew"],
+            "days": options["days"],
+        }
+
+        # Ids are handed out up front, so chunks can be written in any order
+        # and by any worker. Nothing else should write tasks meanwhile.
+        task_id = (Task.objects.aggregate(Max("id"))["id__max"] or 0) + 1
+        comment_id = (Comment.objects.aggregate(Max("id"))["id__max"] or 0) + 1
+        chunks = max(1, -(-options["tasks"] // options["batch_size"]))
+        jobs = []
+        for task_count, comment_count in zip(
+            split(options["tasks"], chunks), split(options["comments"], chunks)
+        ):
+            jobs.append(
+                (task_id, task_count, comment_id, comment_count, rng.getrandbits(64))
+            )
+            task_id += task_count
+            comment_id += comment_count
+        started = time.perf_counter()
+        with deferred_indexing(router.db_for_write(Task)):
+            if workers > 1:
+                # Children must not share the parent's database connections.
+                connections.close_all()
+                context = multiprocessing.get_context("fork")
+                with context.Pool(workers) as pool:
+                    done = pool.imap_unordered(seed_chunk, jobs)
+                    self.progress(done, len(jobs))
+            else:
+                self.progress(map(seed_chunk, jobs), len(jobs))
+        self.report(
+            f"{options['tasks']} tasks and {options['comments']} comments", started
+        )
+
+        # Move the id sequences past the explicit ids, as loaddata does.
+        connection = connections[router.db_for_write(Task)]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Task, Comment]):
+                cursor.execute(sql)
+
+        # The inserts skip the signals that maintain the task counters.
+        started = time.perf_counter()
+        counters.rebuild(project_ids)
+        self.report("task counters", started)
+
+    def create_users(self, rng, options):
+        # One hash for every user; hashing each one would dominate the run.
+        password = make_password(options["password"])
+        prefix = options["prefix"]
+        return User.objects.bulk_create(
+            (
+                User(
+                    username=f"{prefix}{i}",
+                    email=f"{prefix}{i}@example.com",
+                    first_name=rng.choice(WORDS).title(),
+                    last_name=f"{prefix.title()}{i}",
+                    password=password,
+                )
+                for i in range(options["users"])
+            ),
+            batch_size=options["batch_size"],
+        )
+
+    def create_projects(self, rng, users, activity, options):
+        """Create projects and their members; return ``{project_id: [user_id]}``."""
+        cum_activity = list(itertools.accumulate(activity))
+        owners = rng.choices(users, cum_weights=cum_activity, k=options["projects"])
+        projects = Project.objects.bulk_create(
+            (
+                Project(
+                    name=sentence(rng, 1, 3),
+                    description=sentence(rng, 5, 20),
+                    owner=owner,
+                )
+                for owner in owners
+            ),
+            batch_size=options["batch_size"],
+        )
+
+        members, memberships = {}, []
+        for project in projects:
+            # Team sizes vary around the average, capped by the user count.
+            size = min(
+                len(users), max(1, round(rng.expovariate(1 / options["members"])))
+            )
+            team = {project.owner_id}
+            # Active users join more projects. Oversample rather than draw
+            # until the team is full, which could take long with a high skew;
+            # a team may come out a little smaller than drawn.
+            for user in rng.choices(users, cum_weights=cum_activity, k=size * 3):
+                if len(team) >= size:
+                    break
+                team.add(user.pk)
+            members[project.pk] = sorted(team)
+            for user_id in members[project.pk]:
+                if user_id == project.owner_id or rng.random() < 0.1:
+                    role = "ADMIN"
+                else:
+                    role = "MEMBER"
+                memberships.append(
+                    ProjectMember(project=project, user_id=user_id, role=role)
+                )
+        ProjectMember.objects.bulk_create(memberships, batch_size=options["batch_size"])
+        return projects, members
+
+    def progress(self, results, total):
+        for done, _ in enumerate(results, 1):
+            if self.verbosity > 1:
+                self.stdout.write(f"  chunk {done}/{total}")
+
+    def report(self, what, started):
+        if self.verbosity:
+            self.stdout.write(
+                f"Created {what} in {time.perf_counter() - started:.1f}s."
+            )
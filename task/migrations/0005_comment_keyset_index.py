@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task", "0004_task_filter_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["task", "created_at", "id"], name="comment_task_created_idx"
+            ),
+        ),
+    ]
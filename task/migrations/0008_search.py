@@ -0,0 +1,131 @@
+from django.db import migrations
+
+# See task.search for how the index is laid out.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE task_search USING fts5(
+        project, title, body, task_id UNINDEXED,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO task_search (rowid, project, title, body, task_id)
+    SELECT id * 2, 'p' || project_id, title, coalesce(description, ''), id
+    FROM task_task
+    """,
+    """
+    INSERT INTO task_search (rowid, project, title, body, task_id)
+    SELECT c.id * 2 + 1, 'p' || t.project_id, '', c.content, c.task_id
+    FROM task_comment c JOIN task_task t ON t.id = c.task_id
+    """,
+    """
+    CREATE TRIGGER task_search_task_insert AFTER INSERT ON task_task BEGIN
+        INSERT INTO task_search (rowid, project, title, body, task_id)
+        VALUES (
+            NEW.id * 2, 'p' || NEW.project_id, NEW.title,
+            coalesce(NEW.description, ''), NEW.id
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER task_search_task_update AFTER UPDATE ON task_task
+    WHEN OLD.title IS NOT NEW.title
+        OR OLD.description IS NOT NEW.description
+        OR OLD.project_id IS NOT NEW.project_id
+    BEGIN
+        UPDATE task_search
+        SET project = 'p' || NEW.project_id, title = NEW.title,
+            body = coalesce(NEW.description, '')
+        WHERE rowid = NEW.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER task_search_task_move AFTER UPDATE ON task_task
+    WHEN OLD.project_id IS NOT NEW.project_id
+    BEGIN
+        UPDATE task_search SET project = 'p' || NEW.project_id
+        WHERE rowid IN (SELECT id * 2 + 1 FROM task_comment WHERE task_id = NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER task_search_task_delete AFTER DELETE ON task_task BEGIN
+        DELETE FROM task_search WHERE rowid = OLD.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER task_search_comment_insert AFTER INSERT ON task_comment BEGIN
+        INSERT INTO task_search (rowid, project, title, body, task_id)
+        SELECT NEW.id * 2 + 1, 'p' || project_id, '', NEW.content, NEW.task_id
+        FROM task_task WHERE id = NEW.task_id;
+    END
+    """,
+    """
+    CREATE TRIGGER task_search_comment_update AFTER UPDATE ON task_comment
+    WHEN OLD.content IS NOT NEW.content OR OLD.task_id IS NOT NEW.task_id
+    BEGIN
+        UPDATE task_search
+        SET project = (SELECT 'p' || project_id FROM task_task WHERE id = NEW.task_id),
+            body = NEW.content, task_id = NEW.task_id
+        WHERE rowid = NEW.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER task_search_comment_delete AFTER DELETE ON task_comment BEGIN
+        DELETE FROM task_search WHERE rowid = OLD.id * 2 + 1;
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER task_search_task_insert",
+    "DROP TRIGGER task_search_task_update",
+    "DROP TRIGGER task_search_task_move",
+    "DROP TRIGGER task_search_task_delete",
+    "DROP TRIGGER task_search_comment_insert",
+    "DROP TRIGGER task_search_comment_update",
+    "DROP TRIGGER task_search_comment_delete",
+    "DROP TABLE task_search",
+]
+
+POSTGRESQL_FORWARD = [
+    """
+    ALTER TABLE task_task ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX task_search_vector_idx ON task_task USING gin (search_vector)",
+    """
+    ALTER TABLE task_comment ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX comment_search_vector_idx ON task_comment USING gin (search_vector)",
+]
+
+POSTGRESQL_BACKWARD = [
+    "ALTER TABLE task_task DROP COLUMN search_vector",
+    "ALTER TABLE task_comment DROP COLUMN search_vector",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task", "0007_assignee_due_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRESQL_FORWARD}),
+            run({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRESQL_BACKWARD}),
+        ),
+    ]
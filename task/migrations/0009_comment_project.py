@@ -0,0 +1,41 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def drop_task_move_trigger(apps, schema_editor):
+    # It reads task_comment, which SQLite refuses to rebuild under it;
+    # task.signals restores it after the migrate.
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TRIGGER IF EXISTS task_search_task_move")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("project", "0003_task_counters"),
+        ("task", "0008_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="project",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="comments",
+                to="project.project",
+            ),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE task_comment SET project_id = (
+                SELECT project_id FROM task_task WHERE task_task.id = task_comment.task_id
+            )
+            """,
+            migrations.RunSQL.noop,
+        ),
+        # Removing the field rebuilds task_comment on SQLite.
+        migrations.RunPython(migrations.RunPython.noop, drop_task_move_trigger),
+    ]
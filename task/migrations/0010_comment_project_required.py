@@ -0,0 +1,46 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def drop_task_move_trigger(apps, schema_editor):
+    # It reads task_comment, which SQLite refuses to rebuild under it;
+    # task.signals restores it after the migrate.
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TRIGGER IF EXISTS task_search_task_move")
+
+
+class Migration(migrations.Migration):
+    """
+    Separate from 0009_comment_project: PostgreSQL refuses to alter a table
+    with deferred foreign key checks pending from the backfill in the same
+    transaction.
+    """
+
+    dependencies = [
+        ("project", "0003_task_counters"),
+        ("task", "0009_comment_project"),
+    ]
+
+    operations = [
+        # Altering the field rebuilds task_comment on SQLite, dropping the
+        # search index's triggers on it; task.signals restores them too.
+        migrations.RunPython(drop_task_move_trigger, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="comment",
+            name="project",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="comments",
+                to="project.project",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["project", "updated_at", "id"],
+                name="comment_project_updated_idx",
+            ),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, drop_task_move_trigger),
+    ]
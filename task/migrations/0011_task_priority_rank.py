@@ -0,0 +1,51 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:58
+
+from django.db import migrations, models
+
+
+def drop_comment_triggers(apps, schema_editor):
+    # They read task_task, which SQLite refuses to rebuild under them;
+    # task.signals restores them after the migrate.
+    if schema_editor.connection.vendor == "sqlite":
+        for name in ("task_search_comment_insert", "task_search_comment_update"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task", "0010_comment_project_required"),
+    ]
+
+    operations = [
+        # Adding a stored generated field rebuilds task_task on SQLite,
+        # dropping the search index's triggers on it; task.signals restores
+        # them too.
+        migrations.RunPython(drop_comment_triggers, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="task",
+            name="task_project_priority_idx",
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="priority_rank",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=models.Case(
+                    models.When(priority="LOW", then=models.Value(0)),
+                    models.When(priority="MEDIUM", then=models.Value(1)),
+                    models.When(priority="HIGH", then=models.Value(2)),
+                    default=models.Value(3),
+                ),
+                output_field=models.SmallIntegerField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["project", "priority_rank", "due_date", "id"],
+                name="task_project_priority_idx",
+            ),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, drop_comment_triggers),
+    ]
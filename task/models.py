@@ -12,6 +12,9 @@ class Task(TimeStampedModel):
     ]
 
     PRIORITY_CHOICES = [("LOW", "Low"), ("MEDIUM", "Medium"), ("HIGH", "High")]
+    # Position of each priority in PRIORITY_CHOICES, which the priority
+    # ordering sorts by rather than by the stored strings.
+    PRIORITY_RANKS = {value: rank for rank, (value, _) in enumerate(PRIORITY_CHOICES)}
 
     title = models.CharField(max_length=128)
     description = models.TextField(blank=True, null=True)
@@ -24,15 +27,126 @@ class Task(TimeStampedModel):
         User, on_delete=models.SET_NULL, null=True, blank=True, related_name="tasks"
     )
     due_date = models.DateTimeField(null=True, blank=True)
+    priority_rank = models.GeneratedField(
+        expression=models.Case(
+            *[
+                models.When(priority=value, then=models.Value(rank))
+                for value, rank in PRIORITY_RANKS.items()
+            ],
+            default=models.Value(len(PRIORITY_RANKS)),
+        ),
+        output_field=models.SmallIntegerField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            # Back the keyset orderings in task.pagination.TaskKeysetPagination.
+            models.Index(
+                fields=["project", "created_at", "id"],
+                name="task_project_created_idx",
+            ),
+            models.Index(
+                fields=["project", "priority_rank", "due_date", "id"],
+                name="task_project_priority_idx",
+            ),
+            # Back the filters in task.filters.TaskFilter.
+            models.Index(
+                fields=["project", "status", "priority"],
+                name="task_project_status_idx",
+            ),
+            models.Index(fields=["project", "due_date"], name="task_project_due_idx"),
+            # Also backs the "my tasks" feed in task.views.MyTaskListAPIView,
+            # which seeks through one assignee's tasks by due date.
+            models.Index(
+                fields=["assigned_to", "status", "due_date", "id"],
+                name="task_assignee_due_idx",
+            ),
+            # Back the delta sync in task.sync.
+            models.Index(
+                fields=["project", "updated_at", "id"], name="task_project_updated_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} | {self.status}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Saving or deleting adjusts counters by the change from these values,
+        # see task.counters.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        loaded = getattr(self, "_loaded_values", {})
+        for field in self._meta.concrete_fields:
+            refreshed = (
+                fields is None or field.name in fields or field.attname in fields
+            )
+            if refreshed and field.attname in self.__dict__:
+                loaded[field.attname] = getattr(self, field.attname)
+        self._loaded_values = loaded
+
 
 class Comment(TimeStampedModel):
     content = models.TextField()
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="comments")
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="comments")
+    # The task's project, so that a project's comments are found without
+    # joining their tasks. Set from the task on save; tasks never move.
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="comments", db_index=False
+    )
+
+    class Meta:
+        indexes = [
+            # Back task.pagination.CommentKeysetPagination.
+            models.Index(
+                fields=["task", "created_at", "id"], name="comment_task_created_idx"
+            ),
+            models.Index(
+                fields=["task", "updated_at", "id"], name="comment_task_updated_idx"
+            ),
+            # Back the delta sync in task.sync.
+            models.Index(
+                fields=["project", "updated_at", "id"],
+                name="comment_project_updated_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} -> {self.task.title}"
+
+    def save(self, *args, **kwargs):
+        if self.project_id is None and self.task_id is not None:
+            self.project_id = self.task.project_id
+        super().save(*args, **kwargs)
+
+
+class Tombstone(TimeStampedModel):
+    """
+    Marks a deleted task or comment for delta sync clients. ``updated_at``
+    is the deletion time. ``project_id`` is a plain column rather than a
+    foreign key so that tombstones can be written while the project itself
+    is being deleted.
+    """
+
+    KIND_CHOICES = [("task", "Task"), ("comment", "Comment")]
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    project_id = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["project_id", "updated_at", "id"],
+                name="tombstone_project_updated_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted"
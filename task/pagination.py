@@ -0,0 +1,298 @@
+import base64
+import binascii
+import json
+
+from django.db import connections
+from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import BooleanField, F, Func, Q, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination:
+    """
+    Cursor pagination that seeks past the last row of the previous page
+    instead of using OFFSET, so a deep page costs the same as the first one.
+
+    ``orderings`` maps the values accepted in the ``ordering`` query
+    parameter to the fields making up the sort key. Prefix a field with
+    ``-`` to sort it descending; all fields sort the same way. The last
+    field must be unique (normally ``id``) so that every row has a distinct
+    position.
+
+    NULLs sort where the database puts them, last ascending on PostgreSQL
+    and first on SQLite, so that an index on the sort key serves the
+    ordering without a sort step.
+    """
+
+    orderings = {}
+    default_ordering = None
+    default_limit = 50
+    max_limit = 200
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    ordering_query_param = "ordering"
+    invalid_cursor_message = "Invalid cursor."
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.limit_query_param in params
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(self.ordering_query_param)
+        if ordering in self.orderings:
+            return ordering
+        return self.default_ordering
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        if limit <= 0:
+            return self.default_limit
+        return min(limit, self.max_limit)
+
+    def get_key(self, ordering):
+        fields = self.orderings[ordering]
+        descending = fields[0].startswith("-")
+        if any(field.startswith("-") != descending for field in fields):
+            raise ImproperlyConfigured(
+                f"Ordering {ordering!r} mixes ascending and descending fields."
+            )
+        return [field.lstrip("-") for field in fields], descending
+
+    def order_queryset(self, queryset, request):
+        return queryset.order_by(*self.orderings[self.get_ordering(request)])
+
+    def paginate_queryset(self, queryset, request):
+        rows = []
+        for run in self.page_querysets(queryset, request):
+            rows += run[: self.limit + 1 - len(rows)]
+            if len(rows) > self.limit:
+                break
+        return self.get_page(rows)
+
+    async def apaginate_queryset(self, queryset, request):
+        rows = []
+        for run in self.page_querysets(queryset, request):
+            rows += [row async for row in run[: self.limit + 1 - len(rows)]]
+            if len(rows) > self.limit:
+                break
+        return self.get_page(rows)
+
+    def fetch(self, queryset, request):
+        """Return the requested page, or every row in order if none was."""
+        if self.is_requested(request):
+            return self.paginate_queryset(queryset, request)
+        return list(self.order_queryset(queryset, request))
+
+    async def afetch(self, queryset, request):
+        if self.is_requested(request):
+            return await self.apaginate_queryset(queryset, request)
+        return [row async for row in self.order_queryset(queryset, request)]
+
+    def get_response(self, request, data):
+        """Wrap ``data`` from ``fetch`` as a page, or return it as is."""
+        if self.is_requested(request):
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def page_querysets(self, queryset, request):
+        """
+        Return the queries for the rows after the cursor, in order. The page
+        is read from them in turn, up to one row past it to peek ahead.
+        """
+        self.request = request
+        self.ordering = self.get_ordering(request)
+        self.key, self.descending = self.get_key(self.ordering)
+        self.limit = self.get_limit(request)
+
+        queryset = self.order_queryset(queryset, request)
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return [queryset]
+        position = self.decode_cursor(queryset, encoded)
+        nulls_first = (
+            connections[queryset.db].features.nulls_order_largest == self.descending
+        )
+        return [
+            queryset.filter(run)
+            for run in self.seek(queryset.model, self.key, position, nulls_first)
+        ]
+
+    def get_page(self, rows):
+        self.has_next = len(rows) > self.limit
+        page = rows[: self.limit]
+        self.last_position = self.get_position(page[-1]) if page else None
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.last_position)
+        )
+
+    def get_position(self, row):
+        if isinstance(row, dict):
+            return [row[name] for name in self.key]
+        return [getattr(row, name) for name in self.key]
+
+    def seek(self, model, key, position, nulls_first):
+        """
+        Return filters for the rows sorting strictly after ``position``, as
+        runs of consecutive rows in sort order.
+
+        Without nullable fields that is the row value comparison ``(a, b, c)
+        > (x, y, z)`` (``<`` when descending), which databases seek an index
+        on the key straight to. A nullable ``b`` splits it, since comparing
+        NULL is never true. Sorting NULLs last, after ``(x, y, z)`` come
+        ``a = x AND (b, c) > (y, z)``, then ``a = x AND b IS NULL``, then
+        ``(a) > (x)``; each seeks the index on its own.
+        """
+        nullable = [model._meta.get_field(name).null for name in key]
+        if True not in nullable:
+            return [KeyAfter(model, key, position, self.descending)] if key else []
+
+        split = nullable.index(True)
+        name, value = key[split], position[split]
+        is_null = Q(**{f"{name}__isnull": True})
+        rest = key[split + 1 :], position[split + 1 :]
+        if value is None:
+            runs = [is_null & run for run in self.seek(model, *rest, nulls_first)]
+            if nulls_first:
+                runs.append(~is_null)
+        else:
+            if True in nullable[split + 1 :]:
+                runs = [
+                    Q(**{name: value}) & run
+                    for run in self.seek(model, *rest, nulls_first)
+                ]
+                runs.append(KeyAfter(model, [name], [value], self.descending))
+            else:
+                runs = [KeyAfter(model, key[split:], position[split:], self.descending)]
+            if not nulls_first:
+                runs.append(is_null)
+
+        if split:
+            prefix, values = key[:split], position[:split]
+            same = Q(**dict(zip(prefix, values)))
+            runs = [same & run for run in runs]
+            runs.append(KeyAfter(model, prefix, values, self.descending))
+        return runs
+
+    def encode_cursor(self, position):
+        payload = {
+            "o": self.ordering,
+            "p": [
+                value.isoformat() if hasattr(value, "isoformat") else value
+                for value in position
+            ],
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, queryset, encoded):
+        try:
+            raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+            payload = json.loads(raw)
+            if payload["o"] != self.ordering or len(payload["p"]) != len(self.key):
+                raise ValueError
+            return [
+                None
+                if value is None
+                else queryset.model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.key, payload["p"])
+            ]
+        except (
+            binascii.Error,
+            DjangoValidationError,
+            KeyError,
+            TypeError,
+            ValueError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class KeyAfter(Func):
+    """
+    ``(a, b) > (x, y)`` over the fields ``key`` of ``model`` and the values
+    ``position``, or ``<`` when descending.
+    """
+
+    output_field = BooleanField()
+
+    def __init__(self, model, key, position, descending):
+        self.operator = "<" if descending else ">"
+        values = [
+            Value(value, output_field=model._meta.get_field(name))
+            for name, value in zip(key, position)
+        ]
+        super().__init__(*[F(name) for name in key], *values)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = [], []
+        for expression in self.get_source_expressions():
+            expression_sql, expression_params = compiler.compile(expression)
+            sql.append(expression_sql)
+            params.extend(expression_params)
+        half = len(sql) // 2
+        lhs, rhs = ", ".join(sql[:half]), ", ".join(sql[half:])
+        return f"({lhs}) {self.operator} ({rhs})", params
+
+
+class TaskKeysetPagination(KeysetPagination):
+    orderings = {
+        "created_at": ("created_at", "id"),
+        "-created_at": ("-created_at", "-id"),
+        "priority": ("priority_rank", "due_date", "id"),
+        "-priority": ("-priority_rank", "-due_date", "-id"),
+        "due_date": ("due_date", "id"),
+        "-due_date": ("-due_date", "-id"),
+    }
+    default_ordering = "created_at"
+
+
+class MyTaskKeysetPagination(KeysetPagination):
+    orderings = {
+        "due_date": ("due_date", "id"),
+        "-due_date": ("-due_date", "-id"),
+    }
+    default_ordering = "due_date"
+
+
+class CommentKeysetPagination(KeysetPagination):
+    orderings = {
+        "created_at": ("created_at", "id"),
+        "-created_at": ("-created_at", "-id"),
+    }
+    default_ordering = "created_at"
+
+
+def estimate_count(queryset, threshold=10_000):
+    """
+    Count ``queryset`` exactly while it has at most ``threshold`` rows and
+    estimate beyond that, returning ``(count, is_exact)``.
+
+    The exact count runs over a LIMITed subquery so it never scans more
+    than ``threshold + 1`` rows. Past that, PostgreSQL's planner estimate
+    is used; other databases report ``threshold + 1`` as a lower bound.
+    """
+    queryset = queryset.order_by()
+    count = queryset[: threshold + 1].count()
+    if count <= threshold:
+        return count, True
+
+    if connections[queryset.db].vendor == "postgresql":
+        plan = json.loads(queryset.explain(format="json"))
+        count = max(count, int(plan[0]["Plan"]["Plan Rows"]))
+    return count, False
@@ -1,5 +1,5 @@
 from rest_framework import permissions
-from project.models import Project
+from project.membership import get_membership
 from .models import Task
 
 
@@ -11,13 +11,30 @@ class IsProjectMember(permissions.BasePermission):
             task_id = view.kwargs.get("id")
             if not task_id:
                 return False
-            try:
-                project_id = Task.objects.get(pk=task_id).project_id
-            except Task.DoesNotExist:
+            task = self.tasks().filter(pk=task_id).first()
+            if task is None:
                 return False
-        return Project.objects.filter(
-            id=project_id, members__user=request.user
-        ).exists()
+            # Handed to the view's get_object so the task is only loaded once.
+            view.task = task
+            project_id = task.project_id
+        return get_membership(request).is_member(project_id)
+
+    async def ahas_permission(self, request, view):
+        project_id = view.kwargs.get("project_id")
+
+        if not project_id:
+            task_id = view.kwargs.get("id")
+            if not task_id:
+                return False
+            task = await self.tasks().filter(pk=task_id).afirst()
+            if task is None:
+                return False
+            view.task = task
+            project_id = task.project_id
+        return await get_membership(request).ais_member(project_id)
+
+    def tasks(self):
+        return Task.objects.select_related("project", "assigned_to")
 
 
 class IsCommentOwner(permissions.BasePermission):
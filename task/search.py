@@ -0,0 +1,303 @@
+"""
+Ranked full-text search over a project's tasks and comments.
+
+The index lives in the database and is kept current by the database
+itself, so bulk writes and ``QuerySet.update()`` are covered too (see
+migration ``0008_search``):
+
+* SQLite: an FTS5 table ``task_search`` filled by triggers. A task is row
+  ``2 * id`` and a comment row ``2 * id + 1``, so triggers update single
+  rows by rowid. The project is stored as an indexed ``p<id>`` token,
+  letting FTS5 intersect it with the search terms instead of filtering
+  every match afterwards.
+* PostgreSQL: generated ``search_vector`` columns on the task and comment
+  tables with GIN indexes. The columns are not model fields.
+
+Other databases fall back to unranked ``icontains`` matching.
+"""
+
+import re
+from contextlib import contextmanager, nullcontext
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+
+from .models import Comment, Task
+
+TERM_RE = re.compile(r"\w+")
+
+# The triggers migration 0008_search creates. SQLite drops a table's
+# triggers along with it when a migration rebuilds the table, as AlterField
+# and RemoveField do, so they are restored after every migrate; see
+# SQLiteSearch.restore_triggers.
+SQLITE_TRIGGERS = {
+    "task_search_task_insert": """
+        CREATE TRIGGER task_search_task_insert AFTER INSERT ON task_task BEGIN
+            INSERT INTO task_search (rowid, project, title, body, task_id)
+            VALUES (
+                NEW.id * 2, 'p' || NEW.project_id, NEW.title,
+                coalesce(NEW.description, ''), NEW.id
+            );
+        END
+    """,
+    "task_search_task_update": """
+        CREATE TRIGGER task_search_task_update AFTER UPDATE ON task_task
+        WHEN OLD.title IS NOT NEW.title
+            OR OLD.description IS NOT NEW.description
+            OR OLD.project_id IS NOT NEW.project_id
+        BEGIN
+            UPDATE task_search
+            SET project = 'p' || NEW.project_id, title = NEW.title,
+                body = coalesce(NEW.description, '')
+            WHERE rowid = NEW.id * 2;
+        END
+    """,
+    "task_search_task_move": """
+        CREATE TRIGGER task_search_task_move AFTER UPDATE ON task_task
+        WHEN OLD.project_id IS NOT NEW.project_id
+        BEGIN
+            UPDATE task_search SET project = 'p' || NEW.project_id
+            WHERE rowid IN (
+                SELECT id * 2 + 1 FROM task_comment WHERE task_id = NEW.id
+            );
+        END
+    """,
+    "task_search_task_delete": """
+        CREATE TRIGGER task_search_task_delete AFTER DELETE ON task_task BEGIN
+            DELETE FROM task_search WHERE rowid = OLD.id * 2;
+        END
+    """,
+    "task_search_comment_insert": """
+        CREATE TRIGGER task_search_comment_insert AFTER INSERT ON task_comment
+        BEGIN
+            INSERT INTO task_search (rowid, project, title, body, task_id)
+            SELECT NEW.id * 2 + 1, 'p' || project_id, '', NEW.content, NEW.task_id
+            FROM task_task WHERE id = NEW.task_id;
+        END
+    """,
+    "task_search_comment_update": """
+        CREATE TRIGGER task_search_comment_update AFTER UPDATE ON task_comment
+        WHEN OLD.content IS NOT NEW.content OR OLD.task_id IS NOT NEW.task_id
+        BEGIN
+            UPDATE task_search
+            SET project = (
+                    SELECT 'p' || project_id FROM task_task WHERE id = NEW.task_id
+                ),
+                body = NEW.content, task_id = NEW.task_id
+            WHERE rowid = NEW.id * 2 + 1;
+        END
+    """,
+    "task_search_comment_delete": """
+        CREATE TRIGGER task_search_comment_delete AFTER DELETE ON task_comment
+        BEGIN
+            DELETE FROM task_search WHERE rowid = OLD.id * 2 + 1;
+        END
+    """,
+}
+
+
+def search_terms(query):
+    """Split user input into plain word terms; operators are not supported."""
+    return TERM_RE.findall(query)
+
+
+class SQLiteSearch:
+    # bm25() weights for the columns project, title, body and task_id.
+    weights = "0.0, 10.0, 1.0, 0.0"
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def match_expression(self, project_id, terms):
+        # Every term must match; the last one is a prefix, for searching
+        # as the user types.
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += "*"
+        return f"project:p{int(project_id)} AND {{title body}}: ({' '.join(quoted)})"
+
+    # Triggers that index new rows; the others handle updates and deletes.
+    insert_triggers = ("task_search_task_insert", "task_search_comment_insert")
+
+    index_tasks = """
+        INSERT INTO task_search (rowid, project, title, body, task_id)
+        SELECT id * 2, 'p' || project_id, title, coalesce(description, ''), id
+        FROM task_task WHERE id > %s
+    """
+    index_comments = """
+        INSERT INTO task_search (rowid, project, title, body, task_id)
+        SELECT c.id * 2 + 1, 'p' || t.project_id, '', c.content, c.task_id
+        FROM task_comment c JOIN task_task t ON t.id = c.task_id
+        WHERE c.id > %s
+    """
+
+    @contextmanager
+    def defer_inserts(self):
+        """
+        Drop the insert triggers for the duration of a bulk load, then index
+        the new rows with one statement per table and restore the triggers.
+        The load may span several connections, so this cannot be one
+        transaction: if the process dies first, the triggers stay dropped
+        until ``restore_triggers``, which ``seed_pm`` and ``migrate`` run.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT coalesce(max(id), 0) FROM task_task")
+            (last_task,) = cursor.fetchone()
+            cursor.execute("SELECT coalesce(max(id), 0) FROM task_comment")
+            (last_comment,) = cursor.fetchone()
+            for name in self.insert_triggers:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        try:
+            yield
+        finally:
+            with transaction.atomic(using=self.connection.alias):
+                with self.connection.cursor() as cursor:
+                    cursor.execute(self.index_tasks, [last_task])
+                    cursor.execute(self.index_comments, [last_comment])
+                    for name in self.insert_triggers:
+                        cursor.execute(SQLITE_TRIGGERS[name])
+
+    def restore_triggers(self):
+        """
+        Re-create the index's missing triggers, if any, and return their
+        names. Rows written while one was missing may be out of date in
+        the index, so it is then rebuilt from the tables.
+        """
+        with self.connection.cursor() as cursor:
+            names = ["task_search", *SQLITE_TRIGGERS]
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name IN (%s)"
+                % ", ".join(["%s"] * len(names)),
+                names,
+            )
+            present = {name for (name,) in cursor.fetchall()}
+        if "task_search" not in present:
+            return []
+        missing = [name for name in SQLITE_TRIGGERS if name not in present]
+        if missing:
+            with transaction.atomic(using=self.connection.alias):
+                with self.connection.cursor() as cursor:
+                    for name in missing:
+                        cursor.execute(SQLITE_TRIGGERS[name])
+                    cursor.execute("DELETE FROM task_search")
+                    cursor.execute(self.index_tasks, [0])
+                    cursor.execute(self.index_comments, [0])
+        return missing
+
+    def search(self, project_id, terms, limit, offset):
+        sql = f"""
+            SELECT rowid, task_id, -bm25(task_search, {self.weights}) AS score
+            FROM task_search
+            WHERE task_search MATCH %s
+            ORDER BY bm25(task_search, {self.weights}), rowid
+            LIMIT %s OFFSET %s
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                sql, [self.match_expression(project_id, terms), limit, offset]
+            )
+            return [
+                ("comment" if rowid % 2 else "task", rowid // 2, task_id, score)
+                for rowid, task_id, score in cursor.fetchall()
+            ]
+
+
+class PostgreSQLSearch:
+    config = "english"
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def tsquery(self, terms):
+        return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+
+    def search(self, project_id, terms, limit, offset):
+        sql = """
+            WITH query AS (SELECT to_tsquery(%s::regconfig, %s) AS q)
+            SELECT kind, id, task_id, score FROM (
+                SELECT 'task' AS kind, t.id, t.id AS task_id,
+                       ts_rank_cd(t.search_vector, query.q) AS score
+                FROM task_task t, query
+                WHERE t.project_id = %s AND t.search_vector @@ query.q
+                UNION ALL
+                SELECT 'comment', c.id, c.task_id,
+                       ts_rank_cd(c.search_vector, query.q)
+                FROM task_comment c, query
+                WHERE c.project_id = %s AND c.search_vector @@ query.q
+            ) hits
+            ORDER BY score DESC, kind DESC, id
+            LIMIT %s OFFSET %s
+        """
+        params = [self.config, self.tsquery(terms), project_id, project_id]
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit, offset])
+            return cursor.fetchall()
+
+
+class FallbackSearch:
+    """Unranked substring matching for databases without a search index."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def search(self, project_id, terms, limit, offset):
+        tasks = Task.objects.filter(project_id=project_id)
+        comments = Comment.objects.filter(project_id=project_id)
+        for term in terms:
+            tasks = tasks.filter(
+                Q(title__icontains=term) | Q(description__icontains=term)
+            )
+            comments = comments.filter(content__icontains=term)
+        hits = [
+            ("task", pk, pk, None)
+            for pk in tasks.order_by("pk").values_list("pk", flat=True)[
+                : offset + limit
+            ]
+        ] + [
+            ("comment", pk, task_id, None)
+            for pk, task_id in comments.order_by("pk").values_list("pk", "task_id")[
+                : offset + limit
+            ]
+        ]
+        return hits[offset : offset + limit]
+
+
+BACKENDS = {"sqlite": SQLiteSearch, "postgresql": PostgreSQLSearch}
+
+
+def get_backend(using="default"):
+    connection = connections[using]
+    return BACKENDS.get(connection.vendor, FallbackSearch)(connection)
+
+
+def deferred_indexing(using="default"):
+    """
+    Return a context manager for bulk loads of tasks and comments that
+    indexes the new rows once at the end rather than row by row, where the
+    backend benefits. Nothing else may insert tasks or comments meanwhile.
+    """
+    backend = get_backend(using)
+    return getattr(backend, "defer_inserts", nullcontext)()
+
+
+def restore_triggers(using="default"):
+    """
+    Restore the search index's triggers where a migration dropped them,
+    returning their names; see ``SQLITE_TRIGGERS``.
+    """
+    backend = get_backend(using)
+    restore = getattr(backend, "restore_triggers", None)
+    return restore() if restore is not None else []
+
+
+def search_project(project_id, query, limit=20, offset=0):
+    """
+    Return up to ``limit`` ranked hits for ``query`` in the project,
+    skipping ``offset``, as ``(kind, id, task_id, score)`` tuples.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    # On a replica, when the request's reads go to one.
+    return get_backend(router.db_for_read(Task)).search(
+        project_id, terms, limit, offset
+    )
@@ -1,8 +1,13 @@
-from rest_framework import serializers
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from django.shortcuts import get_object_or_404
+from config.profiling import timed_serialization
 from .models import Task, Comment
 from user.models import User
 from project.models import Project
+from project.membership import get_membership
 from user.serializers import UserSerializer
 from project.serializers import ProjectSerializer
 
@@ -60,13 +65,13 @@ class TaskCreateSerializer(serializers.ModelSerializer):
         if not project:
             raise serializers.ValidationError("Project does not exist.")
 
-        if not project.members.filter(user_id=self.context["request"].user.id).exists():
+        membership = get_membership(self.context["request"])
+        if not membership.is_member(project.pk):
             raise serializers.ValidationError("You are not a member of this project.")
 
         assigned_user = data.get("assigned_to")
         if assigned_user:
-            is_member = project.members.filter(user_id=assigned_user.id).exists()
-            if not is_member:
+            if not membership.is_member(project.pk, assigned_user.pk):
                 raise serializers.ValidationError(
                     f"User {assigned_user.username} is not a member of this project."
                 )
@@ -80,31 +85,34 @@ class TaskCreateSerializer(serializers.ModelSerializer):
 
 
 class CommentSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    task = TaskSerializer(read_only=True)
+    """
+    Use with ``select_related("user", "task__project", "task__assigned_to")``
+    to avoid a query per related object.
+    """
+
+    user = serializers.SerializerMethodField()
+    task = serializers.SerializerMethodField()
 
     class Meta:
         model = Comment
         fields = ["id", "content", "user", "task", "created_at"]
 
-    def to_representation(self, instance):
-        rep = super().to_representation(instance)
-
-        rep["user"] = {
-            "id": instance.user.id,
-            "username": instance.user.username,
-        }
+    def get_user(self, instance):
+        return {"id": instance.user_id, "username": instance.user.username}
 
-        if instance.task and instance.task.project:
-            rep["task"] = {
-                "id": instance.task.project.id,
-                "title": instance.task.project.name,
-                "assigned_to": {
-                    "id": instance.task.assigned_to.id,
-                    "username": instance.task.assigned_to.username,
-                },
+    def get_task(self, instance):
+        task = instance.task
+        assigned_to = None
+        if task.assigned_to_id is not None:
+            assigned_to = {
+                "id": task.assigned_to_id,
+                "username": task.assigned_to.username,
             }
-        return rep
+        return {
+            "id": task.project_id,
+            "title": task.project.name,
+            "assigned_to": assigned_to,
+        }
 
 
 class CommentCreateSerializer(serializers.ModelSerializer):
@@ -117,9 +125,9 @@ class CommentCreateSerializer(serializers.ModelSerializer):
     def validate(self, data):
         task = self.context.get("task")
         comment = self.context.get("comment")
-        user = self.context["request"].user
+        membership = get_membership(self.context["request"])
         if task:
-            if not task.project.members.filter(user=user).exists():
+            if not membership.is_member(task.project_id):
                 raise serializers.ValidationError(
                     "You are not a member of this project."
                 )
@@ -131,3 +139,171 @@ class CommentCreateSerializer(serializers.ModelSerializer):
         validated_data["task"] = self.context["task"]
         validated_data["user"] = self.context["request"].user
         return super().create(validated_data)
+
+
+_datetime_field = serializers.DateTimeField(read_only=True)
+
+
+def datetime_formatter():
+    """
+    Return a function that formats datetimes exactly like DRF's
+    ``DateTimeField``, with the settings and current timezone looked up once
+    rather than per value.
+    """
+    if not settings.USE_TZ or api_settings.DATETIME_FORMAT.lower() != ISO_8601:
+        return _datetime_field.to_representation
+    tz = timezone.get_current_timezone()
+
+    def to_representation(value):
+        if not value:
+            return None
+        if value.tzinfo is None:
+            return _datetime_field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return to_representation
+
+
+class TaskRowSerializer:
+    """
+    Read-only fast path for ``TaskSerializer`` on list endpoints.
+
+    Works on ``queryset.values(*TaskRowSerializer.fields)`` rows instead of
+    model instances and bypasses DRF's per-field machinery, while producing
+    exactly the same output as ``TaskSerializer(many=True)``.
+    """
+
+    fields = (
+        "id",
+        "title",
+        "description",
+        "status",
+        "priority",
+        # Only for the keyset cursor of the priority orderings.
+        "priority_rank",
+        "project_id",
+        "due_date",
+        "created_at",
+        "assigned_to_id",
+        "assigned_to__first_name",
+        "assigned_to__last_name",
+        "assigned_to__username",
+        "assigned_to__email",
+        "assigned_to__date_joined",
+    )
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @property
+    @timed_serialization
+    def data(self):
+        to_datetime = datetime_formatter()
+        return [self.to_representation(row, to_datetime) for row in self.rows]
+
+    @staticmethod
+    def to_representation(row, to_datetime=_datetime_field.to_representation):
+        assigned_to = None
+        if row["assigned_to_id"] is not None:
+            assigned_to = {
+                "id": row["assigned_to_id"],
+                "first_name": row["assigned_to__first_name"],
+                "last_name": row["assigned_to__last_name"],
+                "username": row["assigned_to__username"],
+                "email": row["assigned_to__email"],
+                "date_joined": to_datetime(row["assigned_to__date_joined"]),
+            }
+        return {
+            "id": row["id"],
+            "title": row["title"],
+            "description": row["description"],
+            "status": row["status"],
+            "priority": row["priority"],
+            "project": row["project_id"],
+            "assigned_to": assigned_to,
+            "due_date": to_datetime(row["due_date"]),
+        }
+
+
+class MyTaskRowSerializer(TaskRowSerializer):
+    """``TaskRowSerializer`` plus the project's name, for cross-project feeds."""
+
+    fields = TaskRowSerializer.fields + ("project__name",)
+
+    @staticmethod
+    def to_representation(row, to_datetime=_datetime_field.to_representation):
+        data = TaskRowSerializer.to_representation(row, to_datetime)
+        data["project_name"] = row["project__name"]
+        return data
+
+
+class CommentRowSerializer:
+    """
+    Read-only fast path for ``CommentSerializer`` on list endpoints, working
+    on ``queryset.values(*CommentRowSerializer.fields)`` rows.
+    """
+
+    fields = (
+        "id",
+        "content",
+        "created_at",
+        "user_id",
+        "user__username",
+        "task__project_id",
+        "task__project__name",
+        "task__assigned_to_id",
+        "task__assigned_to__username",
+    )
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @property
+    @timed_serialization
+    def data(self):
+        to_datetime = datetime_formatter()
+        return [self.to_representation(row, to_datetime) for row in self.rows]
+
+    @staticmethod
+    def to_representation(row, to_datetime=_datetime_field.to_representation):
+        assigned_to = None
+        if row["task__assigned_to_id"] is not None:
+            assigned_to = {
+                "id": row["task__assigned_to_id"],
+                "username": row["task__assigned_to__username"],
+            }
+        return {
+            "id": row["id"],
+            "content": row["content"],
+            "user": {"id": row["user_id"], "username": row["user__username"]},
+            "task": {
+                "id": row["task__project_id"],
+                "title": row["task__project__name"],
+                "assigned_to": assigned_to,
+            },
+            "created_at": to_datetime(row["created_at"]),
+        }
+
+
+class TaskBulkItemSerializer(serializers.ModelSerializer):
+    """
+    Field validation for one create/update item of the bulk endpoint.
+    ``assigned_to`` is a plain user id; membership is checked for the whole
+    batch at once by ``task.bulk.apply_operations``.
+    """
+
+    assigned_to = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = Task
+        fields = [
+            "title",
+            "description",
+            "status",
+            "priority",
+            "assigned_to",
+            "due_date",
+        ]
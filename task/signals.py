@@ -0,0 +1,74 @@
+from django.db.models.signals import (
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from config.response_cache import invalidate
+from project.events import publish_on_commit
+from . import counters, deletions, search
+from .models import Comment, Task
+
+
+@receiver(post_save, sender=Task)
+def invalidate_task_responses(sender, instance, **kwargs):
+    invalidate("project", instance.project_id)
+
+
+@receiver(post_save, sender=Comment)
+def invalidate_comment_responses(sender, instance, **kwargs):
+    invalidate("project", instance.project_id)
+
+
+# Tombstones, events, invalidation and counters of deleted tasks and
+# comments are applied once per delete, see task.deletions.
+@receiver(pre_delete, sender=Task)
+@receiver(pre_delete, sender=Comment)
+def collect_deletion(sender, instance, origin=None, **kwargs):
+    deletions.collect(origin, instance)
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Comment)
+def apply_deletions(sender, instance, origin=None, **kwargs):
+    deletions.deleted(origin)
+
+
+@receiver(post_save, sender=Task)
+def publish_task_saved(sender, instance, created, **kwargs):
+    publish_on_commit(
+        instance.project_id,
+        "task.created" if created else "task.updated",
+        id=instance.pk,
+    )
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment_saved(sender, instance, created, **kwargs):
+    publish_on_commit(
+        instance.project_id,
+        "comment.created" if created else "comment.updated",
+        id=instance.pk,
+        task=instance.task_id,
+    )
+
+
+@receiver(pre_save, sender=Task)
+def capture_counted_state(sender, instance, **kwargs):
+    instance._counted_before = counters.previous_state(instance)
+
+
+@receiver(post_save, sender=Task)
+def count_task_saved(sender, instance, **kwargs):
+    before = getattr(instance, "_counted_before", None)
+    counters.record(counters.diff([before], [counters.current_state(instance)]))
+    counters.remember_state(instance)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    if sender.label == "task":
+        search.restore_triggers(using)
@@ -1,3 +1,1013 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+from collections import Counter
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, force_authenticate
+
+from config.response_cache import get_response_cache
+from project.membership import get_role_cache
+from project.models import Project, ProjectMember
+from user.models import User
+from user.testing import make_user
+from . import counters
+from .deletions import raw_deletable
+from .models import Comment, Task, Tombstone
+from .pagination import TaskKeysetPagination
+from .search import restore_triggers, search_project
+from .serializers import (
+    CommentRowSerializer,
+    CommentSerializer,
+    TaskRowSerializer,
+    TaskSerializer,
+)
+from .views import (
+    AsyncCommentListAPIView,
+    AsyncTaskDetailAPIView,
+    AsyncTaskListAPIView,
+    TaskBulkAPIView,
+    TaskListAPIView,
+)
+
+
+class TaskTestCase(TestCase):
+    def setUp(self):
+        # Rolled-back rows don't fire signals, so roles cached by a previous
+        # test could outlive it.
+        get_role_cache().clear()
+        cache.clear()
+        self.user = make_user("owner")
+        self.project = Project.objects.create(
+            name="Project", description="", owner=self.user
+        )
+        ProjectMember.objects.create(project=self.project, user=self.user, role="ADMIN")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.list_url = reverse("task-list-create", args=[self.project.pk])
+
+    def make_tasks(self, count, **kwargs):
+        now = timezone.now()
+        return [
+            Task.objects.create(
+                title=f"Task {i}",
+                project=self.project,
+                created_at=now + timedelta(seconds=i % 3),
+                **kwargs,
+            )
+            for i in range(count)
+        ]
+
+    def walk(self, params):
+        ids, url = [], self.list_url
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [task["id"] for task in response.data["results"]]
+            url, params = response.data["next"], None
+        return ids
+
+
+class TaskPaginationTests(TaskTestCase):
+    def test_unpaginated_by_default(self):
+        self.make_tasks(3)
+        response = self.client.get(self.list_url)
+        self.assertEqual(len(response.data), 3)
+
+    def test_walks_created_at_pages_without_gaps(self):
+        tasks = self.make_tasks(7)
+        expected = [t.pk for t in sorted(tasks, key=lambda t: (t.created_at, t.pk))]
+        self.assertEqual(self.walk({"limit": 2}), expected)
+        self.assertEqual(
+            self.walk({"limit": 3, "ordering": "-created_at"}), expected[::-1]
+        )
+
+    def test_walks_priority_pages_with_null_due_dates(self):
+        now = timezone.now()
+        for i, priority in enumerate(["HIGH", "LOW", "MEDIUM"] * 4):
+            Task.objects.create(
+                title=f"Task {i}",
+                project=self.project,
+                priority=priority,
+                due_date=None if i % 5 == 0 else now + timedelta(days=i % 4),
+            )
+        # NULL due dates sort where the database puts them.
+        nulls_last = connection.features.nulls_order_largest
+        expected_asc = [
+            t.pk
+            for t in sorted(
+                Task.objects.all(),
+                key=lambda t: (
+                    Task.PRIORITY_RANKS[t.priority],
+                    (t.due_date is None) == nulls_last,
+                    t.due_date or now,
+                    t.pk,
+                ),
+            )
+        ]
+        self.assertEqual(self.walk({"limit": 2, "ordering": "priority"}), expected_asc)
+        self.assertEqual(
+            self.walk({"limit": 2, "ordering": "-priority"}), expected_asc[::-1]
+        )
+
+    @mock.patch.object(TaskKeysetPagination, "max_limit", 2)
+    def test_limit_is_capped(self):
+        self.make_tasks(3)
+        response = self.client.get(self.list_url, {"limit": 10_000})
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIn("limit=2", response.data["next"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.list_url, {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+
+class TaskFilterTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.assignee = make_user("assignee")
+        ProjectMember.objects.create(project=self.project, user=self.assignee)
+        past, future = timezone.now() - timedelta(days=1), timezone.now() + timedelta(
+            days=1
+        )
+        self.overdue = Task.objects.create(
+            title="Overdue", project=self.project, due_date=past, priority="HIGH"
+        )
+        self.done = Task.objects.create(
+            title="Done", project=self.project, due_date=past, status="DONE"
+        )
+        self.upcoming = Task.objects.create(
+            title="Upcoming",
+            project=self.project,
+            due_date=future,
+            status="IN_PROGRESS",
+            assigned_to=self.assignee,
+        )
+        self.undated = Task.objects.create(title="Undated", project=self.project)
+
+    def ids(self, params):
+        response = self.client.get(self.list_url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return {task["id"] for task in response.data}
+
+    def test_filters(self):
+        self.assertEqual(
+            self.ids({"status": "DONE,IN_PROGRESS"}), {self.done.pk, self.upcoming.pk}
+        )
+        self.assertEqual(self.ids({"priority": "HIGH"}), {self.overdue.pk})
+        self.assertEqual(self.ids({"assignee": self.assignee.pk}), {self.upcoming.pk})
+        self.assertEqual(
+            self.ids({"due_before": timezone.now().isoformat()}),
+            {self.overdue.pk, self.done.pk},
+        )
+        self.assertEqual(
+            self.ids({"due_after": timezone.now().isoformat()}), {self.upcoming.pk}
+        )
+        self.assertEqual(self.ids({"overdue": "true"}), {self.overdue.pk})
+        self.assertEqual(
+            self.ids({"overdue": "false"}),
+            {self.done.pk, self.upcoming.pk, self.undated.pk},
+        )
+
+    def test_invalid_filter_value(self):
+        response = self.client.get(self.list_url, {"status": "NOPE"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("status", response.data)
+
+    def test_ordering_by_due_date(self):
+        response = self.client.get(self.list_url, {"ordering": "due_date"})
+        dated = [self.overdue.pk, self.done.pk, self.upcoming.pk]
+        self.assertEqual(
+            [task["id"] for task in response.data],
+            (
+                dated + [self.undated.pk]
+                if connection.features.nulls_order_largest
+                else [self.undated.pk] + dated
+            ),
+        )
+
+    def test_total_count_header(self):
+        response = self.client.get(self.list_url, {"status": "TODO", "count": "true"})
+        self.assertEqual(response["X-Total-Count"], "2")
+        self.assertNotIn("X-Total-Count-Estimated", response)
+
+        with mock.patch.object(TaskListAPIView, "exact_count_threshold", 1):
+            response = self.client.get(self.list_url, {"count": "true", "limit": 1})
+        self.assertEqual(response["X-Total-Count"], "2")
+        self.assertEqual(response["X-Total-Count-Estimated"], "true")
+
+
+class MembershipQueryTests(TaskTestCase):
+    def count_queries(self, method, url, data):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, format="json")
+        sql = [q["sql"] for q in ctx.captured_queries]
+        return response, {
+            "membership": sum('FROM "project_projectmember"' in q for q in sql),
+            "task": sum(
+                q.startswith("SELECT") and 'FROM "task_task"' in q for q in sql
+            ),
+        }
+
+    def test_task_patch_checks_membership_once(self):
+        task = Task.objects.create(title="Task", project=self.project)
+        response, counts = self.count_queries(
+            "patch", reverse("task-detail", args=[task.pk]), {"status": "DONE"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(counts, {"membership": 1, "task": 1})
+
+    def test_assigning_checks_assignee_membership(self):
+        task = Task.objects.create(title="Task", project=self.project)
+        outsider = make_user("outsider")
+        url = reverse("task-detail", args=[task.pk])
+
+        response, counts = self.count_queries(
+            "patch", url, {"assigned_to": self.user.pk}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(counts["membership"], 1)
+
+        response, counts = self.count_queries(
+            "patch", url, {"assigned_to": outsider.pk}
+        )
+        self.assertEqual(response.status_code, 400)
+        # The requester's role now comes from the cross-request cache.
+        self.assertEqual(counts["membership"], 1)
+
+    def test_non_member_is_rejected(self):
+        task = Task.objects.create(title="Task", project=self.project)
+        self.client.force_authenticate(make_user("outsider"))
+        response = self.client.patch(
+            reverse("task-detail", args=[task.pk]), {"status": "DONE"}
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_comment_create_checks_membership_once(self):
+        task = Task.objects.create(title="Task", project=self.project)
+        response, counts = self.count_queries(
+            "post", reverse("comment-list-create", args=[task.pk]), {"content": "Hi"}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(counts["membership"], 1)
+
+
+class RowSerializerTests(TaskTestCase):
+    def test_task_rows_match_task_serializer(self):
+        Task.objects.create(
+            title="Assigned",
+            description="Details",
+            project=self.project,
+            assigned_to=self.user,
+            due_date=timezone.now(),
+        )
+        Task.objects.create(title="Unassigned", project=self.project)
+        tasks = Task.objects.order_by("id")
+        self.assertEqual(
+            JSONRenderer().render(
+                TaskRowSerializer(tasks.values(*TaskRowSerializer.fields)).data
+            ),
+            JSONRenderer().render(TaskSerializer(tasks, many=True).data),
+        )
+
+    def test_comment_rows_match_comment_serializer(self):
+        task = Task.objects.create(
+            title="Task", project=self.project, assigned_to=self.user
+        )
+        Comment.objects.create(content="First", user=self.user, task=task)
+        Comment.objects.create(content="Second", user=self.user, task=task)
+        comments = Comment.objects.order_by("id")
+        self.assertEqual(
+            JSONRenderer().render(
+                CommentRowSerializer(comments.values(*CommentRowSerializer.fields)).data
+            ),
+            JSONRenderer().render(CommentSerializer(comments, many=True).data),
+        )
+
+
+class CommentListTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(title="Task", project=self.project)
+        self.list_url = reverse("comment-list-create", args=[self.task.pk])
+
+    def make_comments(self, count):
+        return [
+            Comment.objects.create(content=f"#{i}", user=self.user, task=self.task)
+            for i in range(count)
+        ]
+
+    def test_list_runs_one_query(self):
+        # The ETag aggregate and the comments themselves.
+        self.make_comments(2)
+        with self.assertNumQueries(2):
+            self.client.get(self.list_url)
+        self.make_comments(10)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_url)
+        self.assertEqual(len(response.data), 12)
+
+    def test_unassigned_task(self):
+        comment = self.make_comments(1)[0]
+        response = self.client.get(reverse("comment-detail", args=[comment.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data["task"]["assigned_to"])
+        self.assertIsNone(self.client.get(self.list_url).data[0]["task"]["assigned_to"])
+
+    def test_cursor_pagination(self):
+        comments = self.make_comments(5)
+        self.assertEqual(self.walk({"limit": 2}), [comment.pk for comment in comments])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.list_url, {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+
+class ProjectExportTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("project-export", args=[self.project.pk])
+        self.task = Task.objects.create(
+            title="Task, with comma", project=self.project, assigned_to=self.user
+        )
+        self.comment = Comment.objects.create(
+            content="Line one\nline two", user=self.user, task=self.task
+        )
+        other = Project.objects.create(name="Other", description="", owner=self.user)
+        Task.objects.create(title="Elsewhere", project=other)
+
+    def test_ndjson(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [(r["type"], r["id"]) for r in records],
+            [("task", self.task.pk), ("comment", self.comment.pk)],
+        )
+        self.assertEqual(records[0]["assigned_to_id"], self.user.pk)
+
+    def test_csv(self):
+        response = self.client.get(self.url, {"type": "csv"})
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(rows[0]["title"], "Task, with comma")
+        self.assertEqual(rows[1]["content"], "Line one\nline two")
+
+    def test_gzip(self):
+        response = self.client.get(self.url, {"gzip": "true"})
+        self.assertIn(".ndjson.gz", response["Content-Disposition"])
+        content = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(len(content.splitlines()), 2)
+
+    def test_requires_membership(self):
+        self.client.force_authenticate(make_user("outsider"))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_unknown_type(self):
+        self.assertEqual(self.client.get(self.url, {"type": "xml"}).status_code, 400)
+
+
+class TaskBulkTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("task-bulk", args=[self.project.pk])
+        self.outsider = make_user("outsider")
+
+    def post(self, operations):
+        return self.client.post(self.url, {"operations": operations}, format="json")
+
+    def test_applies_all_operations(self):
+        existing = self.make_tasks(2)
+        operations = [
+            {"op": "create", "data": {"title": f"New {i}", "assigned_to": self.user.pk}}
+            for i in range(50)
+        ] + [
+            {"op": "update", "id": existing[0].pk, "data": {"status": "DONE"}},
+            {"op": "delete", "id": existing[1].pk},
+        ]
+        # Includes the deleted task's tombstone and one update per changed
+        # counter, two of which are created here.
+        with self.assertNumQueries(21):
+            response = self.post(operations)
+        self.assertEqual(response.status_code, 200, response.data)
+        results = response.data["results"]
+        self.assertEqual(
+            [r["status"] for r in results], ["created"] * 50 + ["updated", "deleted"]
+        )
+        self.assertEqual(
+            Task.objects.filter(assigned_to=self.user, title__startswith="New").count(),
+            50,
+        )
+        existing[0].refresh_from_db()
+        self.assertEqual(existing[0].status, "DONE")
+        self.assertGreater(existing[0].updated_at, existing[0].created_at)
+        self.assertFalse(Task.objects.filter(pk=existing[1].pk).exists())
+
+    def test_large_batch_query_count(self):
+        tasks = self.make_tasks(400, assigned_to=self.user)
+        Comment.objects.bulk_create(
+            Comment(content="Hi", user=self.user, task=task, project=self.project)
+            for task in tasks[200:]
+            for _ in range(2)
+        )
+        operations = [
+            {"op": "update", "id": task.pk, "data": {"title": f"Renamed {i}"}}
+            for i, task in enumerate(tasks[:100])
+        ]
+        operations += [
+            {"op": "update", "id": task.pk, "data": {"status": "DONE"}}
+            for task in tasks[100:200]
+        ]
+        operations += [{"op": "delete", "id": task.pk} for task in tasks[200:]]
+        # The permission check and project, the tasks, one update, the
+        # comments, one delete each for comments and tasks, the tombstones
+        # in batches of 199 (SQLite's limit), the counters (one of them
+        # created) and two savepoints: none per task.
+        with self.assertNumQueries(20):
+            response = self.post(operations)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(Task.objects.filter(project=self.project).count(), 200)
+        self.assertEqual(Task.objects.filter(status="DONE").count(), 100)
+        self.assertEqual(
+            Task.objects.filter(title__startswith="Renamed", status="TODO").count(),
+            100,
+        )
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(
+            Counter(Tombstone.objects.values_list("kind", flat=True)),
+            {"task": 200, "comment": 400},
+        )
+        self.assertEqual(counters.verify(), {})
+
+    def test_deletes_cover_every_relation_to_tasks(self):
+        # Bulk deletes skip Django's collector while comments are the only
+        # rows referring to tasks. Handle a new relation in
+        # task.deletions.delete_tasks, or it falls back to the slow path.
+        self.assertTrue(raw_deletable())
+
+    def test_deletes_without_the_fast_path(self):
+        tasks = self.make_tasks(3)
+        Comment.objects.create(content="Hi", user=self.user, task=tasks[0])
+        with mock.patch("task.deletions.raw_deletable", return_value=False):
+            response = self.post([{"op": "delete", "id": task.pk} for task in tasks])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(
+            Counter(Tombstone.objects.values_list("kind", flat=True)),
+            {"task": 3, "comment": 1},
+        )
+        self.assertEqual(counters.verify(), {})
+
+    def test_any_error_rejects_the_batch(self):
+        other = Project.objects.create(name="Other", description="", owner=self.user)
+        foreign = Task.objects.create(title="Foreign", project=other)
+        response = self.post(
+            [
+                {"op": "create", "data": {"title": "Fine"}},
+                {"op": "create", "data": {"status": "NOPE"}},
+                {
+                    "op": "create",
+                    "data": {"title": "X", "assigned_to": self.outsider.pk},
+                },
+                {"op": "update", "id": foreign.pk, "data": {"title": "Stolen"}},
+                {"op": "rename"},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        results = response.data["results"]
+        self.assertEqual(
+            [r["status"] for r in results],
+            ["skipped", "error", "error", "error", "error"],
+        )
+        self.assertEqual(set(results[1]["errors"]), {"title", "status"})
+        self.assertIn("assigned_to", results[2]["errors"])
+        self.assertEqual(Task.objects.filter(project=self.project).count(), 0)
+
+    def test_operation_limit(self):
+        with mock.patch.object(TaskBulkAPIView, "max_operations", 1):
+            response = self.post([{"op": "delete", "id": 1}] * 2)
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskConditionalGetTests(TaskTestCase):
+    def assert_revalidates(self, url, change):
+        response = self.client.get(url)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_task_list(self):
+        task = self.make_tasks(2)[0]
+        self.assert_revalidates(self.list_url, lambda: task.delete())
+        self.assert_revalidates(
+            self.list_url + "?status=TODO", lambda: self.make_tasks(1)
+        )
+
+    def test_task_list_etag_varies_with_query(self):
+        self.make_tasks(1)
+        etag = self.client.get(self.list_url)["ETag"]
+        response = self.client.get(self.list_url, {"limit": 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_task_detail(self):
+        task = self.make_tasks(1)[0]
+        url = reverse("task-detail", args=[task.pk])
+        self.assert_revalidates(url, lambda: task.save())
+
+    def test_assignee_changes(self):
+        task = self.make_tasks(1, assigned_to=self.user)[0]
+
+        def rename():
+            self.user.first_name = "Renamed"
+            self.user.save(update_fields=["first_name"])
+
+        self.assert_revalidates(self.list_url, rename)
+        self.assert_revalidates(reverse("task-detail", args=[task.pk]), rename)
+
+    def test_comment_list(self):
+        task = self.make_tasks(1)[0]
+        Comment.objects.create(content="Hi", user=self.user, task=task)
+        url = reverse("comment-list-create", args=[task.pk])
+        self.assert_revalidates(url, lambda: self.project.save())
+
+
+class ResponseCacheTests(TaskTestCase):
+    def test_task_list_is_served_from_cache_until_a_write(self):
+        task = self.make_tasks(1)[0]
+        stats = get_response_cache().stats()
+        self.client.get(self.list_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(get_response_cache().stats()["hits"], stats["hits"] + 1)
+
+        Comment.objects.create(content="Hi", user=self.user, task=task)
+        with self.assertNumQueries(2):  # the ETag aggregate and the tasks
+            self.client.get(self.list_url)
+
+        self.client.post(
+            reverse("task-bulk", args=[self.project.pk]),
+            {"operations": [{"op": "create", "data": {"title": "Bulk"}}]},
+            format="json",
+        )
+        self.assertEqual(len(self.client.get(self.list_url).data), 2)
+
+    @override_settings(SINGLE_PROCESS=False)
+    def test_local_cache_needs_a_single_process(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "RESPONSE_CACHE"):
+            self.client.get(reverse("project-list"))
+        with self.settings(
+            RESPONSE_CACHE={"TIMEOUT": 0}, PROJECT_ROLE_CACHE={"TIMEOUT": 0}
+        ):
+            self.assertFalse(get_response_cache().enabled)
+            self.assertEqual(self.client.get(self.list_url).status_code, 200)
+
+    @override_settings(SINGLE_PROCESS=False)
+    def test_writes_skip_a_local_cache(self):
+        # Management commands and migrations write without a shared cache.
+        task = Task.objects.create(title="Task", project=self.project)
+        task.title = "Renamed"
+        task.save()
+        Comment.objects.create(content="Hi", user=self.user, task=task)
+        task.delete()
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(counters.verify(), {})
+
+    def test_time_relative_filters_are_not_cached(self):
+        self.make_tasks(1, due_date=timezone.now() + timedelta(hours=1))
+        self.assertEqual(self.client.get(self.list_url, {"overdue": "true"}).data, [])
+        later = timezone.now() + timedelta(hours=2)
+        with mock.patch("task.filters.timezone.now", return_value=later):
+            response = self.client.get(self.list_url, {"overdue": "true"})
+        self.assertEqual(len(response.data), 1)
+
+    def test_query_string_is_part_of_the_key(self):
+        self.make_tasks(2)
+        self.client.get(self.list_url)
+        response = self.client.get(self.list_url, {"limit": 1})
+        self.assertEqual(len(response.data["results"]), 1)
+
+
+@override_settings(TASK_SYNC={"OVERLAP_SECONDS": 0})
+class ProjectChangesTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("project-changes", args=[self.project.pk])
+
+    def sync(self, since=None, **params):
+        if since:
+            params["since"] = since
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def summary(self, changes):
+        return [
+            (c["type"], c["deleted"], c["id"] if c["deleted"] else c["data"]["id"])
+            for c in changes
+        ]
+
+    def test_returns_only_changes_after_the_token(self):
+        first, second = self.make_tasks(2)
+        comment = Comment.objects.create(content="Hi", user=self.user, task=first)
+        data = self.sync()
+        self.assertEqual(
+            self.summary(data["changes"]),
+            [
+                ("task", False, first.pk),
+                ("task", False, second.pk),
+                ("comment", False, comment.pk),
+            ],
+        )
+        token = data["next"]
+        self.assertEqual(self.sync(token)["changes"], [])
+
+        second.status = "DONE"
+        second.save()
+        comment_id, first_id = comment.pk, first.pk
+        comment.delete()
+        data = self.sync(token)
+        self.assertEqual(
+            self.summary(data["changes"]),
+            [("task", False, second.pk), ("comment", True, comment_id)],
+        )
+        self.assertEqual(data["changes"][0]["data"]["status"], "DONE")
+
+        first.delete()
+        self.assertEqual(
+            self.summary(self.sync(data["next"])["changes"]),
+            [("task", True, first_id)],
+        )
+
+    def test_deletes_are_recorded_once_per_delete(self):
+        tasks = self.make_tasks(40, assigned_to=self.user)
+        Comment.objects.bulk_create(
+            Comment(content="Hi", user=self.user, task=task, project=self.project)
+            for task in tasks
+            for _ in range(3)
+        )
+        # Reading the tasks and comments, the comments deleted 100 at a
+        # time, the tasks, one insert of tombstones and one update per
+        # changed counter in a savepoint.
+        with self.assertNumQueries(10):
+            Task.objects.filter(project=self.project).delete()
+        self.assertEqual(
+            Counter(Tombstone.objects.values_list("kind", flat=True)),
+            {"task": 40, "comment": 120},
+        )
+        self.assertEqual(counters.verify(), {})
+
+    def test_pages_through_ties(self):
+        tasks = self.make_tasks(5)
+        Task.objects.update(updated_at=tasks[0].updated_at)
+        seen, token, has_more = [], None, True
+        while has_more:
+            data = self.sync(token, limit=2)
+            seen += [c["data"]["id"] for c in data["changes"]]
+            token, has_more = data["next"], data["has_more"]
+        self.assertEqual(seen, [task.pk for task in tasks])
+
+    @override_settings(TASK_SYNC={"OVERLAP_SECONDS": 60})
+    def test_rereads_recent_changes_once_caught_up(self):
+        first = self.make_tasks(1)[0]
+        data = self.sync()
+        self.assertFalse(data["has_more"])
+        # A change whose transaction committed after the sync, though it
+        # was written before the last change that sync returned.
+        late = self.make_tasks(1)[0]
+        Task.objects.filter(pk=late.pk).update(
+            updated_at=first.updated_at - timedelta(seconds=1)
+        )
+        self.assertEqual(
+            self.summary(self.sync(data["next"])["changes"]),
+            [("task", False, late.pk), ("task", False, first.pk)],
+        )
+
+        # Pages before the last are not re-read.
+        data = self.sync(limit=1)
+        self.assertTrue(data["has_more"])
+        self.assertEqual(
+            self.summary(self.sync(data["next"], limit=1)["changes"]),
+            [("task", False, first.pk)],
+        )
+
+    def test_invalid_token(self):
+        response = self.client.get(self.url, {"since": "nope"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("since", response.data)
+
+
+class AsyncViewTests(TaskTestCase):
+    async def call(self, view, path, user=None, **kwargs):
+        request = AsyncRequestFactory().get(path)
+        force_authenticate(request, user or self.user)
+        return await view.as_view()(request, **kwargs)
+
+    async def test_list_matches_sync_view(self):
+        await sync_to_async(self.make_tasks)(5)
+        path = f"{self.list_url}?limit=2&ordering=-created_at"
+        response = await self.call(
+            AsyncTaskListAPIView, path, project_id=self.project.pk
+        )
+        self.assertEqual(response.status_code, 200)
+        await sync_to_async(cache.clear)()
+        expected = await sync_to_async(self.client.get)(path)
+        self.assertEqual(response.data, expected.data)
+
+    async def test_list_is_served_from_cache(self):
+        await sync_to_async(self.make_tasks)(2)
+        first = await self.call(
+            AsyncTaskListAPIView, self.list_url, project_id=self.project.pk
+        )
+        hits = get_response_cache().stats()["hits"]
+        second = await self.call(
+            AsyncTaskListAPIView, self.list_url, project_id=self.project.pk
+        )
+        self.assertEqual(get_response_cache().stats()["hits"], hits + 1)
+        self.assertEqual(second.data, first.data)
+
+    async def test_list_rejects_an_invalid_cursor(self):
+        path = f"{self.list_url}?cursor=garbage"
+        response = await self.call(
+            AsyncTaskListAPIView, path, project_id=self.project.pk
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_detail_checks_membership(self):
+        (task,) = await sync_to_async(self.make_tasks)(1)
+        path = reverse("task-detail", args=[task.pk])
+        response = await self.call(AsyncTaskDetailAPIView, path, id=task.pk)
+        self.assertEqual(response.data["id"], task.pk)
+
+        outsider = await sync_to_async(make_user)("outsider")
+        response = await self.call(AsyncTaskDetailAPIView, path, outsider, id=task.pk)
+        self.assertEqual(response.status_code, 403)
+
+    async def test_comment_list(self):
+        (task,) = await sync_to_async(self.make_tasks)(1)
+        await Comment.objects.acreate(task=task, user=self.user, content="Hi")
+        response = await self.call(
+            AsyncCommentListAPIView,
+            reverse("comment-list-create", args=[task.pk]),
+            task_id=task.pk,
+        )
+        self.assertEqual([c["content"] for c in response.data], ["Hi"])
+
+
+class TaskCounterTests(TaskTestCase):
+    def stats(self):
+        response = self.client.get(reverse("project-stats", args=[self.project.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counters_follow_task_changes(self):
+        assignee = make_user("assignee")
+        ProjectMember.objects.create(project=self.project, user=assignee)
+        low, high = self.make_tasks(2, assigned_to=assignee)
+        high.priority = "HIGH"
+        high.save()
+        self.client.patch(reverse("task-detail", args=[low.pk]), {"status": "DONE"})
+        self.make_tasks(1)
+        high.delete()
+
+        self.assertEqual(
+            self.stats(),
+            {
+                "total": 2,
+                "by_status": {"DONE": 1, "TODO": 1},
+                "by_priority": {"MEDIUM": 2},
+                "open_by_assignee": [],
+            },
+        )
+        self.assertEqual(counters.verify(), {})
+
+        response = self.client.get(
+            reverse("project-detail", args=[self.project.pk]), {"include": "stats"}
+        )
+        self.assertEqual(response.data["task_stats"]["total"], 2)
+
+    def test_bulk_operations_keep_counters_exact(self):
+        existing = self.make_tasks(3, assigned_to=self.user)
+        operations = [
+            {"op": "create", "data": {"title": "New", "priority": "HIGH"}},
+            {"op": "update", "id": existing[0].pk, "data": {"assigned_to": None}},
+            {"op": "update", "id": existing[1].pk, "data": {"status": "DONE"}},
+            {"op": "delete", "id": existing[2].pk},
+        ]
+        response = self.client.post(
+            reverse("task-bulk", args=[self.project.pk]),
+            {"operations": operations},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(counters.verify(), {})
+        self.assertEqual(self.stats()["total"], 3)
+
+    def test_rebuild_command(self):
+        self.make_tasks(2, assigned_to=self.user)
+        # QuerySet.update() bypasses the counters.
+        Task.objects.update(status="DONE")
+        with self.assertRaises(CommandError):
+            call_command("rebuild_task_counts", "--verify", stdout=io.StringIO())
+
+        out = io.StringIO()
+        call_command("rebuild_task_counts", stdout=out)
+        self.assertIn("3 were wrong", out.getvalue())
+        self.assertEqual(counters.verify(), {})
+        self.assertEqual(self.stats()["by_status"], {"DONE": 2})
+
+
+class MyTaskListTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("task-mine")
+        self.other_project = Project.objects.create(
+            name="Other", description="", owner=self.user
+        )
+        ProjectMember.objects.create(project=self.other_project, user=self.user)
+
+    def test_lists_own_tasks_across_projects_by_due_date(self):
+        now = timezone.now()
+        first = Task.objects.create(
+            title="First",
+            project=self.other_project,
+            assigned_to=self.user,
+            due_date=now,
+        )
+        second = Task.objects.create(
+            title="Second",
+            project=self.project,
+            assigned_to=self.user,
+            due_date=now + timedelta(days=1),
+            status="IN_PROGRESS",
+        )
+        undated = Task.objects.create(
+            title="Undated", project=self.project, assigned_to=self.user
+        )
+        Task.objects.create(title="Unassigned", project=self.project)
+        left = Project.objects.create(name="Left", description="", owner=self.user)
+        Task.objects.create(title="Former", project=left, assigned_to=self.user)
+
+        expected = [(first.pk, "Other"), (second.pk, "Project")]
+        if connection.features.nulls_order_largest:
+            expected.append((undated.pk, "Project"))
+        else:
+            expected.insert(0, (undated.pk, "Project"))
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"limit": 2})
+        results = response.data["results"]
+        response = self.client.get(response.data["next"])
+        results += response.data["results"]
+        self.assertEqual([(t["id"], t["project_name"]) for t in results], expected)
+
+        response = self.client.get(self.url, {"status": "IN_PROGRESS"})
+        self.assertEqual([t["id"] for t in response.data], [second.pk])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+
+class ProjectSearchTests(TaskTestCase):
+    def search(self, q, **params):
+        response = self.client.get(
+            reverse("project-search", args=[self.project.pk]), {"q": q, **params}
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def hits(self, q):
+        return [(hit["type"], hit["id"]) for hit in self.search(q)["results"]]
+
+    def test_ranks_tasks_and_comments(self):
+        in_title = Task.objects.create(title="Deploy the API", project=self.project)
+        in_description = Task.objects.create(
+            title="Release", description="Deploy after review", project=self.project
+        )
+        comment = Comment.objects.create(
+            task=in_description, user=self.user, content="Deployed to staging"
+        )
+        other = Project.objects.create(name="Other", description="", owner=self.user)
+        Task.objects.create(title="Deploy elsewhere", project=other)
+
+        # Title matches outrank body matches.
+        hits = self.hits("deploy")
+        self.assertEqual(hits[0], ("task", in_title.pk))
+        self.assertCountEqual(
+            hits[1:], [("task", in_description.pk), ("comment", comment.pk)]
+        )
+        # The last word matches as a prefix; every word must match.
+        self.assertEqual(self.hits("staging depl"), [("comment", comment.pk)])
+        result = self.search("staging")["results"][0]
+        self.assertEqual(result["title"], "Release")
+        self.assertEqual(result["excerpt"], "Deployed to staging")
+
+    def test_index_follows_writes(self):
+        task = Task.objects.create(title="Draft", project=self.project)
+        task.title = "Final"
+        task.save()
+        self.assertEqual(self.hits("draft"), [])
+        self.assertEqual(self.hits("final"), [("task", task.pk)])
+
+        # Triggers also see writes that bypass the ORM's save().
+        Task.objects.filter(pk=task.pk).update(description="Shipped")
+        self.assertEqual(self.hits("shipped"), [("task", task.pk)])
+        task.delete()
+        self.assertEqual(self.hits("final"), [])
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite's index has triggers")
+    def test_migrate_restores_dropped_triggers(self):
+        # As when a migration rebuilds the task table.
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER task_search_task_insert")
+        task = Task.objects.create(title="Unindexed", project=self.project)
+        self.assertEqual(self.hits("unindexed"), [])
+
+        emit_post_migrate_signal(verbosity=0, interactive=False, db="default")
+        self.assertEqual(self.hits("unindexed"), [("task", task.pk)])
+        self.assertEqual(restore_triggers(), [])
+
+    def test_pagination_and_validation(self):
+        for i in range(3):
+            Task.objects.create(title=f"Bug {i}", project=self.project)
+        page = self.search("bug", limit=2)
+        self.assertEqual(len(page["results"]), 2)
+        page = self.client.get(page["next"]).data
+        self.assertEqual((len(page["results"]), page["next"]), (1, None))
+
+        response = self.client.get(
+            reverse("project-search", args=[self.project.pk]), {"q": " ?! "}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class SeedCommandTests(TestCase):
+    def test_seeds_consistent_data(self):
+        call_command(
+            "seed_pm",
+            users=5,
+            projects=3,
+            tasks=50,
+            comments=100,
+            batch_size=20,
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Project.objects.count(), 3)
+        self.assertEqual(Task.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 100)
+        members = set(ProjectMember.objects.values_list("project", "user"))
+        for project_id, user_id in Task.objects.filter(
+            assigned_to__isnull=False
+        ).values_list("project", "assigned_to"):
+            self.assertIn((project_id, user_id), members)
+        for project_id, user_id in Comment.objects.values_list("task__project", "user"):
+            self.assertIn((project_id, user_id), members)
+        self.assertEqual(counters.verify(), {})
+
+        # Rows inserted with explicit ids are indexed, and new ones still get
+        # ids of their own and are indexed by the triggers.
+        task = Task.objects.order_by("id").last()
+        word = task.title.split()[0].lower()
+        hits = search_project(task.project_id, word, limit=100)
+        self.assertIn(task.pk, {task_id for _, _, task_id, _ in hits})
+        new = Task.objects.create(title="Zebra", project_id=task.project_id)
+        self.assertGreater(new.pk, task.pk)
+        self.assertEqual(search_project(task.project_id, "zebra")[0][1], new.pk)
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite triggers")
+    def test_restores_triggers_left_dropped(self):
+        # As a run killed while loading leaves them.
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER task_search_task_insert")
+        user = make_user("owner")
+        project = Project.objects.create(name="Project", owner=user)
+        task = Task.objects.create(title="Unindexed", project=project)
+        stdout = io.StringIO()
+        call_command("seed_pm", users=1, projects=1, tasks=5, comments=5, stdout=stdout)
+        self.assertIn("task_search_task_insert", stdout.getvalue())
+        self.assertEqual(search_project(project.pk, "unindexed")[0][1], task.pk)
+        self.assertEqual(restore_triggers(), [])
@@ -1,17 +1,54 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
+    AsyncCommentDetailAPIView,
+    AsyncCommentListAPIView,
+    AsyncTaskDetailAPIView,
+    AsyncTaskListAPIView,
     TaskListAPIView,
     TaskDetailAPIView,
+    TaskBulkAPIView,
+    MyTaskListAPIView,
+    ProjectChangesAPIView,
+    ProjectExportAPIView,
+    ProjectSearchAPIView,
     CommentListAPIView,
     CommentDetailAPIView,
 )
 
+if settings.ASYNC_API_VIEWS:
+    TaskListAPIView = AsyncTaskListAPIView
+    TaskDetailAPIView = AsyncTaskDetailAPIView
+    CommentListAPIView = AsyncCommentListAPIView
+    CommentDetailAPIView = AsyncCommentDetailAPIView
+
 urlpatterns = [
     path(
         "api/projects/<int:project_id>/tasks/",
         TaskListAPIView.as_view(),
         name="task-list-create",
     ),
+    path(
+        "api/projects/<int:project_id>/tasks/bulk/",
+        TaskBulkAPIView.as_view(),
+        name="task-bulk",
+    ),
+    path(
+        "api/projects/<int:project_id>/changes/",
+        ProjectChangesAPIView.as_view(),
+        name="project-changes",
+    ),
+    path(
+        "api/projects/<int:project_id>/export/",
+        ProjectExportAPIView.as_view(),
+        name="project-export",
+    ),
+    path(
+        "api/projects/<int:project_id>/search/",
+        ProjectSearchAPIView.as_view(),
+        name="project-search",
+    ),
+    path("api/tasks/mine/", MyTaskListAPIView.as_view(), name="task-mine"),
     path("api/tasks/<int:id>/", TaskDetailAPIView.as_view(), name="task-detail"),
     path(
         "api/tasks/<int:task_id>/comments/",
@@ -7,10 +7,21 @@ from rest_framework.mixins import (
 from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from drf_yasg.utils import swagger_auto_schema
 
+from asgiref.sync import sync_to_async
+
+from config.async_views import AsyncAPIView
+from config.conditional import Validator
+from config.replicas import replica_reads
+from config.response_cache import get_response_cache
+from project.membership import get_membership
+from django.db.models import Count, Max
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
 from .models import Task, Comment, Project
@@ -19,23 +30,107 @@ from .serializers import (
     TaskCreateSerializer,
     CommentSerializer,
     CommentCreateSerializer,
+    TaskRowSerializer,
+    MyTaskRowSerializer,
+    CommentRowSerializer,
 )
 from .permissions import IsProjectMember, IsCommentOwner
+from .pagination import (
+    CommentKeysetPagination,
+    MyTaskKeysetPagination,
+    TaskKeysetPagination,
+    estimate_count,
+)
+from .filters import TaskFilter
+from .bulk import apply_operations
+from .search import search_project, search_terms
+from .sync import changes_since
+from .export import buffered, csv_lines, gzipped, ndjson_lines, project_records
 
 
 class TaskListAPIView(APIView):
     permission_classes = [IsAuthenticated, IsProjectMember]
+    pagination_class = TaskKeysetPagination
+    filterset_class = TaskFilter
+    exact_count_threshold = 10_000
+    # Rows embed their assignee, so profile changes change the ETag.
+    aggregates = Validator.aggregates("updated_at", ["assigned_to"])
 
     @swagger_auto_schema(
         tags=["tasks"],
     )
+    @replica_reads
     def get(self, request, project_id):
-        try:
-            tasks = Task.objects.filter(project_id=project_id)
-            serializer = TaskSerializer(tasks, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        cache = get_response_cache()
+        cache_key = self.get_cache_key(
+            request, project_id, get_membership(request).role(project_id)
+        )
+        cached = cache.get(request, cache_key)
+        if cached is not None:
+            return cached
+
+        filterset = self.get_filterset(request, project_id)
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        stats = filterset.qs.order_by().aggregate(**self.aggregates)
+        validator = self.get_validator(request, stats)
+        not_modified = validator.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        paginator = self.pagination_class()
+        tasks = self.get_rows(filterset)
+        rows = paginator.fetch(tasks, request)
+        count = None
+        if self.count_requested(request):
+            count = estimate_count(tasks, self.exact_count_threshold)
+        response = self.build_response(request, paginator, rows, validator, count)
+        return cache.set(cache_key, response)
+
+    def get_cache_key(self, request, project_id, role):
+        parts = self.get_cache_key_parts(request, project_id, role)
+        if parts is None:
+            return None
+        return get_response_cache().make_key(*parts)
+
+    async def aget_cache_key(self, request, project_id, role):
+        parts = self.get_cache_key_parts(request, project_id, role)
+        if parts is None:
+            return None
+        return await get_response_cache().amake_key(*parts)
+
+    def get_cache_key_parts(self, request, project_id, role):
+        # No write would invalidate results that change as time passes.
+        if self.filterset_class.time_relative.intersection(request.query_params):
+            return None
+        return "tasks", "project", project_id, role, request.get_full_path()
+
+    def get_filterset(self, request, project_id):
+        return self.filterset_class(
+            request.query_params,
+            queryset=Task.objects.filter(project_id=project_id),
+        )
+
+    def get_validator(self, request, stats):
+        return Validator.from_stats(stats, request.get_full_path())
+
+    def get_rows(self, filterset):
+        return filterset.qs.values(*TaskRowSerializer.fields)
+
+    def build_response(self, request, paginator, rows, validator, count=None):
+        response = paginator.get_response(request, TaskRowSerializer(rows).data)
+        if count is not None:
+            self.set_count(response, *count)
+        return validator.apply(response)
+
+    def count_requested(self, request):
+        return request.query_params.get("count") in ("1", "true")
+
+    def set_count(self, response, count, exact):
+        response["X-Total-Count"] = count
+        if not exact:
+            response["X-Total-Count-Estimated"] = "true"
 
     @swagger_auto_schema(
         tags=["tasks"],
@@ -55,6 +150,90 @@ class TaskListAPIView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class MyTaskListAPIView(APIView):
+    """
+    Tasks assigned to the requesting user across all of their projects,
+    sorted by due date. Accepts the ``TaskFilter`` filters.
+    """
+
+    permission_classes = [IsAuthenticated]
+    pagination_class = MyTaskKeysetPagination
+    filterset_class = TaskFilter
+
+    @swagger_auto_schema(
+        tags=["tasks"],
+    )
+    @replica_reads
+    def get(self, request):
+        paginator = self.pagination_class()
+        filterset = self.filterset_class(
+            request.query_params,
+            queryset=Task.objects.filter(
+                assigned_to=request.user, project__members__user=request.user
+            ),
+        )
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Rows embed their project's name and assignee, so renames change
+        # the ETag too.
+        stats = filterset.qs.order_by().aggregate(
+            **Validator.aggregates("updated_at", ["project", "assigned_to"])
+        )
+        validator = Validator.from_stats(stats, request.get_full_path())
+        not_modified = validator.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        tasks = filterset.qs.values(*MyTaskRowSerializer.fields)
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(tasks, request)
+            serializer = MyTaskRowSerializer(page)
+            return validator.apply(paginator.get_paginated_response(serializer.data))
+
+        serializer = MyTaskRowSerializer(paginator.order_queryset(tasks, request))
+        return validator.apply(Response(serializer.data, status=status.HTTP_200_OK))
+
+
+class TaskBulkAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsProjectMember]
+    max_operations = 10_000
+
+    @swagger_auto_schema(
+        tags=["tasks"],
+    )
+    def post(self, request, project_id):
+        try:
+            project = get_object_or_404(Project, pk=project_id)
+            operations = request.data.get("operations")
+            if not isinstance(operations, list) or not operations:
+                return Response(
+                    {"operations": ["A non-empty list of operations is required."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if len(operations) > self.max_operations:
+                return Response(
+                    {
+                        "operations": [
+                            f"At most {self.max_operations} operations are allowed."
+                        ]
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            result = apply_operations(project, operations)
+            return Response(
+                {"results": result.items},
+                status=(
+                    status.HTTP_400_BAD_REQUEST
+                    if result.has_errors
+                    else status.HTTP_200_OK
+                ),
+            )
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
 class TaskDetailAPIView(APIView):
     permission_classes = [IsAuthenticated, IsProjectMember]
 
@@ -62,19 +241,42 @@ class TaskDetailAPIView(APIView):
         tags=["tasks"],
     )
     def get_object(self, id):
-        return get_object_or_404(Task, pk=id)
+        task = getattr(self, "task", None)
+        if task is not None and task.pk == id:
+            return task
+        return get_object_or_404(self.get_queryset(), pk=id)
+
+    def get_queryset(self):
+        return Task.objects.select_related("project", "assigned_to")
+
+    def get_validator(self, task):
+        # The task embeds its assignee, so profile changes change the ETag.
+        assignee = task.assigned_to
+        stats = {
+            "latest": task.updated_at,
+            "assigned_to_latest": assignee.updated_at if assignee else None,
+        }
+        return Validator.from_stats(stats, task.pk)
 
     @swagger_auto_schema(
         tags=["tasks"],
     )
+    @replica_reads
     def get(self, request, id):
         try:
-            task = self.get_object(id)
-            serializer = TaskSerializer(task)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return self.build_response(request, self.get_object(id))
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    def build_response(self, request, task):
+        validator = self.get_validator(task)
+        not_modified = validator.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = TaskSerializer(task)
+        return validator.apply(Response(serializer.data, status=status.HTTP_200_OK))
+
     @swagger_auto_schema(
         tags=["tasks"],
         request_body=TaskCreateSerializer,
@@ -125,19 +327,185 @@ class TaskDetailAPIView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ProjectExportAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsProjectMember]
+    chunk_size = 2000
+    writers = {
+        "ndjson": (ndjson_lines, "application/x-ndjson"),
+        "csv": (csv_lines, "text/csv"),
+    }
+
+    @swagger_auto_schema(
+        tags=["tasks"],
+    )
+    def get(self, request, project_id):
+        try:
+            export_type = request.query_params.get("type", "ndjson")
+            if export_type not in self.writers:
+                return Response(
+                    {"error": f"Unsupported export type '{export_type}'."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            writer, content_type = self.writers[export_type]
+            filename = f"project-{project_id}.{export_type}"
+
+            stream = buffered(writer(project_records(project_id, self.chunk_size)))
+            if request.query_params.get("gzip") in ("1", "true"):
+                stream = gzipped(stream)
+                content_type = "application/gzip"
+                filename += ".gz"
+
+            response = StreamingHttpResponse(stream, content_type=content_type)
+            response["Content-Disposition"] = f'attachment; filename="{filename}"'
+            return response
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ProjectChangesAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsProjectMember]
+    default_limit = 500
+    max_limit = 2000
+
+    @swagger_auto_schema(
+        tags=["tasks"],
+    )
+    def get(self, request, project_id):
+        try:
+            try:
+                limit = int(request.query_params.get("limit", self.default_limit))
+            except ValueError:
+                limit = self.default_limit
+            limit = min(max(limit, 1), self.max_limit)
+
+            changes, token, has_more = changes_since(
+                project_id, request.query_params.get("since"), limit
+            )
+            return Response(
+                {"changes": changes, "next": token, "has_more": has_more},
+                status=status.HTTP_200_OK,
+            )
+        except ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ProjectSearchAPIView(APIView):
+    """
+    Ranked full-text search over the project's task titles, descriptions
+    and comments. Every word in ``q`` must match; the last one may be a
+    prefix.
+    """
+
+    permission_classes = [IsAuthenticated, IsProjectMember]
+    default_limit = 20
+    max_limit = 100
+    excerpt_length = 200
+
+    @swagger_auto_schema(
+        tags=["tasks"],
+    )
+    @replica_reads
+    def get(self, request, project_id):
+        try:
+            query = request.query_params.get("q", "")
+            if not search_terms(query):
+                return Response(
+                    {"q": ["A search query is required."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            try:
+                limit = int(request.query_params.get("limit", self.default_limit))
+                offset = int(request.query_params.get("offset", 0))
+            except ValueError:
+                limit, offset = self.default_limit, 0
+            limit = min(max(limit, 1), self.max_limit)
+            offset = max(offset, 0)
+
+            hits = search_project(project_id, query, limit + 1, offset)
+            has_next = len(hits) > limit
+            hits = hits[:limit]
+
+            titles = dict(
+                Task.objects.filter(
+                    pk__in={task_id for _, _, task_id, _ in hits}
+                ).values_list("pk", "title")
+            )
+            comment_ids = [pk for kind, pk, _, _ in hits if kind == "comment"]
+            contents = dict(
+                Comment.objects.filter(pk__in=comment_ids).values_list("pk", "content")
+                if comment_ids
+                else []
+            )
+            results = [
+                {
+                    "type": kind,
+                    "id": pk,
+                    "task": task_id,
+                    "title": titles.get(task_id),
+                    "excerpt": (
+                        contents.get(pk, "")[: self.excerpt_length]
+                        if kind == "comment"
+                        else None
+                    ),
+                    "score": score,
+                }
+                for kind, pk, task_id, score in hits
+            ]
+
+            next_link = None
+            if has_next:
+                url = request.build_absolute_uri()
+                url = replace_query_param(url, "limit", limit)
+                next_link = replace_query_param(url, "offset", offset + limit)
+            return Response(
+                {"results": results, "next": next_link}, status=status.HTTP_200_OK
+            )
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
 class CommentListAPIView(APIView):
     permission_classes = [IsAuthenticated, IsCommentOwner]
+    pagination_class = CommentKeysetPagination
+    aggregates = {
+        "latest": Max("comments__updated_at"),
+        "count": Count("comments"),
+        "task_latest": Max("updated_at"),
+        "project_latest": Max("project__updated_at"),
+        "user_latest": Max("comments__user__updated_at"),
+        "assigned_to_latest": Max("assigned_to__updated_at"),
+    }
 
     @swagger_auto_schema(
         tags=["comments"],
     )
+    @replica_reads
     def get(self, request, task_id):
-        try:
-            comment = Comment.objects.filter(task_id=task_id)
-            serializer = CommentSerializer(comment, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # Comments embed their author, their task's project and its
+        # assignee, so changes to those rows must change the ETag too.
+        stats = Task.objects.filter(pk=task_id).aggregate(**self.aggregates)
+        validator = self.get_validator(request, stats)
+        not_modified = validator.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        paginator = self.pagination_class()
+        rows = paginator.fetch(self.get_rows(task_id), request)
+        return self.build_response(request, paginator, rows, validator)
+
+    def get_validator(self, request, stats):
+        return Validator.from_stats(stats, request.get_full_path())
+
+    def get_rows(self, task_id):
+        return Comment.objects.filter(task_id=task_id).values(
+            *CommentRowSerializer.fields
+        )
+
+    def build_response(self, request, paginator, rows, validator):
+        response = paginator.get_response(request, CommentRowSerializer(rows).data)
+        return validator.apply(response)
 
     @swagger_auto_schema(
         tags=["comments"],
@@ -164,11 +532,17 @@ class CommentDetailAPIView(APIView):
         tags=["comments"],
     )
     def get_object(self, id):
-        return get_object_or_404(Comment, pk=id)
+        return get_object_or_404(self.get_queryset(), pk=id)
+
+    def get_queryset(self):
+        return Comment.objects.select_related(
+            "user", "task__project", "task__assigned_to"
+        )
 
     @swagger_auto_schema(
         tags=["comments"],
     )
+    @replica_reads
     def get(self, request, id):
         try:
             comment = self.get_object(id)
@@ -227,3 +601,101 @@ class CommentDetailAPIView(APIView):
             )
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Native async versions of the read endpoints, routed instead of the sync
+# views when ``ASYNC_API_VIEWS`` is on. Their GET handlers and permission
+# checks run on the event loop with the async ORM and cache API, sharing
+# everything else with the sync views; writes keep the sync handlers, which
+# AsyncAPIView runs in a worker thread.
+
+
+class AsyncTaskListAPIView(AsyncAPIView, TaskListAPIView):
+    @swagger_auto_schema(
+        tags=["tasks"],
+    )
+    @replica_reads
+    async def get(self, request, project_id):
+        cache = get_response_cache()
+        cache_key = await self.aget_cache_key(
+            request, project_id, await get_membership(request).arole(project_id)
+        )
+        cached = await cache.aget(request, cache_key)
+        if cached is not None:
+            return cached
+
+        filterset = self.get_filterset(request, project_id)
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        stats = await filterset.qs.order_by().aaggregate(**self.aggregates)
+        validator = self.get_validator(request, stats)
+        not_modified = validator.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        paginator = self.pagination_class()
+        tasks = self.get_rows(filterset)
+        rows = await paginator.afetch(tasks, request)
+        count = None
+        if self.count_requested(request):
+            count = await sync_to_async(estimate_count)(
+                tasks, self.exact_count_threshold
+            )
+        response = self.build_response(request, paginator, rows, validator, count)
+        return await cache.aset(cache_key, response)
+
+
+class AsyncTaskDetailAPIView(AsyncAPIView, TaskDetailAPIView):
+    async def aget_object(self, id):
+        task = getattr(self, "task", None)
+        if task is not None and task.pk == id:
+            return task
+        try:
+            return await self.get_queryset().aget(pk=id)
+        except Task.DoesNotExist:
+            raise Http404("No Task matches the given query.")
+
+    @swagger_auto_schema(
+        tags=["tasks"],
+    )
+    @replica_reads
+    async def get(self, request, id):
+        try:
+            return self.build_response(request, await self.aget_object(id))
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncCommentListAPIView(AsyncAPIView, CommentListAPIView):
+    @swagger_auto_schema(
+        tags=["comments"],
+    )
+    @replica_reads
+    async def get(self, request, task_id):
+        stats = await Task.objects.filter(pk=task_id).aaggregate(**self.aggregates)
+        validator = self.get_validator(request, stats)
+        not_modified = validator.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        paginator = self.pagination_class()
+        rows = await paginator.afetch(self.get_rows(task_id), request)
+        return self.build_response(request, paginator, rows, validator)
+
+
+class AsyncCommentDetailAPIView(AsyncAPIView, CommentDetailAPIView):
+    @swagger_auto_schema(
+        tags=["comments"],
+    )
+    @replica_reads
+    async def get(self, request, id):
+        try:
+            try:
+                comment = await self.get_queryset().aget(pk=id)
+            except Comment.DoesNotExist:
+                raise Http404("No Comment matches the given query.")
+            serializer = CommentSerializer(comment)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
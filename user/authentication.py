@@ -0,0 +1,64 @@
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from config.caches import shared_cache
+
+KEY_PREFIX = "pm:auth-user"
+
+
+def user_cache_config(required=True):
+    config = getattr(settings, "USER_AUTH_CACHE", None) or {}
+    alias, timeout = config.get("CACHE_ALIAS", "default"), config.get("TIMEOUT", 60)
+    if not timeout:
+        return None, timeout
+    return shared_cache(alias, "USER_AUTH_CACHE", required), timeout
+
+
+def user_cache_key(user_id):
+    return f"{KEY_PREFIX}:{user_id}"
+
+
+def invalidate_user(user_id):
+    # Users are saved by management commands too. Without a shared cache
+    # there is nothing to drop: requests refuse to use it.
+    cache, _ = user_cache_config(required=False)
+    if cache is not None:
+        cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that keeps authenticated users in the cache
+    configured by ``USER_AUTH_CACHE`` for ``TIMEOUT`` seconds, saving the
+    user query on repeated requests. Only active users are cached, and
+    ``user.signals`` drops the entry whenever the user is saved or
+    deleted, so deactivating a user or changing their password takes effect
+    on the next request, in every worker: the cache must be shared by all
+    of them, see ``config.caches``. ``QuerySet.update()`` bypasses the
+    signals; such changes show after at most ``TIMEOUT`` seconds.
+    """
+
+    def get_user(self, validated_token):
+        cache, timeout = user_cache_config()
+        if not timeout:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, timeout)
+        elif api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                "The user's password has been changed.", code="password_changed"
+            )
+        return user
@@ -0,0 +1,218 @@
+"""
+Password hashing on a bounded worker pool.
+
+A PBKDF2 hash takes tens of milliseconds of CPU by design. Run inline, a
+burst of logins occupies every request worker and starves the rest of the
+API. ``User.set_password`` and ``User.check_password`` hash here instead:
+at most ``WORKERS`` hashes run at once, ``QUEUE`` more may wait, and
+anything beyond that is turned away at once with a 429. A hash that waits
+longer than ``TIMEOUT`` seconds gives up with a 503. Both responses carry
+``Retry-After``.
+
+hashlib releases the GIL while it hashes, so the worker threads run in
+parallel with each other and with the request threads.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.exceptions import APIException
+
+
+class HashingUnavailable(APIException):
+    status_code = 503
+    default_detail = "Password check timed out, try again later."
+    default_code = "hashing_unavailable"
+    wait = 1
+
+
+class HashingPoolFull(HashingUnavailable):
+    status_code = 429
+    default_detail = "Too many sign-ins in progress, try again shortly."
+    default_code = "hashing_pool_full"
+
+
+class HashingPool:
+    """
+    A thread pool that admits at most ``workers + queue`` calls at a time
+    and keeps counters of its load for ``stats()``.
+    """
+
+    def __init__(self, workers, queue, timeout):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="hashing")
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.queue = queue
+        self.queued = self.running = 0
+        self.completed = self.rejected = self.timeouts = 0
+        self.max_queued = 0
+        self.hash_seconds = self.max_hash_seconds = 0.0
+        self.wait_seconds = self.max_wait_seconds = 0.0
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingPoolFull()
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        try:
+            future = self._executor.submit(self._call, time.perf_counter(), fn, args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def run(self, fn, *args):
+        """Call ``fn(*args)`` on the pool and return its result."""
+        future = self.submit(fn, *args)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            self._timed_out(future)
+
+    async def arun(self, fn, *args):
+        """``run`` for async code, waiting without blocking the event loop."""
+        future = self.submit(fn, *args)
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)), self.timeout
+            )
+        except asyncio.TimeoutError:
+            self._timed_out(future)
+
+    def _call(self, submitted_at, fn, args):
+        started_at = time.perf_counter()
+        waited = started_at - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        try:
+            return fn(*args)
+        finally:
+            took = time.perf_counter() - started_at
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.hash_seconds += took
+                self.max_hash_seconds = max(self.max_hash_seconds, took)
+
+    def _done(self, future):
+        if future.cancelled():
+            self._release()
+        else:
+            self._slots.release()
+
+    def _release(self):
+        # Undo the admission of a call that never ran.
+        with self._lock:
+            self.queued -= 1
+        self._slots.release()
+
+    def _timed_out(self, future):
+        # A call that has started runs to completion and frees its slot then.
+        future.cancel()
+        with self._lock:
+            self.timeouts += 1
+        raise HashingUnavailable()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue": self.queue,
+                "running": self.running,
+                "queued": self.queued,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "avg_hash_ms": (
+                    self.hash_seconds / self.completed * 1000
+                    if self.completed
+                    else None
+                ),
+                "max_hash_ms": self.max_hash_seconds * 1000,
+                "avg_wait_ms": (
+                    self.wait_seconds / self.completed * 1000
+                    if self.completed
+                    else None
+                ),
+                "max_wait_ms": self.max_wait_seconds * 1000,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def from_settings(cls):
+        config = getattr(settings, "PASSWORD_HASHING_POOL", None) or {}
+        workers = config.get("WORKERS", 2)
+        if not workers:
+            return None
+        return cls(workers, config.get("QUEUE", 16), config.get("TIMEOUT", 5))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """Return the process's pool, or None when hashing runs inline."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool.from_settings() or False
+    return _pool or None
+
+
+@receiver(setting_changed)
+def reset_hashing_pool(setting, **kwargs):
+    global _pool
+    if setting == "PASSWORD_HASHING_POOL":
+        if _pool:
+            _pool.shutdown()
+        _pool = None
+
+
+def make_password(password):
+    pool = get_hashing_pool()
+    if pool is None:
+        return hashers.make_password(password)
+    return pool.run(hashers.make_password, password)
+
+
+async def amake_password(password):
+    pool = get_hashing_pool()
+    if pool is None:
+        return hashers.make_password(password)
+    return await pool.arun(hashers.make_password, password)
+
+
+def verify_password(password, encoded):
+    """Return whether ``password`` matches and whether to rehash it."""
+    pool = get_hashing_pool()
+    if pool is None:
+        return hashers.verify_password(password, encoded)
+    return pool.run(hashers.verify_password, password, encoded)
+
+
+async def averify_password(password, encoded):
+    pool = get_hashing_pool()
+    if pool is None:
+        return hashers.verify_password(password, encoded)
+    return await pool.arun(hashers.verify_password, password, encoded)
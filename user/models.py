@@ -2,6 +2,8 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
+from . import hashing
+
 # Create your models here.
 
 
@@ -17,12 +19,58 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+# The fields that other rows' API responses embed, such as a task's
+# assignee or a project's members.
+PROFILE_FIELDS = frozenset({"username", "first_name", "last_name", "email"})
+
+
+def touches_profile(update_fields):
+    """Whether a save of ``update_fields`` (None for all) may change the profile."""
+    return update_fields is None or not PROFILE_FIELDS.isdisjoint(update_fields)
+
+
 class User(AbstractUser):
     email = models.EmailField(unique=True, blank=False, null=False)
     date_joined = models.DateTimeField(default=timezone.now)
+    # Moved by saves that may change PROFILE_FIELDS, so that the validators
+    # of responses embedding users can cover them.
+    updated_at = models.DateTimeField(default=timezone.now)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} | {self.email}"
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if touches_profile(update_fields):
+            self.updated_at = timezone.now()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "updated_at"}
+        super().save(*args, **kwargs)
+
+    # Password hashing runs on the bounded pool in user.hashing, so these
+    # may raise HashingUnavailable when it is saturated.
+
+    def set_password(self, raw_password):
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        is_correct, must_update = hashing.verify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            # Password hash upgrades shouldn't be considered password changes.
+            self._password = None
+            self.save(update_fields=["password"])
+        return is_correct
+
+    async def acheck_password(self, raw_password):
+        is_correct, must_update = await hashing.averify_password(
+            raw_password, self.password
+        )
+        if is_correct and must_update:
+            self.password = await hashing.amake_password(raw_password)
+            await self.asave(update_fields=["password"])
+        return is_correct
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from . import hashing
 from .models import User
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
@@ -52,7 +53,14 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop("confirm_password")
-        user = User.objects.create_user(**validated_data)
+        password = validated_data.pop("password")
+        # What create_user() does, except that it hashes inline rather than
+        # through set_password() and the hashing pool.
+        user = User(**validated_data)
+        user.email = User.objects.normalize_email(user.email)
+        user.username = User.normalize_username(user.username)
+        user.set_password(password)
+        user.save()
         return user
 
 
@@ -68,13 +76,17 @@ class UserLoginSerializer(serializers.Serializer):
 
         if email and password:
             user = authenticate(email=email, password=password)
-            if not user:
-                raise serializers.ValidationError(
-                    "Unable to login",
-                )
         else:
             raise serializers.ValidationError("Email and Password are required..")
 
+        return self.login(user)
+
+    def login(self, user):
+        if not user:
+            raise serializers.ValidationError(
+                "Unable to login",
+            )
+
         refresh = RefreshToken.for_user(user)
 
         return {
@@ -82,3 +94,34 @@ class UserLoginSerializer(serializers.Serializer):
             "refresh": str(refresh),
             "access": str(refresh.access_token),
         }
+
+
+async def aauthenticate(email, password):
+    """
+    ``authenticate()`` with the default model backend for async views.
+    Django's ``aauthenticate`` would hash in the ``sync_to_async`` thread,
+    holding up every other sync call of the process; this awaits the
+    hashing pool instead.
+    """
+    try:
+        user = await User._default_manager.aget(**{User.USERNAME_FIELD: email})
+    except User.DoesNotExist:
+        # Hash once anyway, as ModelBackend does, so that response times
+        # don't reveal which emails are registered.
+        await hashing.amake_password(password)
+        return None
+    if await user.acheck_password(password) and user.is_active:
+        return user
+    return None
+
+
+class AsyncUserLoginSerializer(UserLoginSerializer):
+    """``UserLoginSerializer`` that authenticates in ``alogin()``, not ``validate()``."""
+
+    def validate(self, data):
+        return data
+
+    async def alogin(self):
+        data = self.validated_data
+        user = await aauthenticate(data["email"], data["password"])
+        return self.login(user)
@@ -0,0 +1,16 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user
+from .models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_authenticated_user(sender, instance, **kwargs):
+    # Again on commit, in case a concurrent request cached the old row
+    # before this transaction committed.
+    invalidate_user(instance.pk)
+    transaction.on_commit(partial(invalidate_user, instance.pk))
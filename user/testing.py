@@ -0,0 +1,10 @@
+"""Helpers shared by the apps' tests."""
+
+from .models import User
+
+
+def make_user(name):
+    """Create a user named ``name``, with a matching email and first name."""
+    return User.objects.create_user(
+        username=name, email=f"{name}@example.com", first_name=name.title()
+    )
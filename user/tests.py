@@ -1,3 +1,144 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .hashing import get_hashing_pool
+from .models import User
+from .views import AsyncLoginAPIView
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="secret"
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.url = reverse("user-detail", args=[self.user.pk])
+
+    def test_user_is_queried_once(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        # Only the user being viewed is fetched now.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_saving_user_invalidates(self):
+        self.client.get(self.url)
+        self.user.first_name = "Renamed"
+        self.user.save()
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["first_name"], "Renamed")
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_cache_can_be_disabled(self):
+        with self.settings(USER_AUTH_CACHE={"TIMEOUT": 0}):
+            self.client.get(self.url)
+            with self.assertNumQueries(2):
+                self.client.get(self.url)
+
+    @override_settings(SINGLE_PROCESS=False)
+    def test_local_cache_needs_a_single_process(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "USER_AUTH_CACHE"):
+            self.client.get(self.url)
+        with self.settings(USER_AUTH_CACHE={"TIMEOUT": 0}):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(SINGLE_PROCESS=False)
+    def test_saves_skip_a_local_cache(self):
+        # createsuperuser and other commands save users without one.
+        self.user.first_name = "Renamed"
+        self.user.save()
+        self.user.delete()
+        self.assertFalse(User.objects.exists())
+
+
+class HashingPoolTests(TestCase):
+    def setUp(self):
+        self.use_pool(timeout=5)
+        self.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="secret"
+        )
+        self.url = reverse("user-login")
+        self.credentials = {"email": "owner@example.com", "password": "secret"}
+
+    def use_pool(self, timeout):
+        pool_settings = override_settings(
+            PASSWORD_HASHING_POOL={"WORKERS": 1, "QUEUE": 1, "TIMEOUT": timeout}
+        )
+        pool_settings.enable()
+        self.addCleanup(pool_settings.disable)
+
+    def block_pool(self, calls):
+        """Occupy ``calls`` of the pool's slots until the test ends."""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        for _ in range(calls):
+            get_hashing_pool().submit(release.wait)
+
+    def test_login_hashes_on_pool(self):
+        response = self.client.post(self.url, self.credentials)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(self.url, {**self.credentials, "password": "x"})
+        self.assertEqual(response.status_code, 400)
+        stats = get_hashing_pool().stats()
+        self.assertEqual(stats["completed"], 2)
+        self.assertEqual(stats["rejected"], 0)
+
+    def test_saturated_pool_rejects(self):
+        self.block_pool(2)
+        response = self.client.post(self.url, self.credentials)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(get_hashing_pool().stats()["rejected"], 1)
+
+    def test_register_rejected_when_saturated(self):
+        self.block_pool(2)
+        response = self.client.post(
+            reverse("user-register"),
+            {
+                "username": "new",
+                "email": "new@example.com",
+                "password": "secret",
+                "confirm_password": "secret",
+            },
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(User.objects.filter(email="new@example.com").exists())
+
+    def test_queued_hash_times_out(self):
+        self.use_pool(timeout=0.05)
+        self.block_pool(1)
+        response = self.client.post(self.url, self.credentials)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(get_hashing_pool().stats()["timeouts"], 1)
+
+    async def test_async_login(self):
+        view = AsyncLoginAPIView.as_view()
+        factory = APIRequestFactory()
+        response = await view(factory.post(self.url, self.credentials))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["user"]["email"], "owner@example.com")
+
+        response = await view(
+            factory.post(self.url, {**self.credentials, "email": "no@example.com"})
+        )
+        self.assertEqual(response.status_code, 400)
@@ -1,6 +1,14 @@
+from django.conf import settings
+from django.urls import path
 from rest_framework import routers
-from .views import UserViewSet
+from .views import AsyncLoginAPIView, UserViewSet
 
 router = routers.SimpleRouter()
 router.register(r"users", UserViewSet)
 urlpatterns = router.urls
+
+if settings.ASYNC_API_VIEWS:
+    # Takes precedence over the viewset's login action.
+    urlpatterns.insert(
+        0, path("users/login/", AsyncLoginAPIView.as_view(), name="user-login")
+    )
@@ -3,17 +3,25 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from drf_yasg.utils import swagger_auto_schema
 
+from config.async_views import AsyncAPIView
+
 from .models import User
-from .serializers import UserSerializer, UserRegistrationSerializer, UserLoginSerializer
+from .serializers import (
+    AsyncUserLoginSerializer,
+    UserSerializer,
+    UserRegistrationSerializer,
+    UserLoginSerializer,
+)
+from .hashing import HashingUnavailable
+from .authentication import CachedJWTAuthentication
 from .permissions import IsUserOwner
 
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated, IsUserOwner]
     serializer_class = UserSerializer
 
@@ -42,6 +50,8 @@ class UserViewSet(viewsets.ModelViewSet):
                 },
                 status=status.HTTP_201_CREATED,
             )
+        except HashingUnavailable:
+            raise
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -62,5 +72,38 @@ class UserViewSet(viewsets.ModelViewSet):
                     "access": login_data["access"],
                 }
             )
+        except HashingUnavailable:
+            raise
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncLoginAPIView(AsyncAPIView):
+    """
+    Login for ASGI deployments, awaiting the password check on the hashing
+    pool so the event loop keeps serving other requests meanwhile.
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        request_body=UserLoginSerializer,
+    )
+    async def post(self, request):
+        try:
+            serializer = AsyncUserLoginSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            login_data = await serializer.alogin()
+
+            return Response(
+                {
+                    "user": UserSerializer(login_data["user"]).data,
+                    "refresh": login_data["refresh"],
+                    "access": login_data["access"],
+                }
+            )
+        except HashingUnavailable:
+            raise
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)